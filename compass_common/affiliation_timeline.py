@@ -0,0 +1,95 @@
+""" Organization affiliation timeline of a contributor
+
+The organization change dates of a contributor come from several sources, the first ones having priority: an
+affiliation only keeps the parts of its dates not covered by the affiliations added before it. The accepted
+affiliations are kept as sorted intervals whose interiors do not overlap, so that the parts of a new affiliation
+are found by binary search instead of splitting it against every accepted affiliation.
+
+Dates are ISO strings compared as strings. Two affiliations sharing only a date overlap, and an affiliation of
+a single date splits the longer ones added after it at that date.
+"""
+
+from bisect import bisect_left, bisect_right
+import numpy as np
+
+
+class AffiliationTimeline:
+    def __init__(self):
+        # accepted affiliations of more than one date, sorted by first date and by last date
+        self.first_date_list = []
+        self.last_date_list = []
+        self.org_list = []
+        # dates of the accepted affiliations of a single date, sorted
+        self.point_date_list = []
+
+    def __len__(self):
+        """ Number of accepted affiliations of more than one date """
+        return len(self.first_date_list)
+
+    def add(self, first_date, last_date, org=None):
+        """ Add an affiliation with a lower priority than the ones added before
+
+        :param first_date: first date of the affiliation
+        :param last_date: last date of the affiliation, an affiliation whose first date is after it is kept as it
+            is, without covering the ones added after it
+        :param org: value of the affiliation, e.g. its org change date dict
+        :return: (first_date, last_date) parts of the affiliation not covered by the ones added before, sorted
+        """
+        if first_date > last_date:
+            return [(first_date, last_date)]
+        if first_date == last_date:
+            if self.is_covered(first_date):
+                return []
+            self.point_date_list.insert(bisect_left(self.point_date_list, first_date), first_date)
+            return [(first_date, last_date)]
+        part_list = []
+        date = first_date
+        # the accepted affiliations ending after first_date and starting before last_date
+        i = bisect_right(self.last_date_list, first_date)
+        while i < len(self.first_date_list) and self.first_date_list[i] < last_date:
+            if self.first_date_list[i] > date:
+                part_list.extend(self.split(date, self.first_date_list[i]))
+            date = max(date, self.last_date_list[i])
+            i += 1
+        if date < last_date:
+            part_list.extend(self.split(date, last_date))
+        for part_first_date, part_last_date in part_list:
+            i = bisect_left(self.first_date_list, part_first_date)
+            self.first_date_list.insert(i, part_first_date)
+            self.last_date_list.insert(i, part_last_date)
+            self.org_list.insert(i, org)
+        return part_list
+
+    def is_covered(self, date):
+        """ Whether a date is in one of the accepted affiliations, bounds included """
+        i = bisect_left(self.last_date_list, date)
+        if i < len(self.first_date_list) and self.first_date_list[i] <= date:
+            return True
+        i = bisect_left(self.point_date_list, date)
+        return i < len(self.point_date_list) and self.point_date_list[i] == date
+
+    def split(self, first_date, last_date):
+        """ Parts of an uncovered interval split at the single date affiliations within it """
+        date_list = [first_date]
+        date_list.extend(self.point_date_list[bisect_right(self.point_date_list, first_date):
+                                              bisect_left(self.point_date_list, last_date)])
+        date_list.append(last_date)
+        return list(zip(date_list[:-1], date_list[1:]))
+
+    def get_org(self, date):
+        """ Value of the affiliation of a date, first_date <= date < last_date, None if there is none """
+        i = bisect_right(self.first_date_list, date) - 1
+        if i >= 0 and date < self.last_date_list[i]:
+            return self.org_list[i]
+        return None
+
+    def get_index_array(self, date_list):
+        """ Index in the accepted affiliations of the affiliation of every date, first_date <= date < last_date,
+        -1 for the dates without one
+        """
+        if len(self.first_date_list) == 0 or len(date_list) == 0:
+            return np.full(len(date_list), -1, dtype=np.int64)
+        date_array = np.array(date_list)
+        index_array = np.searchsorted(np.array(self.first_date_list), date_array, side="right") - 1
+        is_affiliated = (index_array >= 0) & (date_array < np.array(self.last_date_list)[np.maximum(index_array, 0)])
+        return np.where(is_affiliated, index_array, -1)
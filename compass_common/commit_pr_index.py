@@ -0,0 +1,102 @@
+""" Index of commit hashes to the pull requests containing them """
+
+from compass_common.list_utils import split_list
+from compass_common.opensearch_utils import get_msearch_hits
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Number of hashes from which they are looked up from a temporary index instead of sent in the queries
+TERMS_LOOKUP_MIN_SIZE = 50000
+# Hashes of a lookup document, the default index.max_terms_count of a terms query
+TERMS_LOOKUP_CHUNK_SIZE = 65536
+
+
+def get_pr_hits_by_commit_hash(client, pr_index, hash_list, get_query, max_workers=4,
+                               terms_lookup_min_size=TERMS_LOOKUP_MIN_SIZE):
+    """ Pull request hits of the commit hashes, none of them truncated
+
+    The hashes are split in chunks of 500, whose queries are sent by msearch. From terms_lookup_min_size
+    hashes, they are written to a temporary index and looked up by the queries instead.
+    :param get_query: function(hash_terms) returning the search body of the pull requests of hash_terms,
+        either a list of hashes or a terms lookup, e.g. {"terms": {"commits_data": hash_terms}}
+    :param max_workers: number of msearch requests sent concurrently
+    :param terms_lookup_min_size: number of hashes from which a temporary index is used, None to never use one
+    """
+    if terms_lookup_min_size and len(hash_list) >= terms_lookup_min_size:
+        pr_hits = get_pr_hits_by_terms_lookup(client, pr_index, hash_list, get_query, max_workers)
+        if pr_hits is not None:
+            return pr_hits
+    body_list = [get_query(hash_l) for hash_l in split_list(hash_list)]
+    return [pr_hit for pr_hits in get_msearch_hits(client, pr_index, body_list, max_workers=max_workers)
+            for pr_hit in pr_hits]
+
+
+def get_pr_hits_by_terms_lookup(client, pr_index, hash_list, get_query, max_workers=4):
+    """ Pull request hits of the commit hashes, looked up from a temporary index holding the hashes,
+    None if the temporary index can not be created
+    """
+    lookup_index = "tmp_commit_hash_lookup_" + uuid.uuid4().hex
+    try:
+        client.indices.create(index=lookup_index, body={
+            "settings": {"number_of_shards": 1, "number_of_replicas": 0},
+            "mappings": {"dynamic": False}
+        })
+    except Exception as e:
+        logger.warning(f"Temporary index {lookup_index} could not be created, "
+                       f"the hashes are sent in the queries: {e}")
+        return None
+    try:
+        body_list = []
+        for i, hash_l in enumerate(split_list(hash_list, TERMS_LOOKUP_CHUNK_SIZE)):
+            client.index(index=lookup_index, id=str(i), body={"hash_list": hash_l})
+            body_list.append(get_query({"index": lookup_index, "id": str(i), "path": "hash_list"}))
+        return [pr_hit for pr_hits in get_msearch_hits(client, pr_index, body_list, max_workers=max_workers)
+                for pr_hit in pr_hits]
+    finally:
+        try:
+            client.indices.delete(index=lookup_index)
+        except Exception as e:
+            logger.warning(f"Temporary index {lookup_index} could not be deleted: {e}")
+
+
+class CommitPrIndex:
+    """ Commit hash to the source of a pull request that contains it, as its merge commit or one of its
+    commits. A hash is only searched once: the hashes already searched, and the ones found in the pull
+    requests of other searches, are answered from memory.
+    """
+
+    def __init__(self):
+        self.pr_data_dict = {}
+        self.searched_hash_set = set()
+        self._lock = threading.Lock()
+
+    def add_pr_hits(self, pr_hits):
+        """ Index the pull request hits of a search """
+        for pr_hit in pr_hits:
+            pr_data = pr_hit["_source"]
+            if pr_data.get("merge_commit_sha"):
+                self.pr_data_dict[pr_data["merge_commit_sha"]] = pr_data
+            for pr_commit_hash in pr_data.get("commits_data") or []:
+                self.pr_data_dict[pr_commit_hash] = pr_data
+
+    def get_pr_data_dict(self, hash_list, search_pr_list):
+        """ Search the pull requests of the hashes not known yet, and return the index
+
+        :param hash_list: commit hashes
+        :param search_pr_list: function(hash_list) returning the pull request hits of the hashes,
+            e.g. with get_pr_hits_by_commit_hash
+        :return: dict of commit hash to pull request source, with the hashes of hash_list that are linked
+            to a pull request, and possibly other ones
+        """
+        with self._lock:
+            new_hash_list = [commit_hash for commit_hash in dict.fromkeys(hash_list)
+                             if commit_hash not in self.searched_hash_set and commit_hash not in self.pr_data_dict]
+        if new_hash_list:
+            pr_hits = search_pr_list(new_hash_list)
+            with self._lock:
+                self.add_pr_hits(pr_hits)
+                self.searched_hash_set.update(new_hash_list)
+        return self.pr_data_dict
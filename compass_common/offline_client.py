@@ -0,0 +1,1120 @@
+""" Offline in-process stand-in of the OpenSearch/Elasticsearch client
+
+Documents are kept in a SQLite store and queries are evaluated in process, so the metrics and
+the contributor pipeline can run end to end without a cluster, e.g. for repeatable benchmarks.
+Only the subset of the query DSL emitted by this repository is supported:
+
+- queries: bool, term, terms (also with a terms lookup), range, match, match_phrase, exists, ids,
+  match_all and the painless scripts registered in `script_function_list`
+- aggregations: cardinality, avg, sum, min, max, value_count, percentiles, terms, top_hits,
+  date_histogram, filter and filters, with sub-aggregations
+- apis: search (with scroll, search_after and slice), scroll, clear_scroll, msearch, count, index,
+  bulk, delete_by_query and the indices exists/create/delete/flush/refresh/get_settings
+
+Text fields are matched with a simple word tokenizer, fields ending in `.keyword` exactly.
+A client is created by url `offline:///path/to/store.sqlite?fixtures=/path/to/snapshots`,
+an empty path keeps the store in memory. Use a store file when several processes share the data.
+"""
+
+import copy
+import datetime
+import fnmatch
+import functools
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from urllib.parse import urlparse, parse_qs
+
+import dateutil.parser
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+OFFLINE_SCHEME = "offline"
+DEFAULT_PERCENTS = [1, 5, 25, 50, 75, 95, 99]
+FIXTURE_SUFFIX_LIST = [".ndjson.gz", ".json.gz", ".ndjson", ".json"]
+DATE_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}")
+WORD_PATTERN = re.compile(r"\w+")
+INTERVAL_PATTERN = re.compile(r"^(\d*)([a-zA-Z]+)$")
+INTERVAL_UNIT_DICT = {
+    "m": "minute", "minute": "minute",
+    "h": "hour", "hour": "hour",
+    "d": "day", "day": "day",
+    "w": "week", "week": "week",
+    "M": "month", "month": "month",
+    "q": "quarter", "quarter": "quarter",
+    "y": "year", "year": "year"
+}
+DATE_FORMAT_LIST = [("yyyy", "%Y"), ("MM", "%m"), ("dd", "%d"), ("HH", "%H"), ("mm", "%M"), ("ss", "%S"),
+                    ("'T'", "T"), ("'Z'", "Z")]
+
+offline_client_dict = {}
+offline_client_lock = threading.Lock()
+
+
+class OfflineRequestError(Exception):
+    """ Exception raised when a request uses a part of the DSL the offline client does not support """
+
+    def __init__(self, reason, status_code=400):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.error = "offline_request_error"
+        self.info = {
+            "status": status_code,
+            "error": {"type": self.error, "reason": reason, "root_cause": [{"type": self.error, "reason": reason}]}
+        }
+
+
+def is_offline_url(url):
+    """ Whether the url points to the offline client """
+    return isinstance(url, str) and urlparse(url).scheme == OFFLINE_SCHEME
+
+
+def get_offline_client(url):
+    """ Get the offline client of the url, shared by everyone in the process using the same url """
+    with offline_client_lock:
+        if url not in offline_client_dict:
+            parsed_url = urlparse(url)
+            db_path = (parsed_url.netloc + parsed_url.path) or ":memory:"
+            client = OfflineClient(db_path)
+            for fixture_path in parse_qs(parsed_url.query).get("fixtures", []):
+                load_fixtures(client, fixture_path)
+            offline_client_dict[url] = client
+        return offline_client_dict[url]
+
+
+def get_fixture_index(file_name):
+    """ Index name of a fixture file, the file name without its suffix """
+    for suffix in FIXTURE_SUFFIX_LIST:
+        if file_name.endswith(suffix):
+            return file_name[:-len(suffix)]
+    return None
+
+
+def get_fixture_items(file_path, index):
+    """ Yield (index, id, source) of a NDJSON fixture file
+
+    Lines can be exported hits (`{"_index", "_id", "_source"}`), bulk action and source line
+    pairs, or bare sources. Documents go to the index named after the file, the `_index` of the
+    lines is only used when the file name has no known suffix.
+    """
+    open_file = gzip.open if file_path.endswith(".gz") else open
+    with open_file(file_path, "rt", encoding="utf-8") as f:
+        action = None
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if action is not None:
+                yield index or action.get("_index"), action.get("_id"), item
+                action = None
+            elif "_source" in item:
+                yield index or item.get("_index"), item.get("_id"), item["_source"]
+            elif len(item) == 1 and next(iter(item)) in ("index", "create"):
+                action = next(iter(item.values())) or {}
+            else:
+                yield index, None, item
+
+
+def load_fixtures(client, path, reload=False):
+    """ Load exported index snapshots into the offline client
+
+    :param path: a NDJSON(.gz) file or a directory of them, one file per index named `<index>.ndjson`
+    :param reload: load indexes that already contain documents again, otherwise they are skipped
+    :return: dict of index name to the number of loaded documents
+    """
+    if os.path.isdir(path):
+        file_path_list = [os.path.join(path, file_name) for file_name in sorted(os.listdir(path))
+                          if get_fixture_index(file_name)]
+    else:
+        file_path_list = [path]
+    count_dict = {}
+    for file_path in file_path_list:
+        index = get_fixture_index(os.path.basename(file_path))
+        if not reload and index and client.get_index_count(index) > 0:
+            logger.info("Skip fixture {}, index {} is already loaded".format(file_path, index))
+            continue
+        item_list = []
+        for item_index, doc_id, source in get_fixture_items(file_path, index):
+            item_list.append((item_index, doc_id, source))
+            if len(item_list) >= 5000:
+                for item_index, count in client.save_items(item_list).items():
+                    count_dict[item_index] = count_dict.get(item_index, 0) + count
+                item_list = []
+        for item_index, count in client.save_items(item_list).items():
+            count_dict[item_index] = count_dict.get(item_index, 0) + count
+        logger.info("Loaded fixture {}".format(file_path))
+    return count_dict
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_date_millis(value):
+    """ Epoch milliseconds of a date string, naive dates are UTC """
+    try:
+        date = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        date = dateutil.parser.isoparse(value)
+    return get_datetime_millis(date)
+
+
+def get_datetime_millis(date):
+    """ Epoch milliseconds of a date or datetime, naive datetimes are UTC """
+    if not isinstance(date, datetime.datetime):
+        date = datetime.datetime(date.year, date.month, date.day)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return int(date.timestamp() * 1000)
+
+
+def is_date(value):
+    """ Whether a value is a date or a date string """
+    return isinstance(value, (datetime.date, datetime.datetime)) or \
+        (isinstance(value, str) and DATE_PATTERN.match(value) is not None)
+
+
+def get_comparable(value):
+    """ Value normalized for range comparison and sorting: numbers as float, dates as epoch milliseconds """
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return float(get_datetime_millis(value))
+    if isinstance(value, str) and DATE_PATTERN.match(value):
+        try:
+            return float(parse_date_millis(value))
+        except ValueError:
+            return value
+    return value
+
+
+def get_text(value):
+    """ Text of a value as indexed, booleans as true/false """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def get_term(value):
+    """ Hashable term of a value for equality, cardinality and buckets """
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return str(value)
+
+
+def get_field_values(source, field):
+    """ Flattened non-null values of a dotted field of a source, `.keyword` sub-fields are the field itself """
+    if field.endswith(".keyword"):
+        field = field[:-len(".keyword")]
+    if field in source:
+        value_list = [source[field]]
+    else:
+        value_list = [source]
+        for key in field.split("."):
+            next_list = []
+            for value in value_list:
+                if isinstance(value, list):
+                    next_list.extend(item.get(key) for item in value if isinstance(item, dict))
+                elif isinstance(value, dict):
+                    next_list.append(value.get(key))
+            value_list = next_list
+    result = []
+    for value in value_list:
+        if isinstance(value, list):
+            result.extend(item for item in value if item is not None)
+        elif value is not None:
+            result.append(value)
+    return result
+
+
+def get_doc_values(source, field):
+    """ Sorted unique values of a field as seen by `doc[field]` in painless """
+    values = get_field_values(source, field)
+    try:
+        return sorted(set(values))
+    except TypeError:
+        return values
+
+
+def get_script(script):
+    """ Source and params of a script given as a string or a dict """
+    if isinstance(script, str):
+        return script, {}
+    return script.get("source") or script.get("inline") or "", script.get("params") or {}
+
+
+def script_contains_bug_label(source, params, field):
+    """ Whether any value of the field contains bug or 缺陷 """
+    return any("bug" in str(value).lower() or "缺陷" in str(value) for value in get_field_values(source, field))
+
+
+def script_first_values_differ(source, field, other_field):
+    """ Whether both fields have a value and their first values differ """
+    values = get_doc_values(source, field)
+    other_values = get_doc_values(source, other_field)
+    return len(values) > 0 and len(other_values) > 0 and values[0] != other_values[0]
+
+
+def script_contributor_name(source, params):
+    """ First platform login name, falling back to the first git author name """
+    values = get_doc_values(source, "id_platform_login_name_list") or \
+        get_doc_values(source, "id_git_author_name_list")
+    return values[0] if values else None
+
+
+def script_contribution_sum(source, params):
+    """ Sum of the contributions of the target contribution types """
+    target_list = params.get("targetValue") or []
+    return sum(item.get("contribution") or 0 for item in source.get("contribution_type_list") or []
+               if item.get("contribution_type") in target_list)
+
+
+def script_pull_id(source, params):
+    """ Pull id of an issue linked to a pull request, id otherwise """
+    values = get_field_values(source, "pull_id") if "pull_id" in source else get_field_values(source, "id")
+    return values[0] if values else None
+
+
+def script_body_contains(source, params):
+    """ Whether the body contains the issue parameter """
+    return any(params.get("issue", "") in str(value) for value in get_field_values(source, "body"))
+
+
+# Python equivalents of the painless scripts emitted by this repository, matched by a marker of the source
+script_function_list = [
+    ("params.issue", script_body_contains),
+    ("reporter_user_name", lambda source, params: script_first_values_differ(
+        source, "actor_username", "reporter_user_name")),
+    ("merged_by_data_name", lambda source, params: script_first_values_differ(
+        source, "merged_by_data_name", "author_name")),
+    ("id_platform_login_name_list", script_contributor_name),
+    ("contribution_type_list", script_contribution_sum),
+    ("pull_id", script_pull_id),
+    ("doc['labels']", lambda source, params: script_contains_bug_label(source, params, "labels")),
+    ("doc['issue_type']", lambda source, params: script_contains_bug_label(source, params, "issue_type"))
+]
+
+
+def get_script_function(script):
+    """ Python function(source) of a registered painless script """
+    script_source, params = get_script(script)
+    for marker, function in script_function_list:
+        if marker in script_source:
+            return lambda source: function(source, params)
+    raise OfflineRequestError("Unsupported script: {}".format(script_source))
+
+
+def get_query_field(body, option_key_list=("boost", "_name")):
+    """ Field and value of a single field query like {"field": value, "boost": 1} """
+    for field, value in body.items():
+        if field not in option_key_list:
+            return field, value
+    raise OfflineRequestError("Missing field in query {}".format(body))
+
+
+def get_tokens(value):
+    """ Lowercase words of a value """
+    return WORD_PATTERN.findall(get_text(value).lower())
+
+
+def is_phrase_match(value, phrase, exact=False):
+    """ Whether the phrase appears in the value as consecutive words, or equals it for keyword fields """
+    value_text, phrase_text = get_text(value), get_text(phrase)
+    if value_text == phrase_text:
+        return True
+    if exact:
+        return False
+    value_tokens, phrase_tokens = get_tokens(value_text), get_tokens(phrase_text)
+    if len(phrase_tokens) == 0:
+        return False
+    for i in range(len(value_tokens) - len(phrase_tokens) + 1):
+        if value_tokens[i:i + len(phrase_tokens)] == phrase_tokens:
+            return True
+    return False
+
+
+def is_range_match(value, bound_dict):
+    """ Whether a value satisfies all bounds of a range query """
+    value = get_comparable(value)
+    for operator, bound in bound_dict.items():
+        if operator not in ("gt", "gte", "lt", "lte") or bound is None:
+            continue
+        bound = get_comparable(bound)
+        if isinstance(value, str) != isinstance(bound, str):
+            return False
+        if operator == "gt" and not value > bound:
+            return False
+        if operator == "gte" and not value >= bound:
+            return False
+        if operator == "lt" and not value < bound:
+            return False
+        if operator == "lte" and not value <= bound:
+            return False
+    return True
+
+
+def get_clause_list(clauses):
+    """ Clauses of a bool occurrence given as a dict or a list """
+    if clauses is None:
+        return []
+    return clauses if isinstance(clauses, list) else [clauses]
+
+
+def compile_query(query, get_source=None):
+    """ Compile a query into a predicate function(doc_id, source)
+    :param get_source: function(index, doc_id) returning a source, for the terms lookups
+    """
+    if not query:
+        return lambda doc_id, source: True
+    if len(query) != 1:
+        raise OfflineRequestError("Query must have a single clause: {}".format(query))
+    query_type, body = next(iter(query.items()))
+    if query_type == "match_all":
+        return lambda doc_id, source: True
+    if query_type == "bool":
+        must_list = [compile_query(clause, get_source) for clause in
+                     get_clause_list(body.get("must")) + get_clause_list(body.get("filter"))]
+        must_not_list = [compile_query(clause, get_source) for clause in get_clause_list(body.get("must_not"))]
+        should_list = [compile_query(clause, get_source) for clause in get_clause_list(body.get("should"))]
+        minimum_should_match = body.get("minimum_should_match")
+        if minimum_should_match is None:
+            minimum_should_match = 0 if must_list else min(1, len(should_list))
+        minimum_should_match = int(minimum_should_match)
+
+        def bool_match(doc_id, source):
+            if not all(match(doc_id, source) for match in must_list):
+                return False
+            if any(match(doc_id, source) for match in must_not_list):
+                return False
+            if minimum_should_match > 0:
+                return sum(1 for match in should_list if match(doc_id, source)) >= minimum_should_match
+            return True
+        return bool_match
+    if query_type in ("term", "terms"):
+        field, value = get_query_field(body)
+        if query_type == "term":
+            value = value.get("value") if isinstance(value, dict) else value
+            value_list = [value]
+        elif isinstance(value, dict):
+            # terms lookup of the values of a field of another document
+            if get_source is None:
+                raise OfflineRequestError("Terms lookup is not available: {}".format(value))
+            value_list = get_field_values(get_source(value["index"], str(value["id"])) or {}, value["path"])
+        else:
+            value_list = value
+        term_set = {get_term(item) for item in value_list}
+        return lambda doc_id, source: any(get_term(item) in term_set for item in get_field_values(source, field))
+    if query_type == "range":
+        field, bound_dict = get_query_field(body)
+        return lambda doc_id, source: any(is_range_match(value, bound_dict)
+                                          for value in get_field_values(source, field))
+    if query_type in ("match_phrase", "match"):
+        field, phrase = get_query_field(body)
+        phrase = phrase.get("query") if isinstance(phrase, dict) else phrase
+        exact = field.endswith(".keyword")
+        if query_type == "match" and not exact:
+            token_set = set(get_tokens(phrase))
+            return lambda doc_id, source: any(token_set.intersection(get_tokens(value))
+                                              for value in get_field_values(source, field))
+        return lambda doc_id, source: any(is_phrase_match(value, phrase, exact)
+                                          for value in get_field_values(source, field))
+    if query_type == "exists":
+        field = body["field"]
+        return lambda doc_id, source: len(get_field_values(source, field)) > 0
+    if query_type == "ids":
+        id_set = set(body.get("values") or [])
+        return lambda doc_id, source: doc_id in id_set
+    if query_type == "script":
+        script_function = get_script_function(body["script"])
+        return lambda doc_id, source: bool(script_function(source))
+    raise OfflineRequestError("Unsupported query: {}".format(query_type))
+
+
+def get_sort_list(sort):
+    """ Sort clauses as a list of (field, order) """
+    sort_list = []
+    for clause in get_clause_list(sort):
+        if isinstance(clause, str):
+            sort_list.append((clause, "desc" if clause == "_score" else "asc"))
+            continue
+        for field, order in clause.items():
+            if isinstance(order, dict):
+                order = order.get("order", "asc")
+            sort_list.append((field, order))
+    return sort_list
+
+
+def get_sort_values(doc_id, source, sort_list):
+    """ Sort values of a hit, the minimum for ascending and the maximum for descending multi-value fields """
+    sort_values = []
+    for field, order in sort_list:
+        if field == "_id":
+            sort_values.append(doc_id)
+        elif field in ("_score", "_doc"):
+            sort_values.append(1.0 if field == "_score" else 0)
+        else:
+            value_list = [get_comparable(value) for value in get_field_values(source, field)]
+            if len(value_list) == 0:
+                sort_values.append(None)
+            else:
+                sort_values.append(min(value_list) if order == "asc" else max(value_list))
+    return [int(value) if isinstance(value, float) and value.is_integer() else value for value in sort_values]
+
+
+def compare_sort_values(values, other_values, sort_list):
+    """ Compare two lists of sort values, missing values last """
+    for value, other_value, (field, order) in zip(values, other_values, sort_list):
+        if value == other_value:
+            continue
+        if value is None:
+            return 1
+        if other_value is None:
+            return -1
+        result = -1 if value < other_value else 1
+        return result if order == "asc" else -result
+    return 0
+
+
+def get_source_projection(source, includes):
+    """ Project a source on included field patterns """
+    if includes is True or includes is None:
+        return copy.deepcopy(source)
+    if includes is False:
+        return None
+    if isinstance(includes, dict):
+        result = get_source_projection(source, includes.get("includes") or includes.get("include") or True)
+        for pattern in get_clause_list(includes.get("excludes") or includes.get("exclude")):
+            for key in [key for key in result if fnmatch.fnmatchcase(key, pattern)]:
+                del result[key]
+        return result
+    result = {}
+    for pattern in get_clause_list(includes):
+        key, _, rest = pattern.partition(".")
+        for source_key in [key] if key in source else fnmatch.filter(source.keys(), key):
+            value = source[source_key]
+            if rest and isinstance(value, dict):
+                sub_value = get_source_projection(value, [rest])
+                if sub_value:
+                    result.setdefault(source_key, {}).update(sub_value)
+            elif rest and isinstance(value, list):
+                result[source_key] = [get_source_projection(item, [rest]) if isinstance(item, dict) else item
+                                      for item in value]
+            elif not rest:
+                result[source_key] = copy.deepcopy(value)
+    return result
+
+
+def format_date(millis, date_format=None):
+    """ Format epoch milliseconds with a subset of the joda date format """
+    date = datetime.datetime.fromtimestamp(millis / 1000, tz=datetime.timezone.utc)
+    if not date_format:
+        return date.strftime("%Y-%m-%dT%H:%M:%S.") + "{:03d}Z".format(date.microsecond // 1000)
+    for joda, python_format in DATE_FORMAT_LIST:
+        date_format = date_format.replace(joda, python_format)
+    return date.strftime(date_format)
+
+
+def get_interval_start(millis, unit, count):
+    """ Start of the date_histogram bucket containing epoch milliseconds """
+    date = datetime.datetime.fromtimestamp(millis / 1000, tz=datetime.timezone.utc)
+    if unit in ("minute", "hour", "day", "week"):
+        unit_millis = {"minute": 60000, "hour": 3600000, "day": 86400000, "week": 604800000}[unit] * count
+        # epoch is a Thursday, weeks start on Monday
+        offset = 3 * 86400000 if unit == "week" else 0
+        return (millis + offset) // unit_millis * unit_millis - offset
+    months = {"month": 1, "quarter": 3, "year": 12}[unit] * count
+    month_index = (date.year * 12 + date.month - 1) // months * months
+    start = datetime.datetime(month_index // 12, month_index % 12 + 1, 1, tzinfo=datetime.timezone.utc)
+    return get_datetime_millis(start)
+
+
+def get_next_interval_start(millis, unit, count):
+    """ Start of the bucket following the bucket starting at epoch milliseconds """
+    if unit in ("minute", "hour", "day", "week"):
+        return millis + {"minute": 60000, "hour": 3600000, "day": 86400000, "week": 604800000}[unit] * count
+    date = datetime.datetime.fromtimestamp(millis / 1000, tz=datetime.timezone.utc)
+    month_index = date.year * 12 + date.month - 1 + {"month": 1, "quarter": 3, "year": 12}[unit] * count
+    return get_datetime_millis(datetime.datetime(month_index // 12, month_index % 12 + 1, 1,
+                                                 tzinfo=datetime.timezone.utc))
+
+
+def get_interval(body):
+    """ Unit and count of the interval of a date_histogram """
+    interval = body.get("calendar_interval") or body.get("fixed_interval") or body.get("interval")
+    matched = INTERVAL_PATTERN.match(str(interval))
+    if not matched or matched.group(2) not in INTERVAL_UNIT_DICT:
+        raise OfflineRequestError("Unsupported date_histogram interval: {}".format(interval))
+    return INTERVAL_UNIT_DICT[matched.group(2)], int(matched.group(1) or 1)
+
+
+def get_metric_values(body, source_list):
+    """ Values of the field, script or missing value of a metric aggregation over the sources """
+    if "script" in body:
+        script_function = get_script_function(body["script"])
+        values = [script_function(source) for source in source_list]
+        return [value for value in values if value is not None]
+    values = []
+    for source in source_list:
+        field_values = get_field_values(source, body["field"])
+        if len(field_values) == 0 and body.get("missing") is not None:
+            field_values = [body["missing"]]
+        values.extend(field_values)
+    return values
+
+
+def get_numeric_values(values):
+    """ Numeric values of a metric aggregation, dates as epoch milliseconds """
+    numeric_list = [get_comparable(value) for value in values]
+    return [value for value in numeric_list if not isinstance(value, str)], \
+        any(is_date(value) for value in values)
+
+
+def get_sub_aggregations(body):
+    """ Sub-aggregations of an aggregation """
+    return body.get("aggs") or body.get("aggregations") or {}
+
+
+def get_bucket(key, doc_list, sub_aggs):
+    """ Bucket with the doc_count and the sub-aggregations of its documents """
+    bucket = {"key": key, "doc_count": len(doc_list)}
+    bucket.update(get_aggregations(sub_aggs, doc_list))
+    return bucket
+
+
+def get_aggregation(agg_type, body, doc_list, sub_aggs):
+    """ Result of a single aggregation over documents (doc_id, source) """
+    source_list = [source for _, source in doc_list]
+    if agg_type == "cardinality":
+        return {"value": len({get_term(value) for value in get_metric_values(body, source_list)})}
+    if agg_type == "value_count":
+        return {"value": len(get_metric_values(body, source_list))}
+    if agg_type in ("sum", "avg", "min", "max"):
+        values, is_date_value = get_numeric_values(get_metric_values(body, source_list))
+        if agg_type == "sum":
+            return {"value": float(sum(values))}
+        if len(values) == 0:
+            return {"value": None}
+        value = {"avg": lambda: sum(values) / len(values), "min": lambda: min(values),
+                 "max": lambda: max(values)}[agg_type]()
+        result = {"value": float(value)}
+        if is_date_value and agg_type in ("min", "max"):
+            result["value_as_string"] = format_date(value, body.get("format"))
+        return result
+    if agg_type == "percentiles":
+        values, _ = get_numeric_values(get_metric_values(body, source_list))
+        percents = body.get("percents") or DEFAULT_PERCENTS
+        return {"values": {str(float(percent)): float(np.percentile(values, percent)) if values else None
+                           for percent in percents}}
+    if agg_type == "terms":
+        return get_terms_aggregation(body, doc_list, sub_aggs)
+    if agg_type == "date_histogram":
+        return get_date_histogram_aggregation(body, doc_list, sub_aggs)
+    if agg_type == "filter":
+        match = compile_query(body)
+        filtered_list = [(doc_id, source) for doc_id, source in doc_list if match(doc_id, source)]
+        result = {"doc_count": len(filtered_list)}
+        result.update(get_aggregations(sub_aggs, filtered_list))
+        return result
+    if agg_type == "filters":
+        filters = body["filters"]
+        named_list = filters.items() if isinstance(filters, dict) else [(None, query) for query in filters]
+        bucket_list = []
+        for name, query in named_list:
+            match = compile_query(query)
+            bucket = get_bucket(name, [(doc_id, source) for doc_id, source in doc_list if match(doc_id, source)],
+                                sub_aggs)
+            del bucket["key"]
+            bucket_list.append((name, bucket))
+        if isinstance(filters, dict):
+            return {"buckets": dict(bucket_list)}
+        return {"buckets": [bucket for _, bucket in bucket_list]}
+    if agg_type == "top_hits":
+        sort_list = get_sort_list(body.get("sort"))
+        hit_list = get_sorted_hits(doc_list, sort_list)
+        start = body.get("from", 0)
+        return {"hits": {
+            "total": {"value": len(hit_list), "relation": "eq"},
+            "hits": [get_hit("", doc_id, source, sort_values, body.get("_source"), sort_list)
+                     for doc_id, source, sort_values in hit_list[start:start + body.get("size", 3)]]
+        }}
+    raise OfflineRequestError("Unsupported aggregation: {}".format(agg_type))
+
+
+def get_terms_aggregation(body, doc_list, sub_aggs):
+    """ Buckets of a terms aggregation, by doc_count descending then key ascending unless ordered """
+    bucket_dict = {}
+    if "script" in body:
+        script_function = get_script_function(body["script"])
+        key_list_getter = lambda source: [value for value in [script_function(source)] if value is not None]
+    else:
+        key_list_getter = lambda source: get_field_values(source, body["field"])
+    for doc_id, source in doc_list:
+        seen_set = set()
+        for key in key_list_getter(source):
+            term = get_term(key)
+            if term in seen_set:
+                continue
+            seen_set.add(term)
+            bucket_dict.setdefault(term, (key, []))[1].append((doc_id, source))
+    bucket_list = [get_bucket(key, bucket_doc_list, sub_aggs) for key, bucket_doc_list in bucket_dict.values()
+                   if len(bucket_doc_list) >= body.get("min_doc_count", 1)]
+    for bucket in bucket_list:
+        if isinstance(bucket["key"], bool):
+            bucket["key_as_string"] = get_text(bucket["key"])
+            bucket["key"] = int(bucket["key"])
+    bucket_list.sort(key=lambda bucket: get_comparable(bucket["key"]))
+    bucket_list.sort(key=lambda bucket: bucket["doc_count"], reverse=True)
+    for order in reversed(get_clause_list(body.get("order"))):
+        for order_key, direction in order.items():
+            if order_key in ("_key", "_term"):
+                sort_key = lambda bucket: get_comparable(bucket["key"])
+            elif order_key == "_count":
+                sort_key = lambda bucket: bucket["doc_count"]
+            else:
+                agg_name, _, value_name = order_key.partition(".")
+                sort_key = lambda bucket: bucket[agg_name].get(value_name or "value") or 0
+            bucket_list.sort(key=sort_key, reverse=direction == "desc")
+    size = body.get("size", 10)
+    return {
+        "doc_count_error_upper_bound": 0,
+        "sum_other_doc_count": sum(bucket["doc_count"] for bucket in bucket_list[size:]),
+        "buckets": bucket_list[:size]
+    }
+
+
+def get_date_histogram_aggregation(body, doc_list, sub_aggs):
+    """ Buckets of a date_histogram aggregation in UTC, empty buckets between the first and last one
+    are kept when min_doc_count is 0 """
+    unit, count = get_interval(body)
+    bucket_dict = {}
+    for doc_id, source in doc_list:
+        seen_set = set()
+        for value in get_field_values(source, body["field"]):
+            millis = get_comparable(value)
+            if isinstance(millis, str):
+                continue
+            key = get_interval_start(int(millis), unit, count)
+            if key in seen_set:
+                continue
+            seen_set.add(key)
+            bucket_dict.setdefault(key, []).append((doc_id, source))
+    min_doc_count = body.get("min_doc_count", 0)
+    key_list = sorted(bucket_dict)
+    if min_doc_count == 0 and key_list:
+        key_list = [key_list[0]]
+        while get_next_interval_start(key_list[-1], unit, count) <= max(bucket_dict):
+            key_list.append(get_next_interval_start(key_list[-1], unit, count))
+    bucket_list = []
+    for key in key_list:
+        bucket_doc_list = bucket_dict.get(key, [])
+        if len(bucket_doc_list) < min_doc_count:
+            continue
+        bucket = get_bucket(key, bucket_doc_list, sub_aggs)
+        bucket["key_as_string"] = format_date(key, body.get("format"))
+        bucket_list.append(bucket)
+    if body.get("order") == {"_key": "desc"}:
+        bucket_list.reverse()
+    return {"buckets": bucket_list}
+
+
+def get_aggregations(aggs, doc_list):
+    """ Results of the named aggregations over documents (doc_id, source) """
+    result = {}
+    for name, body in aggs.items():
+        agg_type_list = [key for key in body if key not in ("aggs", "aggregations", "meta")]
+        if len(agg_type_list) != 1:
+            raise OfflineRequestError("Aggregation {} must have a single type".format(name))
+        agg_type = agg_type_list[0]
+        result[name] = get_aggregation(agg_type, body[agg_type], doc_list, get_sub_aggregations(body))
+    return result
+
+
+def get_sorted_hits(doc_list, sort_list):
+    """ Documents as (doc_id, source, sort_values), sorted by the sort clauses """
+    hit_list = [(doc_id, source, get_sort_values(doc_id, source, sort_list) if sort_list else None)
+                for doc_id, source in doc_list]
+    if sort_list:
+        hit_list.sort(key=functools.cmp_to_key(
+            lambda hit, other_hit: compare_sort_values(hit[2], other_hit[2], sort_list)))
+    return hit_list
+
+
+def get_hit(index, doc_id, source, sort_values, includes, sort_list):
+    """ Search hit of a document """
+    hit = {"_index": index, "_type": "_doc", "_id": doc_id, "_score": None if sort_list else 1.0}
+    projected = get_source_projection(source, includes)
+    if projected is not None:
+        hit["_source"] = projected
+    if sort_list:
+        hit["sort"] = sort_values
+    return hit
+
+
+def deep_merge(source, doc):
+    """ Merge a partial document into a source like the update api does """
+    for key, value in doc.items():
+        if isinstance(value, dict) and isinstance(source.get(key), dict):
+            deep_merge(source[key], value)
+        else:
+            source[key] = value
+    return source
+
+
+def json_default(value):
+    """ Serialize dates and numpy values like the client serializer """
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Unable to serialize {!r}".format(value))
+
+
+class OfflineSerializer:
+    """ JSON serializer used by the bulk helpers """
+    mimetype = "application/json"
+
+    def dumps(self, data):
+        if isinstance(data, str):
+            return data
+        return json.dumps(data, default=json_default, ensure_ascii=False)
+
+    def loads(self, s):
+        return json.loads(s)
+
+
+class OfflineTransport:
+    """ Transport attribute expected by the bulk helpers """
+
+    def __init__(self):
+        self.serializer = OfflineSerializer()
+
+
+class OfflineIndicesClient:
+    """ Indices api of the offline client """
+
+    def __init__(self, client):
+        self.client = client
+
+    def exists(self, index, **kwargs):
+        return len(self.client.get_index_list(index)) > 0
+
+    def create(self, index, body=None, **kwargs):
+        if self.client.has_index(index):
+            raise OfflineRequestError("Index {} already exists".format(index))
+        self.client.create_index(index, body)
+        return {"acknowledged": True, "index": index}
+
+    def delete(self, index, **kwargs):
+        for name in self.client.get_index_list(index):
+            self.client.delete_index(name)
+        return {"acknowledged": True}
+
+    def flush(self, index=None, **kwargs):
+        return {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+
+    def refresh(self, index=None, **kwargs):
+        return {"_shards": {"total": 1, "successful": 1, "failed": 0}}
+
+    def get_settings(self, index=None, name=None, **kwargs):
+        return {name: {"settings": {"index": {"number_of_shards": "1"}}}
+                for name in self.client.get_index_list(index or "*")}
+
+
+class OfflineClient:
+    """ In-process client serving the search api from a SQLite store
+
+    Sources are parsed once per index and kept in memory, the cache follows the writes of this
+    client and is dropped when another connection changes the store file.
+    """
+
+    def __init__(self, db_path=":memory:"):
+        self.db_path = db_path
+        self.lock = threading.RLock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS index_meta (name TEXT PRIMARY KEY, body TEXT)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS document (index_name TEXT, doc_id TEXT, source TEXT, "
+                                "PRIMARY KEY (index_name, doc_id))")
+        self.connection.commit()
+        self.doc_cache = {}
+        self.index_set = None
+        self.data_version = None
+        self.scroll_dict = {}
+        self.transport = OfflineTransport()
+        self.indices = OfflineIndicesClient(self)
+
+    def check_data_version(self):
+        """ Drop the caches when another connection changed the store """
+        data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version:
+            self.doc_cache = {}
+            self.index_set = None
+            self.data_version = data_version
+
+    def get_index_set(self):
+        """ Names of the indexes created or containing documents """
+        with self.lock:
+            self.check_data_version()
+            if self.index_set is None:
+                self.index_set = {row[0] for row in self.connection.execute("SELECT name FROM index_meta")}
+                self.index_set.update(row[0] for row in
+                                      self.connection.execute("SELECT DISTINCT index_name FROM document"))
+            return self.index_set
+
+    def has_index(self, index):
+        return index in self.get_index_set()
+
+    def get_index_list(self, index):
+        """ Names of the indexes matching a comma separated list of names or wildcard patterns """
+        if isinstance(index, (list, tuple)):
+            pattern_list = list(index)
+        else:
+            pattern_list = str(index or "_all").split(",")
+        index_set = self.get_index_set()
+        name_list = []
+        for pattern in pattern_list:
+            pattern = "*" if pattern in ("_all", "") else pattern.strip()
+            for name in sorted(index_set) if "*" in pattern else [pattern]:
+                if name in index_set and fnmatch.fnmatchcase(name, pattern) and name not in name_list:
+                    name_list.append(name)
+        return name_list
+
+    def get_index_count(self, index):
+        return len(self.get_documents(index))
+
+    def get_documents(self, index):
+        """ Dict of doc_id to source of an index """
+        with self.lock:
+            self.check_data_version()
+            if index not in self.doc_cache:
+                rows = self.connection.execute(
+                    "SELECT doc_id, source FROM document WHERE index_name = ? ORDER BY rowid", (index,))
+                self.doc_cache[index] = {doc_id: json.loads(source) for doc_id, source in rows}
+            return self.doc_cache[index]
+
+    def create_index(self, index, body=None):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO index_meta (name, body) VALUES (?, ?)",
+                                    (index, json.dumps(body or {}, default=json_default)))
+            self.commit()
+            self.get_index_set().add(index)
+
+    def delete_index(self, index):
+        with self.lock:
+            self.connection.execute("DELETE FROM index_meta WHERE name = ?", (index,))
+            self.connection.execute("DELETE FROM document WHERE index_name = ?", (index,))
+            self.commit()
+            self.doc_cache.pop(index, None)
+            self.get_index_set().discard(index)
+
+    def commit(self):
+        """ Commit the writes of this client, its own writes do not invalidate the caches """
+        self.connection.commit()
+        self.data_version = self.connection.execute("PRAGMA data_version").fetchone()[0]
+
+    def save_items(self, item_list):
+        """ Insert or replace documents given as (index, doc_id, source), ids are generated when None
+        :return: dict of index name to the number of saved documents
+        """
+        count_dict = {}
+        with self.lock:
+            row_list = []
+            for index, doc_id, source in item_list:
+                doc_id = str(doc_id) if doc_id is not None else uuid.uuid4().hex
+                row_list.append((index, doc_id, json.dumps(source, default=json_default, ensure_ascii=False)))
+                if index in self.doc_cache:
+                    self.doc_cache[index][doc_id] = json.loads(row_list[-1][2])
+                count_dict[index] = count_dict.get(index, 0) + 1
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO document (index_name, doc_id, source) VALUES (?, ?, ?)", row_list)
+            self.commit()
+            self.get_index_set().update(count_dict)
+        return count_dict
+
+    def delete_items(self, item_list):
+        """ Delete documents given as (index, doc_id)
+        :return: set of the deleted (index, doc_id)
+        """
+        deleted_set = set()
+        with self.lock:
+            for index, doc_id in item_list:
+                if str(doc_id) in self.get_documents(index):
+                    deleted_set.add((index, str(doc_id)))
+                    del self.doc_cache[index][str(doc_id)]
+            self.connection.executemany("DELETE FROM document WHERE index_name = ? AND doc_id = ?",
+                                        list(deleted_set))
+            self.commit()
+        return deleted_set
+
+    def get_matched_documents(self, index, body):
+        """ Documents (index, doc_id, source) of the indexes matching the query of a search body """
+        match = compile_query((body or {}).get("query"),
+                              lambda index, doc_id: self.get_documents(index).get(doc_id))
+        slice_body = (body or {}).get("slice")
+        result_list = []
+        for name in self.get_index_list(index):
+            for doc_id, source in list(self.get_documents(name).items()):
+                if slice_body and zlib.crc32(doc_id.encode("utf-8")) % slice_body["max"] != slice_body["id"]:
+                    continue
+                if match(doc_id, source):
+                    result_list.append((name, doc_id, source))
+        return result_list
+
+    def search(self, index=None, body=None, scroll=None, size=None, from_=None, **kwargs):
+        start_time = time.time()
+        body = body or {}
+        matched_list = self.get_matched_documents(index, body)
+        size = size if size is not None else body.get("size", 10)
+        start = from_ if from_ is not None else body.get("from", 0)
+        sort_list = get_sort_list(body.get("sort"))
+        index_dict = {id(source): name for name, _, source in matched_list}
+        hit_list = get_sorted_hits([(doc_id, source) for _, doc_id, source in matched_list], sort_list)
+        if sort_list and body.get("search_after") is not None:
+            hit_list = [hit for hit in hit_list
+                        if compare_sort_values(hit[2], body["search_after"], sort_list) > 0]
+        hit_list = [get_hit(index_dict[id(source)], doc_id, source, sort_values,
+                            body.get("_source"), sort_list) for doc_id, source, sort_values in hit_list]
+        result = {
+            "timed_out": False,
+            "_shards": {"total": 1, "successful": 1, "skipped": 0, "failed": 0},
+            "hits": {"total": {"value": len(matched_list), "relation": "eq"}, "max_score": None, "hits": []}
+        }
+        aggs = body.get("aggs") or body.get("aggregations")
+        if aggs:
+            result["aggregations"] = get_aggregations(aggs, [(doc_id, source) for _, doc_id, source in matched_list])
+        if scroll:
+            scroll_id = uuid.uuid4().hex
+            with self.lock:
+                self.scroll_dict[scroll_id] = (hit_list[size:], size)
+            result["_scroll_id"] = scroll_id
+            result["hits"]["hits"] = hit_list[:size]
+        else:
+            result["hits"]["hits"] = hit_list[start:start + size]
+        result["took"] = int((time.time() - start_time) * 1000)
+        return result
+
+    def scroll(self, scroll_id=None, body=None, scroll=None, **kwargs):
+        scroll_id = scroll_id or (body or {}).get("scroll_id")
+        with self.lock:
+            if scroll_id not in self.scroll_dict:
+                raise OfflineRequestError("No search context found for id [{}]".format(scroll_id), 404)
+            hit_list, size = self.scroll_dict[scroll_id]
+            self.scroll_dict[scroll_id] = (hit_list[size:], size)
+        return {
+            "_scroll_id": scroll_id,
+            "took": 0,
+            "timed_out": False,
+            "hits": {"total": {"value": len(hit_list), "relation": "eq"}, "max_score": None, "hits": hit_list[:size]}
+        }
+
+    def clear_scroll(self, scroll_id=None, body=None, **kwargs):
+        scroll_id_list = get_clause_list(scroll_id or (body or {}).get("scroll_id"))
+        with self.lock:
+            freed = sum(1 for item in scroll_id_list if self.scroll_dict.pop(item, None) is not None)
+        return {"succeeded": True, "num_freed": freed}
+
+    def count(self, index=None, body=None, **kwargs):
+        return {"count": len(self.get_matched_documents(index, body))}
+
+    def msearch(self, body, index=None, **kwargs):
+        line_list = self.get_ndjson_lines(body)
+        response_list = []
+        for header, search_body in zip(line_list[::2], line_list[1::2]):
+            try:
+                response = self.search(index=header.get("index", index), body=search_body)
+                response["status"] = 200
+            except OfflineRequestError as e:
+                response = {"error": e.info["error"], "status": e.status_code}
+            response_list.append(response)
+        return {"took": 0, "responses": response_list}
+
+    def index(self, index, body, id=None, **kwargs):
+        doc_id = str(id) if id is not None else uuid.uuid4().hex
+        self.save_items([(index, doc_id, body)])
+        return {"_index": index, "_id": doc_id, "result": "created"}
+
+    def delete_by_query(self, index, body=None, **kwargs):
+        matched_list = self.get_matched_documents(index, body)
+        deleted_set = self.delete_items([(name, doc_id) for name, doc_id, _ in matched_list])
+        return {"took": 0, "timed_out": False, "total": len(matched_list), "deleted": len(deleted_set),
+                "failures": []}
+
+    def bulk(self, body, index=None, **kwargs):
+        """ Bulk api accepting the NDJSON body built by the helpers or a list of lines """
+        line_list = self.get_ndjson_lines(body)
+        item_list = []
+        position = 0
+        while position < len(line_list):
+            op_type, action = next(iter(line_list[position].items()))
+            doc_index, doc_id = action.get("_index", index), action.get("_id")
+            position += 1
+            if op_type == "delete":
+                item_list.append((op_type, doc_index, doc_id, None))
+                continue
+            item_list.append((op_type, doc_index, doc_id, line_list[position]))
+            position += 1
+        response_item_list = []
+        with self.lock:
+            pending_dict = {}
+            for op_type, doc_index, doc_id, data in item_list:
+                key = (doc_index, str(doc_id) if doc_id is not None else uuid.uuid4().hex)
+                if key in pending_dict:
+                    existing = pending_dict[key]
+                else:
+                    existing = self.get_documents(doc_index).get(key[1])
+                if op_type == "delete":
+                    pending_dict.pop(key, None)
+                    status, result = (200, "deleted") if self.delete_items([key]) or existing is not None \
+                        else (404, "not_found")
+                elif op_type == "update" and existing is None and not (data.get("doc_as_upsert") or "upsert" in data):
+                    status, result = 404, "document_missing"
+                elif op_type == "update":
+                    source = copy.deepcopy(existing) if existing is not None else data.get("upsert", {})
+                    pending_dict[key] = deep_merge(source, data.get("doc") or {})
+                    status, result = (200, "updated") if existing is not None else (201, "created")
+                elif op_type == "create" and existing is not None:
+                    status, result = 409, "version_conflict"
+                else:
+                    pending_dict[key] = data
+                    status, result = (200, "updated") if existing is not None else (201, "created")
+                item = {"_index": doc_index, "_type": "_doc", "_id": key[1], "status": status, "result": result}
+                if status >= 300:
+                    item["error"] = {"type": result, "reason": "{} of {} failed".format(op_type, key[1])}
+                response_item_list.append({op_type: item})
+            self.save_items([(doc_index, doc_id, source) for (doc_index, doc_id), source in pending_dict.items()])
+        return {"took": 0, "errors": any(list(item.values())[0]["status"] >= 300 for item in response_item_list),
+                "items": response_item_list}
+
+    def get_ndjson_lines(self, body):
+        """ Parsed lines of a NDJSON string or bytes, or of a list of lines """
+        if isinstance(body, bytes):
+            body = body.decode("utf-8")
+        if isinstance(body, str):
+            body = body.split("\n")
+        line_list = []
+        for line in body:
+            if isinstance(line, bytes):
+                line = line.decode("utf-8")
+            if isinstance(line, str):
+                if not line.strip():
+                    continue
+                line = json.loads(line)
+            line_list.append(line)
+        return line_list
+
+    def ping(self, **kwargs):
+        return True
+
+    def info(self, **kwargs):
+        return {"name": "offline", "cluster_name": "offline", "version": {"number": "7.10.2"}}
@@ -1,24 +1,381 @@
 from urllib.parse import urlparse
-from elasticsearch import Elasticsearch, RequestsHttpConnection
+from elasticsearch import Elasticsearch, Urllib3HttpConnection
+from elasticsearch import Transport as ElasticsearchTransport
+from elasticsearch import exceptions as elasticsearch_exceptions
 from elasticsearch import helpers as elasticsearch_helpers
 from opensearchpy import OpenSearch
+from opensearchpy import Transport as OpenSearchTransport
+from opensearchpy import exceptions as opensearchpy_exceptions
 from opensearchpy import helpers as opensearchpy_helpers
+from compass_common.offline_client import is_offline_url, get_offline_client
+from compass_common.list_utils import split_list
+import hashlib
+import json
 import logging
+import os
+import queue
+import random
+import threading
 import time
 import urllib3
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 logger = logging.getLogger(__name__)
+# One json line per traced api call at debug level, slow queries with their DSL at warning level
+query_trace_logger = logging.getLogger(__name__ + ".query_trace")
 urllib3.disable_warnings()
 
-client = None
+client_dict = {}
+client_lock = threading.Lock()
+client_pid = os.getpid()
+slice_count_cache = {}
+request_budget_dict = {}
+request_budget_lock = threading.Lock()
+call_stats_local = threading.local()
+query_trace_config = {"enabled": False, "slow_query_seconds": None}
+query_stats_dict = {}
+query_stats_lock = threading.Lock()
+
+# Options of the clients created by the factory, see set_client_options
+CLIENT_OPTIONS = {
+    "maxsize": 32,  # connections kept alive per host, at least the number of threads sharing the client
+    "http_compress": True,
+    "timeout": 100,
+    "max_retries": 10,
+    "retry_on_timeout": True,
+    "retry_backoff": 0.5,  # seconds, doubled on each retry
+    "retry_backoff_max": 30
+}
+# Status codes of the responses retried besides connection errors
+RETRY_ON_STATUS = (429, 502, 503, 504)
+
+# Api calls traced by TracingClient
+TRACED_API_LIST = ["search", "scroll", "bulk", "delete_by_query", "count", "msearch"]
+# Query keys whose string values are kept in the fingerprint, they name fields and scripts rather than carry values
+FINGERPRINT_KEEP_KEY_LIST = ["field", "source", "inline", "script", "interval", "calendar_interval", "format",
+                             "order", "_source", "includes", "excludes", "path"]
 
 def get_client(url):
-    """ Get default client by url """
-    global client
-    if client:
-        return client
-    client = get_elasticsearch_client(url)
-    return client
+    """ Get the shared elasticsearch client of the url, wrapped with a TracingClient """
+    return get_shared_client(url, get_elasticsearch_client)
+
+
+def get_shared_client(url, create_client):
+    """ Process-wide client of the url, created with create_client on first use.
+
+    The clients are thread safe and pool their keep-alive connections, so every thread of a process
+    shares the same sockets. A forked process creates its own clients instead of reusing the sockets
+    inherited from its parent.
+    """
+    global client_pid
+    key = (create_client.__name__, url)
+    with client_lock:
+        if client_pid != os.getpid():
+            client_dict.clear()
+            client_pid = os.getpid()
+        if key not in client_dict:
+            client_dict[key] = TracingClient(create_client(url))
+        return client_dict[key]
+
+
+def set_client_options(**options):
+    """ Change the options of the clients created from now on, e.g. set_client_options(maxsize=64)
+    Clients already created by get_client keep their options.
+    """
+    unknown_list = [key for key in options if key not in CLIENT_OPTIONS]
+    if unknown_list:
+        raise ValueError("Unknown client options: {}".format(unknown_list))
+    CLIENT_OPTIONS.update(options)
+
+
+class JitterRetryTransportMixin:
+    """ Transport retrying failed requests after an exponential backoff with full jitter
+
+    The transports of the clients wait 2 ** attempt - 1 seconds between retries, so that every thread
+    failing at the same time retries at the same time. Here the wait of a retry is drawn uniformly
+    from [0, min(retry_backoff_max, retry_backoff * 2 ** attempt)].
+    """
+    exceptions = None
+
+    def __init__(self, *args, max_retries=3, retry_backoff=0.5, retry_backoff_max=30, **kwargs):
+        super().__init__(*args, max_retries=0, **kwargs)
+        self.jitter_max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.retry_backoff_max = retry_backoff_max
+
+    def is_retryable(self, error):
+        if isinstance(error, self.exceptions.ConnectionTimeout):
+            return self.retry_on_timeout
+        if isinstance(error, self.exceptions.ConnectionError):
+            return True
+        return error.status_code in self.retry_on_status
+
+    def perform_request(self, method, url, headers=None, params=None, body=None):
+        for attempt in range(self.jitter_max_retries + 1):
+            try:
+                # the transport pops request_timeout and ignore from params
+                return super().perform_request(method, url, headers=headers,
+                                               params=dict(params) if params else params, body=body)
+            except self.exceptions.TransportError as e:
+                if attempt == self.jitter_max_retries or not self.is_retryable(e):
+                    raise
+                delay = random.uniform(0, min(self.retry_backoff_max, self.retry_backoff * 2 ** attempt))
+                logger.debug("Retry {} {} in {:.2f} seconds after {}".format(method, url, delay, e))
+                time.sleep(delay)
+
+
+class ElasticsearchRetryTransport(JitterRetryTransportMixin, ElasticsearchTransport):
+    exceptions = elasticsearch_exceptions
+
+
+class OpenSearchRetryTransport(JitterRetryTransportMixin, OpenSearchTransport):
+    exceptions = opensearchpy_exceptions
+
+def get_request_budget(url, max_concurrent_requests):
+    """ Semaphore bounding the concurrent requests to a cluster, shared by everyone using the same url.
+    The first max_concurrent_requests given for a url wins.
+    """
+    with request_budget_lock:
+        if url not in request_budget_dict:
+            request_budget_dict[url] = threading.BoundedSemaphore(max_concurrent_requests)
+        return request_budget_dict[url]
+
+
+class RequestBudgetClient:
+    """ Client proxy holding a slot of the request budget of the cluster during every api call """
+
+    def __init__(self, client, budget):
+        self.client = client
+        self.budget = budget
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            with self.budget:
+                return attr(*args, **kwargs)
+        return call
+
+
+@contextmanager
+def track_call_stats():
+    """ Collect the api calls made by the current thread through a CallStatsClient
+
+    Yields a dict of the number of calls, the hits returned by search, scroll and msearch
+    and the response bytes, filled when the block exits.
+    """
+    stats = {"calls": 0, "hits": 0, "response_bytes": 0}
+    previous_stats = getattr(call_stats_local, "stats", None)
+    call_stats_local.stats = stats
+    try:
+        yield stats
+    finally:
+        call_stats_local.stats = previous_stats
+
+
+def get_response_hits(response):
+    """ Number of hits of a search, scroll or msearch response """
+    if not isinstance(response, dict):
+        return 0
+    if "responses" in response:
+        return sum(get_response_hits(item) for item in response["responses"])
+    hits = response.get("hits")
+    return len(hits.get("hits") or []) if isinstance(hits, dict) else 0
+
+
+class CallStatsClient:
+    """ Client proxy adding every api call to the call stats of the current thread, see track_call_stats """
+
+    def __init__(self, client):
+        self.client = client
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            stats = getattr(call_stats_local, "stats", None)
+            if stats is not None:
+                stats["calls"] += 1
+                stats["hits"] += get_response_hits(result)
+                stats["response_bytes"] += len(json.dumps(result, default=str)) if isinstance(result, dict) else 0
+            return result
+        return call
+
+
+def set_query_tracing(enabled=True, slow_query_seconds=None):
+    """ Turn on or off the tracing of the TracingClient instances
+    :param slow_query_seconds: queries taking at least this long are logged with their DSL, None to disable
+    """
+    query_trace_config["enabled"] = enabled
+    query_trace_config["slow_query_seconds"] = slow_query_seconds
+
+
+def normalize_query(query, key=None):
+    """ Query DSL with its values replaced by "?", keeping the structure, the field names and the scripts.
+    Lists of scalars collapse to a single "?" and repeated clauses are deduplicated, so that the same
+    query for a different repo list or date has the same shape.
+    """
+    if isinstance(query, dict):
+        return {k: normalize_query(v, k) for k, v in query.items()}
+    if isinstance(query, list):
+        if key in FINGERPRINT_KEEP_KEY_LIST and all(isinstance(item, str) for item in query):
+            return query
+        item_list = []
+        for item in query:
+            item = normalize_query(item, key)
+            if item not in item_list:
+                item_list.append(item)
+        return item_list
+    if key in FINGERPRINT_KEEP_KEY_LIST and isinstance(query, (str, bool)):
+        return query
+    return "?"
+
+
+def get_query_fingerprint(api, index, query):
+    """ Short hash of the api, index and normalized query """
+    normalized = json.dumps([api, index, normalize_query(query)], sort_keys=True, default=str)
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:12]
+
+
+def get_payload_bytes(payload):
+    """ Size of a request body or response once serialized """
+    if payload is None:
+        return 0
+    if isinstance(payload, bytes):
+        return len(payload)
+    if isinstance(payload, str):
+        return len(payload.encode("utf-8"))
+    if isinstance(payload, (list, tuple)):
+        return sum(get_payload_bytes(item) + 1 for item in payload)
+    return len(json.dumps(payload, default=str))
+
+
+def get_response_count(api, response):
+    """ Number of documents a traced api call returned or touched """
+    if not isinstance(response, dict):
+        return 0
+    if api == "count":
+        return response.get("count", 0)
+    if api == "delete_by_query":
+        return response.get("deleted", 0)
+    if api == "bulk":
+        return len(response.get("items") or [])
+    return get_response_hits(response)
+
+
+def record_query_stats(trace, query):
+    """ Add a traced call to the stats of its fingerprint """
+    with query_stats_lock:
+        query_stats = query_stats_dict.get(trace["fingerprint"])
+        if query_stats is None:
+            query_stats = query_stats_dict[trace["fingerprint"]] = {
+                "fingerprint": trace["fingerprint"], "api": trace["api"], "index": trace["index"], "calls": 0,
+                "errors": 0, "seconds": 0.0, "max_seconds": 0.0, "hits": 0, "request_bytes": 0,
+                "response_bytes": 0, "query": normalize_query(query)
+            }
+        query_stats["calls"] += 1
+        query_stats["errors"] += 1 if trace["error"] else 0
+        query_stats["seconds"] += trace["seconds"]
+        query_stats["max_seconds"] = max(query_stats["max_seconds"], trace["seconds"])
+        for key in ["hits", "request_bytes", "response_bytes"]:
+            query_stats[key] += trace[key]
+
+
+def get_query_stats(top_n=None):
+    """ Stats of the traced calls by query fingerprint, the most time consuming first """
+    with query_stats_lock:
+        stats_list = [dict(query_stats, seconds=round(query_stats["seconds"], 4),
+                           max_seconds=round(query_stats["max_seconds"], 4),
+                           avg_seconds=round(query_stats["seconds"] / query_stats["calls"], 4))
+                      for query_stats in query_stats_dict.values()]
+    stats_list.sort(key=lambda x: x["seconds"], reverse=True)
+    return stats_list[:top_n] if top_n else stats_list
+
+
+def clear_query_stats():
+    """ Drop the stats of the traced calls """
+    with query_stats_lock:
+        query_stats_dict.clear()
+
+
+class TracingClient:
+    """ Client facade tracing the search, scroll, bulk, delete_by_query, count and msearch calls
+
+    When tracing is on (see set_query_tracing), every call records the index, the query fingerprint,
+    the latency, the number of hits and the request and response bytes, aggregated by fingerprint in
+    get_query_stats. A scroll page is accounted to the fingerprint of the search that opened the scroll.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.scroll_fingerprint_dict = {}
+        self.scroll_fingerprint_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr) or name not in TRACED_API_LIST and name != "clear_scroll":
+            return attr
+
+        def call(*args, **kwargs):
+            if name == "clear_scroll":
+                with self.scroll_fingerprint_lock:
+                    self.scroll_fingerprint_dict.pop(kwargs.get("scroll_id"), None)
+                return attr(*args, **kwargs)
+            if not query_trace_config["enabled"]:
+                return attr(*args, **kwargs)
+            return self.trace(name, attr, args, kwargs)
+        return call
+
+    def get_trace_target(self, api, args, kwargs):
+        """ Index, query and fingerprint of a call """
+        index = kwargs.get("index")
+        body = kwargs.get("body", args[0] if args else None)
+        if api == "scroll":
+            with self.scroll_fingerprint_lock:
+                index, fingerprint = self.scroll_fingerprint_dict.get(kwargs.get("scroll_id"), (index, None))
+            return index, None, fingerprint or get_query_fingerprint(api, index, None)
+        if api == "bulk":
+            # the actions carry the documents, only the api and index identify a bulk
+            return index, None, get_query_fingerprint(api, index, None)
+        return index, body, get_query_fingerprint(api, index, body)
+
+    def trace(self, api, attr, args, kwargs):
+        """ Run a call and record its trace """
+        index, query, fingerprint = self.get_trace_target(api, args, kwargs)
+        body = kwargs.get("body", args[0] if args else None)
+        trace = {"api": api, "index": index if isinstance(index, str) or index is None else str(index),
+                 "fingerprint": fingerprint, "hits": 0, "request_bytes": get_payload_bytes(body),
+                 "response_bytes": 0, "error": None}
+        start_time = time.perf_counter()
+        try:
+            result = attr(*args, **kwargs)
+        except Exception as e:
+            trace["error"] = type(e).__name__
+            raise
+        else:
+            trace["hits"] = get_response_count(api, result)
+            trace["response_bytes"] = get_payload_bytes(result)
+            scroll_id = result.get("_scroll_id") if isinstance(result, dict) else None
+            if scroll_id:
+                with self.scroll_fingerprint_lock:
+                    self.scroll_fingerprint_dict[scroll_id] = (index, fingerprint)
+            return result
+        finally:
+            trace["seconds"] = time.perf_counter() - start_time
+            record_query_stats(trace, query)
+            query_trace_logger.debug(json.dumps(dict(trace, seconds=round(trace["seconds"], 4))))
+            slow_query_seconds = query_trace_config["slow_query_seconds"]
+            if slow_query_seconds is not None and trace["seconds"] >= slow_query_seconds:
+                query_trace_logger.warning("slow {} on {} took {:.3f}s, fingerprint {}: {}".format(
+                    api, index, trace["seconds"], fingerprint, json.dumps(body, default=str)
+                    if api != "bulk" else "{} bytes of actions".format(trace["request_bytes"])))
+
 
 def get_helpers():
     """ Collection of simple helper functions that abstract some specifics of the raw API """
@@ -26,37 +383,78 @@ def get_helpers():
 
 
 def get_elasticsearch_client(elastic_url):
-    """ Get elasticsearch client by url """
+    """ Create an elasticsearch client by url, `offline://` urls get the in-process offline client.
+    Use get_client to share the client of the url.
+    """
+    if is_offline_url(elastic_url):
+        return get_offline_client(elastic_url)
     is_https = urlparse(elastic_url).scheme == 'https'
     client = Elasticsearch(
         elastic_url, 
         use_ssl=is_https, 
         verify_certs=False, 
-        connection_class=RequestsHttpConnection,
-        timeout=100, 
-        max_retries=10, 
-        retry_on_timeout=True
+        connection_class=Urllib3HttpConnection,
+        transport_class=ElasticsearchRetryTransport,
+        retry_on_status=RETRY_ON_STATUS,
+        **CLIENT_OPTIONS
     )
     return client
 
 
-def get_opensearch_client(url):
-    """ Get opensearch client by url """
+def create_opensearch_client(url):
+    """ Create an opensearch client by url, `offline://` urls get the in-process offline client """
+    if is_offline_url(url):
+        return get_offline_client(url)
     parsed_url = urlparse(url)
     client = OpenSearch(
         hosts=[{'host': parsed_url.hostname, 'port': parsed_url.port}],
-        http_compress=True,
         http_auth=(parsed_url.username, parsed_url.password),
         use_ssl= parsed_url.scheme == 'https',
         verify_certs=False,
         ssl_assert_hostname=False,
-        ssl_show_warn=False
+        ssl_show_warn=False,
+        transport_class=OpenSearchRetryTransport,
+        retry_on_status=RETRY_ON_STATUS,
+        **CLIENT_OPTIONS
     )
     return client
 
-def get_all_index_data(client, index, body):
-    """ Get all index data """
+
+def get_opensearch_client(url):
+    """ Get the shared opensearch client of the url, wrapped with a TracingClient """
+    return get_shared_client(url, create_opensearch_client)
+
+def get_all_index_data(client, index, body, source=None, max_items=None):
+    """ Get all index data
+
+    :param source: optional `_source` projection, e.g. ["uuid", "grimoire_creation_date"]
+    :param max_items: stop after this many hits instead of materializing the whole scroll
+    """
     result_list = []
+    for item in get_generator(client, index, body, source=source):
+        result_list.append(item)
+        if max_items is not None and len(result_list) >= max_items:
+            break
+    return result_list
+
+
+def get_source_body(body, source=None, sort=None):
+    """ Return a shallow copy of the query body with `_source` projection and sort applied """
+    body = dict(body)
+    if source is not None:
+        body["_source"] = source
+    if sort is not None:
+        body["sort"] = sort
+    return body
+
+
+def get_generator(client, index, body, source=None):
+    """ Lazily yield all hits of a query through the scroll api
+
+    The scroll context is released when the generator is exhausted or closed early.
+    :param source: optional `_source` projection, e.g. ["uuid", "grimoire_creation_date"]
+    """
+    body = get_source_body(body, source)
     scroll_wait = 900  #wait for 15 minutes
     page_size = body["size"]
     scroll_id = None
@@ -75,69 +473,210 @@ def get_all_index_data(client, index, body):
                 logger.debug("Scroll acquired after {} seconds".format(scroll_wait - sec))
                 break
 
-    if not page:
-        return result_list
-    
+    if not page or 'too_many_scrolls' in page:
+        return
+
     scroll_id = page["_scroll_id"]
     total = page['hits']['total']
     scroll_size = total['value'] if isinstance(total, dict) else total
 
-    if scroll_size == 0:
+    try:
+        while scroll_size > 0:
+            for item in page['hits']['hits']:
+                yield item
+            page = get_items(client=client, index=index, body=body, size=page_size, scroll_id=scroll_id)
+            if not page:
+                break
+            scroll_id = page.get("_scroll_id", scroll_id)
+            scroll_size = len(page['hits']['hits'])
+    finally:
         free_scroll(client, scroll_id)
-        return result_list
 
-    while scroll_size > 0:
 
-        result_list = result_list + page['hits']['hits']
-        page = get_items(client=client, index=index, body=body, size=page_size, scroll_id=scroll_id)
-        if not page:
-            break
+def get_slice_count(client, index, max_slices=8):
+    """ Choose the number of scroll slices from the number of primary shards of the index """
+    if index in slice_count_cache:
+        return slice_count_cache[index]
+    count = 1
+    try:
+        settings = client.indices.get_settings(index=index, name="index.number_of_shards")
+        shards = sum(int(item["settings"]["index"]["number_of_shards"]) for item in settings.values())
+        count = max(1, min(shards, max_slices))
+    except Exception as e:
+        logger.debug("Error getting shard count of {}: {}".format(index, e))
+    slice_count_cache[index] = count
+    return count
 
-        scroll_size = len(page['hits']['hits'])
-    free_scroll(client, scroll_id)
-    return result_list
 
+def get_sliced_generator(client, index, body, source=None, slices=None, max_slices=8):
+    """ Lazily yield all hits of a query with a sliced scroll read concurrently
 
-def get_generator(client, index, body):
-    scroll_wait = 900  #wait for 15 minutes
+    Each slice is an independent scroll consumed by its own thread, pages are merged into a
+    single iterator in arrival order. Closing the generator early stops the slices and
+    releases their scroll contexts.
+    :param slices: number of slices, None to choose from the shard count of the index
+    :param max_slices: upper bound of the automatic slice count
+    """
+    if slices is None:
+        slices = get_slice_count(client, index, max_slices)
+    if slices <= 1:
+        yield from get_generator(client, index, body, source=source)
+        return
+
+    page_queue = queue.Queue(maxsize=slices * 2)
+    stop_event = threading.Event()
+    done = object()
+
+    def put(item):
+        while not stop_event.is_set():
+            try:
+                page_queue.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read_slice(slice_id):
+        slice_body = dict(body)
+        slice_body["slice"] = {"id": slice_id, "max": slices}
+        try:
+            page = []
+            results = get_generator(client, index, slice_body, source=source)
+            for item in results:
+                page.append(item)
+                if len(page) >= body["size"]:
+                    if not put(page):
+                        results.close()
+                        return
+                    page = []
+            if page:
+                put(page)
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    executor = ThreadPoolExecutor(max_workers=slices)
+    try:
+        for slice_id in range(slices):
+            executor.submit(read_slice, slice_id)
+        finished = 0
+        while finished < slices:
+            page = page_queue.get()
+            if page is done:
+                finished += 1
+            elif isinstance(page, Exception):
+                raise page
+            else:
+                yield from page
+    finally:
+        stop_event.set()
+        executor.shutdown(wait=True)
+
+
+def get_sliced_index_data(client, index, body, source=None, slices=None, max_slices=8):
+    """ Get all index data with a sliced scroll read concurrently """
+    return list(get_sliced_generator(client, index, body, source=source, slices=slices, max_slices=max_slices))
+
+
+def get_search_after_generator(client, index, body, source=None, sort=None, pit_keep_alive="5m"):
+    """ Lazily yield all hits of a query with search_after pagination
+
+    Stateless alternative to scroll. A point in time is opened when the client supports it
+    (opensearch-py `create_pit` or elasticsearch-py `open_point_in_time`), so that pages
+    are read from a consistent view; otherwise plain search_after is used.
+    :param sort: sort clause; `_id` is appended as a tie breaker when missing
+    :param pit_keep_alive: keep alive of the point in time, None to disable it
+    """
+    body = get_source_body(body, source, get_tie_breaker_sort(sort or body.get("sort")))
     page_size = body["size"]
-    scroll_id = None
-    page = get_items(client=client, index=index, body=body, size=page_size, scroll_id=scroll_id)
-    if page and 'too_many_scrolls' in page:
-        sec = scroll_wait
-        while sec > 0:
-            logger.debug("Too many scrolls open, waiting up to {} seconds".format(sec))
-            time.sleep(1)
-            sec -= 1
-            page = get_items(client=client, index=index, body=body, size=page_size, scroll_id=scroll_id)
-            if not page:
-                logger.debug("Waiting for scroll terminated")
-                break
-            if 'too_many_scrolls' not in page:
-                logger.debug("Scroll acquired after {} seconds".format(scroll_wait - sec))
+    pit_id = open_pit(client, index, pit_keep_alive) if pit_keep_alive else None
+    try:
+        while True:
+            if pit_id:
+                body["pit"] = {"id": pit_id, "keep_alive": pit_keep_alive}
+                page = client.search(body=body, size=page_size)
+                pit_id = page.get("pit_id", pit_id)
+            else:
+                page = client.search(index=index, body=body, size=page_size)
+            hits = page['hits']['hits']
+            for item in hits:
+                yield item
+            if len(hits) < page_size:
                 break
+            body["search_after"] = hits[-1]["sort"]
+    finally:
+        close_pit(client, pit_id)
 
-    if not page:
-        return []
-    
-    scroll_id = page["_scroll_id"]
-    total = page['hits']['total']
-    scroll_size = total['value'] if isinstance(total, dict) else total
 
-    if scroll_size == 0:
-        free_scroll(client, scroll_id)
-        return []
+def get_tie_breaker_sort(sort):
+    """ Sort clause list with `_id` appended as a tie breaker when missing, for search_after """
+    sort = list(sort or [])
+    if not any(clause == "_id" or (isinstance(clause, dict) and "_id" in clause) for clause in sort):
+        sort.append({"_id": "asc"})
+    return sort
 
-    while scroll_size > 0:
 
-        for item in page['hits']['hits']:
-            yield item
-        page = get_items(client=client, index=index, body=body, size=page_size, scroll_id=scroll_id)
-        if not page:
-            break
+def get_msearch_hits(client, index, body_list, batch_size=20, max_workers=4):
+    """ All hits of each query of body_list, in the order of body_list
+
+    The queries are sent by msearch requests of batch_size queries, at most max_workers requests at a time.
+    A query whose page is full is read again with search_after instead of being truncated to its size; the
+    other ones keep the order of their hits, as a search of them returns it.
+    :param batch_size: number of queries of a msearch request
+    :param max_workers: number of msearch requests sent concurrently
+    """
+    def search_batch(batch):
+        msearch_body = []
+        for body in batch:
+            msearch_body.append({"index": index})
+            msearch_body.append(body)
+        hits_list = []
+        for body, response in zip(batch, client.msearch(body=msearch_body)["responses"]):
+            if "error" in response:
+                raise Exception(f"msearch on {index} failed: {response['error']}")
+            hits = response["hits"]["hits"]
+            page_size = body.get("size", 10)
+            if 0 < page_size <= len(hits):
+                # a full page, sorted on a tie breaker from the start so that it can be continued
+                hits = list(get_search_after_generator(client, index, dict(body, size=page_size),
+                                                       pit_keep_alive=None))
+            hits_list.append(hits)
+        return hits_list
+
+    batch_list = split_list(body_list, batch_size)
+    if max_workers <= 1 or len(batch_list) <= 1:
+        batch_hits_list = [search_batch(batch) for batch in batch_list]
+    else:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(batch_list))) as executor:
+            batch_hits_list = list(executor.map(search_batch, batch_list))
+    return [hits for hits_list in batch_hits_list for hits in hits_list]
+
+
+def open_pit(client, index, keep_alive="5m"):
+    """ Open a point in time on the index, return None if the client or cluster does not support it """
+    try:
+        if hasattr(client, "create_pit"):
+            return client.create_pit(index=index, params={"keep_alive": keep_alive})["pit_id"]
+        if hasattr(client, "open_point_in_time"):
+            return client.open_point_in_time(index=index, keep_alive=keep_alive)["id"]
+    except Exception as e:
+        logger.debug("Point in time is not available, fall back to search_after: {}".format(e))
+    return None
+
+
+def close_pit(client, pit_id=None):
+    """ Close point in time after use """
+    if not pit_id:
+        return
+    try:
+        if hasattr(client, "delete_pit"):
+            client.delete_pit(body={"pit_id": [pit_id]})
+        elif hasattr(client, "close_point_in_time"):
+            client.close_point_in_time(body={"id": pit_id})
+    except Exception as e:
+        logger.debug("Error releasing point in time: {}".format(pit_id))
 
-        scroll_size = len(page['hits']['hits'])
-    free_scroll(client, scroll_id)
 
 def get_items(client, index, body, size, scroll_id=None, scroll="5m"):
     page = None
@@ -172,4 +711,4 @@ def free_scroll(client, scroll_id=None):
     try:
         client.clear_scroll(scroll_id=scroll_id)
     except Exception as e:
-        logger.debug("Error releasing scroll: {}".scroll_id)
\ No newline at end of file
+        logger.debug("Error releasing scroll: {}".format(scroll_id))
\ No newline at end of file
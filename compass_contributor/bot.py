@@ -5,9 +5,14 @@ from compass_common.uuid_utils import get_uuid
 from datetime import datetime
 import json
 import logging
+import re
 import pkg_resources
 logger = logging.getLogger(__name__)
 
+# Group references and named groups of a pattern, which are renumbered or collide once patterns are joined
+GROUP_REFERENCE_REGEX = re.compile(r"\\[1-9]|\(\?P[<=]|\(\?\(")
+DEFAULT_REGEX_FLAGS = re.compile("").flags
+
 
 class BotService:
     def __init__(self, opensearch_url, bots_index):
@@ -110,6 +115,95 @@ class BotService:
         return bots_dict
 
 
+class BotMatcher:
+    def __init__(self, bots_dict):
+        """ Bot classification built once from the bot dict of BotService.get_dict_by_source or get_bots_info
+
+        The common patterns are matched by a single alternation of them, except the ones whose meaning would
+        change in it, the community and repo bot names are looked up in sets, and the verdict of a (repo, name)
+        is memoized.
+        Args:
+            bots_dict: dict of the common patterns, the bot names per community and the bot names per repo
+        """
+        self.common_regex = None
+        # patterns matched on their own, after the alternation
+        self.common_regex_list = []
+        # an invalid pattern, the patterns after it are not matched and no bot is found from it on
+        self.has_invalid_common = False
+        alternation_list = []
+        for common in bots_dict["common"]:
+            regex = get_compiled_regex(common)
+            if regex is None:
+                self.has_invalid_common = True
+                break
+            if is_joinable_regex(common, regex):
+                alternation_list.append(common)
+            else:
+                self.common_regex_list.append(regex)
+        if len(alternation_list) > 0:
+            try:
+                self.common_regex = re.compile("|".join(f"(?:{common})" for common in alternation_list))
+            except re.error as e:
+                logger.info(f"Bot patterns are matched one by one: {e}")
+                self.common_regex_list = [re.compile(common) for common in alternation_list] + self.common_regex_list
+        self.community_name_set_dict = {community: set(community_values)
+                                        for community, community_values in bots_dict["community"].items()}
+        self.repo_name_set_dict = {repo: set(repo_values) for repo, repo_values in bots_dict["repo"].items()}
+        # memos filled by single dict assignments, shared by the threads of a run without a lock: a lock would
+        # keep the matcher from being pickled to the workers of a process pool
+        self.repo_bot_name_set_dict = {}
+        self.is_bot_dict = {}
+
+    def is_bot(self, repo, author_name):
+        """ Whether the author name of a contributor of the repo is a bot """
+        author_name = str(author_name)
+        key = (repo, author_name)
+        is_bot = self.is_bot_dict.get(key)
+        if is_bot is None:
+            is_bot = self.match(repo, author_name)
+            self.is_bot_dict[key] = is_bot
+        return is_bot
+
+    def match(self, repo, author_name):
+        if self.common_regex is not None and self.common_regex.match(author_name):
+            return True
+        for regex in self.common_regex_list:
+            if regex.match(author_name):
+                return True
+        if self.has_invalid_common:
+            return False
+        if author_name in self.get_repo_bot_name_set(repo):
+            return True
+        return False
+
+    def get_repo_bot_name_set(self, repo):
+        """ Bot names of the repo and of the communities whose name is part of the repo url """
+        bot_name_set = self.repo_bot_name_set_dict.get(repo)
+        if bot_name_set is None:
+            bot_name_set = set(self.repo_name_set_dict.get(repo, set()))
+            for community, community_name_set in self.community_name_set_dict.items():
+                if community in repo:
+                    bot_name_set.update(community_name_set)
+            self.repo_bot_name_set_dict[repo] = bot_name_set
+        return bot_name_set
+
+
+def is_joinable_regex(pattern, regex):
+    """ Whether a pattern matches the same in an alternation of patterns: it has no inline global flag, which
+    would apply to the whole alternation, and no group reference, whose groups would be renumbered
+    """
+    return regex.flags == DEFAULT_REGEX_FLAGS and not (regex.groups > 0 and GROUP_REFERENCE_REGEX.search(pattern))
+
+
+def get_compiled_regex(pattern):
+    """ Compiled pattern, None if it is invalid """
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        logger.info(f"Invalid bot pattern {pattern}: {e}")
+        return None
+
+
 class Bot:
     def __init__(self, contributor, platform_type, community, repo):
         """Bot Information
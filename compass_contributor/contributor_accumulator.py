@@ -0,0 +1,276 @@
+""" Columnar accumulator of the contributions of a repository
+
+Every contribution hit used to become a dict of sets merged into the contributor profiles sharing one
+of its identities, so that the sets of a contributor were copied on each of their contributions. Here a hit
+only appends integers to flat arrays: its contributor id, interned identity and attribute strings, its
+organization and its epoch timestamp per date field. The profiles are built once, when all the hits are
+accumulated: contributors sharing an identity are joined by an IdentityResolver and their organization
+change dates merged, by runs of the same organization, one contribution after the other.
+
+The contributions are resolved in the order of their rank, then in the order they were added, so that the
+hits of several kinds read in a single pass, e.g. the events of all types, give the same profiles as hits
+read one kind after the other.
+"""
+
+from array import array
+from datetime import datetime, timedelta, timezone
+from compass_common.uuid_utils import get_uuid
+from compass_contributor.identity_resolver import IdentityResolver
+import numpy as np
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def get_epoch_micros(date):
+    """ Microseconds since the epoch of an aware datetime """
+    return (date - EPOCH) // timedelta(microseconds=1)
+
+
+def get_iso_date_list(micros_array):
+    """ Epoch microseconds formatted like datetime.isoformat() of UTC datetimes """
+    iso_date_list = []
+    for date in np.datetime_as_string(np.asarray(micros_array, dtype="datetime64[us]"), unit="us").tolist():
+        if date.endswith(".000000"):
+            date = date[:-7]
+        iso_date_list.append(date + "+00:00")
+    return iso_date_list
+
+
+def get_org_date(org, first_time, last_time):
+    """ Organization change date of (domain, org_name) between two epoch microseconds """
+    domain, org_name = org
+    return {
+        "domain": domain,
+        "org_name": org_name,
+        "first_date": (EPOCH + timedelta(microseconds=first_time)).isoformat(),
+        "last_date": (EPOCH + timedelta(microseconds=last_time)).isoformat()
+    }
+
+
+class ContributorAccumulator:
+    def __init__(self, attribute_field_list, merge_org_change_date):
+        """ Accumulate the contributions of a repository from one kind of source, platform or git
+
+        :param attribute_field_list: identity attribute fields of the profiles, e.g. id_git_author_name_list,
+            every profile has them, empty when no contribution set them
+        :param merge_org_change_date: function(old_data_list, new_data_list) merging organization change dates,
+            applied as the merging of per-contribution dicts did, as it depends on the order of the merges
+        """
+        self.attribute_field_list = list(attribute_field_list)
+        self.merge_org_change_date = merge_org_change_date
+        self.identity_resolver = IdentityResolver()
+        self.string_id_dict = {}
+        self.string_list = []
+        self.field_id_dict = {}
+        self.field_list = []
+        self.org_id_dict = {}
+        self.org_list = []
+        # identities of the contributions, the ones of a contribution ending at its identity_end
+        self.contribution_identity = array("q")
+        self.contribution_identity_end = array("q")
+        # organization id of each contribution, -1 without one, its time and its rank
+        self.contribution_org = array("q")
+        self.contribution_time = array("q")
+        self.contribution_rank = array("q")
+        # node of the identity resolver of each contribution, once resolved
+        self.contribution_node = None
+        self.event_contributor = array("q")
+        self.event_field = array("q")
+        self.event_time = array("q")
+        self.attribute_contributor = array("q")
+        self.attribute_field = array("q")
+        self.attribute_value = array("q")
+        # organization change dates of the roots of the contributions, and the run of their latest
+        # contributions to the same organization not merged into them yet: [(domain, org_name), first, last]
+        self.org_change_date_dict = {}
+        self.org_run_dict = {}
+
+    def __len__(self):
+        """ Number of contributions accumulated """
+        return len(self.contribution_time)
+
+    def get_string_id(self, value):
+        string_id = self.string_id_dict.get(value)
+        if string_id is None:
+            string_id = self.string_id_dict[value] = len(self.string_list)
+            self.string_list.append(value)
+        return string_id
+
+    def get_field_id(self, field):
+        field_id = self.field_id_dict.get(field)
+        if field_id is None:
+            field_id = self.field_id_dict[field] = len(self.field_list)
+            self.field_list.append(field)
+        return field_id
+
+    def get_contributor_root_list(self, identity_list):
+        """ Distinct roots of the contributors of the repository having one of the identities, in their order """
+        root_list = []
+        for identity in identity_list:
+            root = self.identity_resolver.get_root(identity)
+            if root is not None and root in self.org_change_date_dict and root not in root_list:
+                root_list.append(root)
+        return root_list
+
+    def add(self, identity_list, attribute_dict, date_field_list, date, org=None, rank=0):
+        """ Accumulate a contribution
+
+        :param identity_list: normalized identities, contributions sharing one belong to the same contributor
+        :param attribute_dict: attribute field to value, None values are skipped
+        :param date_field_list: date fields the contribution date is added to
+        :param date: aware datetime of the contribution
+        :param org: (domain, org_name) of the contribution, None if both are unknown
+        :param rank: the contributions of a lower rank are resolved before the ones of a higher rank
+        :return: index of the contribution
+        """
+        contribution_id = len(self.contribution_time)
+        for identity in identity_list:
+            identity_id = self.get_string_id(identity)
+            self.contribution_identity.append(identity_id)
+            self.attribute_contributor.append(contribution_id)
+            self.attribute_field.append(self.get_field_id("id_identity_list"))
+            self.attribute_value.append(identity_id)
+        self.contribution_identity_end.append(len(self.contribution_identity))
+        for field, value in attribute_dict.items():
+            if value:
+                self.attribute_contributor.append(contribution_id)
+                self.attribute_field.append(self.get_field_id(field))
+                self.attribute_value.append(self.get_string_id(value))
+        time = get_epoch_micros(date)
+        for date_field in date_field_list:
+            self.event_contributor.append(contribution_id)
+            self.event_field.append(self.get_field_id(date_field))
+            self.event_time.append(time)
+        if org is None:
+            self.contribution_org.append(-1)
+        else:
+            org_id = self.org_id_dict.get(org)
+            if org_id is None:
+                org_id = self.org_id_dict[org] = len(self.org_list)
+                self.org_list.append(org)
+            self.contribution_org.append(org_id)
+        self.contribution_time.append(time)
+        self.contribution_rank.append(rank)
+        return contribution_id
+
+    def get_contribution_order(self):
+        """ Contribution ids sorted by rank, then in the order they were added """
+        return np.argsort(np.frombuffer(self.contribution_rank, dtype=np.int64), kind="stable")
+
+    def resolve(self, contribution_order):
+        """ Join the contributions sharing an identity and merge their organizations, in the contribution order """
+        self.contribution_node = [0] * len(self.contribution_time)
+        for contribution_id in contribution_order.tolist():
+            start = self.contribution_identity_end[contribution_id - 1] if contribution_id > 0 else 0
+            identity_list = [self.string_list[identity_id] for identity_id in
+                             self.contribution_identity[start:self.contribution_identity_end[contribution_id]]]
+            other_root_list = self.get_contributor_root_list(identity_list)
+            node_list = [self.identity_resolver.get_node(identity) for identity in identity_list]
+            if len(node_list) == 0:
+                node_list.append(self.identity_resolver.get_node())
+            for node in node_list[1:]:
+                self.identity_resolver.union(node_list[0], node)
+            self.contribution_node[contribution_id] = node_list[0]
+            org_id = self.contribution_org[contribution_id]
+            self.add_org(self.identity_resolver.find(node_list[0]), other_root_list,
+                         self.org_list[org_id] if org_id >= 0 else None, self.contribution_time[contribution_id])
+
+    def add_org(self, root, other_root_list, org, time):
+        """ Merge the organization of a contribution into the contributors sharing one of its identities.
+
+        The organization change dates of a contributor are merged one contribution after the other, so
+        that a run of contributions to the same organization is merged at once when it ends. A contribution
+        joining several contributors merges their dates into its own one after the other.
+
+        :param root: root of the contribution, after it is joined to the other contributors
+        :param other_root_list: roots of the contributors it is joined to, before it was joined
+        """
+        if len(other_root_list) > 1:
+            org_change_date_list = [get_org_date(org, time, time)] if org is not None else []
+            for other_root in other_root_list:
+                org_change_date_list = self.merge_org_change_date(self.pop_org_change_date_list(other_root),
+                                                                  org_change_date_list)
+            self.org_change_date_dict[root] = org_change_date_list
+            return
+        if len(other_root_list) == 1:
+            other_root = other_root_list[0]
+            if root != other_root:
+                self.org_change_date_dict[root] = self.org_change_date_dict.pop(other_root)
+                if other_root in self.org_run_dict:
+                    self.org_run_dict[root] = self.org_run_dict.pop(other_root)
+        else:
+            self.org_change_date_dict[root] = []
+        if org is None:
+            return
+        org_run = self.org_run_dict.get(root)
+        if org_run is not None and org_run[0] == org:
+            org_run[1] = min(org_run[1], time)
+            org_run[2] = max(org_run[2], time)
+            return
+        self.org_change_date_dict[root] = self.pop_org_change_date_list(root)
+        self.org_run_dict[root] = [org, time, time]
+
+    def pop_org_change_date_list(self, root):
+        """ Organization change dates of a root, with its current run merged """
+        org_change_date_list = self.org_change_date_dict.pop(root)
+        org_run = self.org_run_dict.pop(root, None)
+        if org_run is not None:
+            org_change_date_list = self.merge_org_change_date(org_change_date_list, [get_org_date(*org_run)])
+        return org_change_date_list
+
+    def get_root_array(self):
+        """ Root of the identity resolver of every contribution """
+        return np.array([self.identity_resolver.find(node) for node in self.contribution_node],
+                        dtype=np.int64)
+
+    def get_contributor_dict(self, repo, source_type):
+        """ Contributor profiles: uuid to a dict of the attribute and date field sets, the last contribution
+        date and the organization change dates. Called once, when all the contributions are added.
+
+        :param source_type: platform or git, part of the uuid of the profiles
+        """
+        if len(self.contribution_time) == 0:
+            return {}
+        contribution_order = self.get_contribution_order()
+        self.resolve(contribution_order)
+        # contributors are numbered by their root, in the order of their last contribution
+        resolver_root_array, root_array = np.unique(self.get_root_array(), return_inverse=True)
+        root_array = root_array.reshape(-1)
+        contribution_position = np.empty(len(contribution_order), dtype=np.int64)
+        contribution_position[contribution_order] = np.arange(len(contribution_order), dtype=np.int64)
+        last_contribution_id = np.zeros(len(resolver_root_array), dtype=np.int64)
+        np.maximum.at(last_contribution_id, root_array, contribution_position)
+        item_dict = {}
+        for root in np.argsort(last_contribution_id, kind="stable").tolist():
+            item = {"uuid": get_uuid(repo, source_type, str(resolver_root_array[root]))}
+            for field in self.attribute_field_list:
+                item[field] = set()
+            item_dict[root] = item
+
+        if len(self.attribute_contributor) > 0:
+            row_array = np.unique(np.stack([
+                root_array[np.frombuffer(self.attribute_contributor, dtype=np.int64)],
+                np.frombuffer(self.attribute_field, dtype=np.int64),
+                np.frombuffer(self.attribute_value, dtype=np.int64)
+            ], axis=1), axis=0)
+            for root, field_id, value_id in row_array.tolist():
+                item_dict[root].setdefault(self.field_list[field_id], set()).add(self.string_list[value_id])
+
+        event_root = root_array[np.frombuffer(self.event_contributor, dtype=np.int64)]
+        event_time = np.frombuffer(self.event_time, dtype=np.int64)
+        row_array = np.unique(np.stack([event_root, np.frombuffer(self.event_field, dtype=np.int64), event_time],
+                                       axis=1), axis=0)
+        time_array, time_index = np.unique(row_array[:, 2], return_inverse=True)
+        iso_date_list = get_iso_date_list(time_array)
+        for (root, field_id), i in zip(row_array[:, :2].tolist(), time_index.tolist()):
+            item_dict[root].setdefault(self.field_list[field_id], set()).add(iso_date_list[i])
+
+        last_time = np.full(len(resolver_root_array), np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(last_time, event_root, event_time)
+        root_list = list(item_dict.keys())
+        for root, last_date in zip(root_list, get_iso_date_list(last_time[root_list])):
+            item_dict[root]["last_contributor_date"] = last_date
+
+        for root, item in item_dict.items():
+            item["org_change_date_list"] = self.pop_org_change_date_list(resolver_root_array[root].item())
+        return {item["uuid"]: item for item in item_dict.values()}
@@ -1,21 +1,31 @@
 import json
 import yaml
 import re
+import os
+import copy
 import logging
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 from datetime import datetime, timedelta
 import urllib3
-from compass_common.datetime import (datetime_utcnow, str_to_datetime, datetime_to_utc, get_date_list, check_times_has_overlap)
+from compass_common.datetime import (datetime_utcnow, str_to_datetime, datetime_to_utc, get_date_list)
 from compass_common.uuid_utils import get_uuid
-from compass_common.opensearch_utils import get_all_index_data, get_generator, get_client, get_helpers as helpers
+from compass_common.opensearch_utils import (get_generator, get_client,
+                                             get_sliced_index_data, get_helpers as helpers)
 from compass_common.datetime import get_latest_date, get_oldest_date
-from compass_common.list_utils import split_list
-from compass_metrics.contributor_metrics import contributor_eco_type_list
-from compass_metrics.git_metrics import created_since
+from compass_common.commit_pr_index import get_pr_hits_by_commit_hash
+from compass_common.affiliation_timeline import AffiliationTimeline
+from compass_metrics.contributor_metrics import (get_contributor_list,
+                                                 get_contributor_eco_type_list,
+                                                 contributor_eco_date_field_list)
+from compass_metrics.contributor_timeline import ContributorTimeline
 from compass_metrics.db_dsl import get_base_index_mapping
 from compass_contributor.contributor_org import ContributorOrgService
 from compass_contributor.organization import OrganizationService
-from compass_contributor.bot import BotService
-from collections import deque
+from compass_contributor.bot import BotService, BotMatcher
+from compass_contributor.contributor_accumulator import ContributorAccumulator
+from compass_contributor.identity_resolver import group_by_identity
+from compass_contributor.repo_data_context import RepoDataContext
+from bisect import bisect_left
 import pkg_resources
 
 logger = logging.getLogger(__name__)
@@ -27,12 +37,35 @@ MAX_BULK_UPDATE_SIZE = 500
 
 
 exclude_field_list = ["unknown", "-- undefined --"]
+PLATFORM_ATTRIBUTE_FIELD_LIST = ["id_platform_login_name_list", "id_platform_author_name_list",
+                                 "id_platform_author_email_list", "id_identity_list"]
+GIT_ATTRIBUTE_FIELD_LIST = ["id_git_author_name_list", "id_git_author_email_list", "id_identity_list"]
+
+# Events the issue or pr creator can trigger on his own item, they only count when the actor is someone else
+issue_event_creatable_by_creator = {
+    "gitee": ["RenamedTitleEvent", "ChangeDescriptionEvent", "ChangeIssueStateEvent", "ChangeIssueTypeEvent"],
+    "github": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent"],
+    "gitcode": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent", "ChangeDescriptionEvent"]
+}
+pr_event_creatable_by_creator = {
+    "gitee": ["LabeledEvent", "UnlabeledEvent", "ClosedEvent", "ReopenedEvent", "AssignedEvent", 
+        "MilestonedEvent", "DemilestonedEvent", "RenamedTitleEvent", "ChangeDescriptionEvent", "SettingPriorityEvent",
+        "ChangePriorityEvent", "SetTesterEvent", "LinkIssueEvent", "UnlinkIssueEvent"],
+    "github": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent"],
+    "gitcode": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent", "ChangeDescriptionEvent"]
+}
+pr_review_merge_state_list = ["APPROVED", "CHANGES_REQUESTED", "DISMISSED"]
 
 def exclude_special_str(str):
     """ For strings of author names, exclude special characters. """
     regEx = "[`~!#$%^&*()+=|{}':;',\\[\\]<>/?~！#￥%……&*（）——+|{}【】‘；：”“’\"\"。 ，、？]"
     return re.sub(regEx, "",str)
 
+def get_identity_set(value_list):
+    """ Normalized identities of the logins, names and emails of a contributor """
+    return set([exclude_special_str(x.lower()) for x in value_list
+                if x and x.lower() not in exclude_field_list and exclude_special_str(x)])
+
 def get_organizations_info():
     """ Get profile data to determine which organization a contributor belongs to. """
     organizations_dict = {}
@@ -97,14 +130,108 @@ def get_source(issue_index):
         if source in issue_index:
             return source 
     return "github"
-    
+
+
+def get_worker_client(elastic_url):
+    """ Get the client of the current worker, threads share the pooled client of their process. """
+    return get_client(elastic_url)
+
+def run_repo_worker(contributor, repo):
+    """ Executor entry point, process one repository with the client of the current worker. """
+    contributor.client = get_worker_client(contributor.elastic_url)
+    contributor.run_repo(repo)
+    return repo
+
+
+class ProgressJournal:
+    def __init__(self, journal_file):
+        """ Resumable progress journal of a run, one json line per finished repository.
+        :param journal_file: the path of the journal file, created if it does not exist.
+        """
+        self.journal_file = journal_file
+
+    def get_finished_repo_set(self):
+        """ Repositories that have been processed successfully by a previous run """
+        finished_repo_set = set()
+        if not os.path.exists(self.journal_file):
+            return finished_repo_set
+        with open(self.journal_file) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be truncated by a crash
+                    continue
+                if record.get("status") == "finished":
+                    finished_repo_set.add(record["repo"])
+                else:
+                    finished_repo_set.discard(record["repo"])
+        return finished_repo_set
+
+    def record(self, repo, status, error=None):
+        """ Append the result of a repository to the journal """
+        record = {
+            "repo": repo,
+            "status": status,
+            "error": error,
+            "update_at_date": datetime_utcnow().isoformat()
+        }
+        with open(self.journal_file, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class HighWaterMarkStore:
+    def __init__(self, state_file):
+        """ Per-repository high-water mark of the incremental contributor update, one json line per update.
+        :param state_file: the path of the state file, created if it does not exist.
+        """
+        self.state_file = state_file
+
+    def get_dict(self):
+        """ The latest high-water mark of each repository """
+        high_water_mark_dict = {}
+        if not os.path.exists(self.state_file):
+            return high_water_mark_dict
+        with open(self.state_file) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # The last line may be truncated by a crash
+                    continue
+                high_water_mark_dict[record["repo"]] = record["high_water_mark"]
+        return high_water_mark_dict
+
+    def get(self, repo):
+        """ The high-water mark of a repository, None if it has never been processed """
+        return self.get_dict().get(repo)
+
+    def record(self, repo, high_water_mark):
+        """ Append the high-water mark of a repository """
+        record = {
+            "repo": repo,
+            "high_water_mark": high_water_mark,
+            "update_at_date": datetime_utcnow().isoformat()
+        }
+        with open(self.state_file, "a") as f:
+            f.write(json.dumps(record) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
 
 
 class ContributorDevOrgRepo:
     def __init__(self, json_file, issue_index, pr_index, issue_comments_index, pr_comments_index, git_index, 
                 contributors_index, contributors_enriched_index, from_date, end_date, repo_index, event_index=None, 
                 company=None, stargazer_index=None, fork_index=None, level=None, community=None, contributors_org_index=None,
-                organizations_index=None, bots_index=None):
+                organizations_index=None, bots_index=None, event_single_pass=True, commit_scroll_slices=None):
         """ Build a contributor profile of the repository, including issues, pr, commit, organization, etc.
         :param json_file: the path of json file containing repository message.
         :param identities_config_file: the path of json file containing contributor identity message.
@@ -127,6 +254,10 @@ class ContributorDevOrgRepo:
         :param contributors_org_index: contributors org index
         :param level: choose from repo, community.
         :param community: used to mark the repo belongs to which community.
+        :param event_single_pass: read the event index once per repo for all event types,
+            instead of one scroll per event type.
+        :param commit_scroll_slices: number of scroll slices read concurrently when scanning the commits
+            of a repo, None to choose from the shard count of the git index, 1 to use a single scroll.
         """
         self.issue_index = issue_index
         self.pr_index = pr_index
@@ -147,40 +278,131 @@ class ContributorDevOrgRepo:
         self.contributors_org_index = contributors_org_index
         self.level = level
         self.community = community
+        self.event_single_pass = event_single_pass
+        self.commit_scroll_slices = commit_scroll_slices
         self.client = None
         self.source = get_source(issue_index)
         self.all_repo = get_all_repo(json_file, self.source)
 
-        self.platform_item_id_dict = {}
-        self.platform_item_identity_dict = {}
-        self.git_item_id_dict = {}
-        self.git_item_identity_dict = {}
+        self.platform_accumulator = None
+        self.git_accumulator = None
+        self.repo_data_context = None
+        self.bot_matcher = None
         self.date_field_list = []
-
-    def run(self, elastic_url):
-        """Run tasks"""
+        self.high_water_mark_store = None
+        self.enriched_since = None
+        self.touched_date_list = None
+
+    def run(self, elastic_url, workers=1, executor="thread", journal_file=None, high_water_mark_file=None):
+        """Run tasks
+        :param elastic_url: the url of the opensearch database
+        :param workers: number of repositories processed in parallel
+        :param executor: choose from thread, process. Thread workers share the pooled client of the process,
+            each worker process gets a client of its own.
+        :param journal_file: the path of the progress journal, finished repositories are skipped on restart
+        :param high_water_mark_file: the path of the high-water mark state file. If set, a repository
+            that already has a high-water mark is updated incrementally: only items enriched since
+            then are read and merged into the existing contributors, and only the touched weeks
+            are enriched again.
+        :return: the repositories that failed, a failed repository does not stop the others
+        """
+        self.prepare(elastic_url, high_water_mark_file)
+        journal = ProgressJournal(journal_file) if journal_file else None
+        repo_list = self.all_repo
+        if journal:
+            finished_repo_set = journal.get_finished_repo_set()
+            repo_list = [repo for repo in self.all_repo if repo not in finished_repo_set]
+            logger.info(f"journal {journal_file}: {len(finished_repo_set)} finished, {len(repo_list)} remaining")
+
+        failed_repo_list = []
+        if workers <= 1:
+            for repo in repo_list:
+                try:
+                    self.run_repo(repo)
+                except Exception as e:
+                    logger.exception(f"{repo} failed: {e}")
+                    failed_repo_list.append(repo)
+                    if journal:
+                        journal.record(repo, "failed", str(e))
+                    continue
+                if journal:
+                    journal.record(repo, "finished")
+        else:
+            failed_repo_list = self.run_parallel(repo_list, workers, executor, journal)
+        if failed_repo_list:
+            logger.warning(f"{len(failed_repo_list)} repos failed: {failed_repo_list}")
+        return failed_repo_list
+
+    def prepare(self, elastic_url, high_water_mark_file=None):
+        """ Connect to the opensearch database, create the contributor indexes and load the organization
+        and bot profiles, before any repository is processed.
+        :param elastic_url: the url of the opensearch database
+        :param high_water_mark_file: the path of the high-water mark state file
+        """
         self.elastic_url = elastic_url
+        self.high_water_mark_store = HighWaterMarkStore(high_water_mark_file) if high_water_mark_file else None
         self.client = get_client(elastic_url)
         exist = self.client.indices.exists(index=self.contributors_index)
         if not exist:
             self.client.indices.create(index=self.contributors_index, body=get_base_index_mapping())
+        es_exist = self.client.indices.exists(index=self.contributors_enriched_index)
+        if not es_exist:
+            self.client.indices.create(index=self.contributors_enriched_index, body=get_base_index_mapping())
         self.organizations_dict = OrganizationService(self.elastic_url, self.organizations_index).get_dict_domain_exist() \
             if self.organizations_index else get_organizations_info()
         self.bots_dict = BotService(self.elastic_url, self.bots_index).get_dict_by_source(self.source) \
             if self.bots_index else get_bots_info(self.source)
-        for repo in self.all_repo:
-            self.processing_data(repo)
-            self.client.indices.flush(index=self.contributors_index) #Ensure that data has been saved to ES
-            self.contributor_enrich(repo)
+        self.bot_matcher = BotMatcher(self.bots_dict)
+
+    def run_parallel(self, repo_list, workers, executor="thread", journal=None):
+        """ Process repositories in a thread or process pool, a failed repository does not stop the others. """
+        if executor == "thread":
+            executor_class = ThreadPoolExecutor
+        elif executor == "process":
+            executor_class = ProcessPoolExecutor
+        else:
+            raise Exception("Invalid executor param.")
+        # The client is not picklable, workers get the shared client of their process
+        contributor = copy.copy(self)
+        contributor.client = None
+        failed_repo_list = []
+        with executor_class(max_workers=workers) as pool:
+            future_repo_dict = {pool.submit(run_repo_worker, copy.copy(contributor), repo): repo for repo in repo_list}
+            for future in as_completed(future_repo_dict):
+                repo = future_repo_dict[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.exception(f"{repo} failed: {e}")
+                    failed_repo_list.append(repo)
+                    if journal:
+                        journal.record(repo, "failed", str(e))
+                    continue
+                if journal:
+                    journal.record(repo, "finished")
+        return failed_repo_list
+
+    def run_repo(self, repo):
+        """ Generate the contributor profile and the enrichment data of a repository """
+        run_start_date = datetime_utcnow().isoformat()
+        self.enriched_since = self.high_water_mark_store.get(repo) if self.high_water_mark_store else None
+        self.touched_date_list = [] if self.enriched_since else None
+        if self.enriched_since:
+            logger.info(f"{repo} incremental update since {self.enriched_since}")
+        self.processing_data(repo)
+        self.client.indices.flush(index=self.contributors_index) #Ensure that data has been saved to ES
+        self.contributor_enrich(repo)
+        if self.high_water_mark_store:
+            self.high_water_mark_store.record(repo, run_start_date)
 
     def processing_data(self, repo):
         """ Start processing data, generate contributor profiles """
         logger.info(repo + " start")
         start_time = datetime.now()
-        self.platform_item_id_dict = {}
-        self.platform_item_identity_dict = {}
-        self.git_item_id_dict = {}
-        self.git_item_identity_dict = {}
+        self.repo_data_context = RepoDataContext(repo)
+        self.platform_accumulator = ContributorAccumulator(PLATFORM_ATTRIBUTE_FIELD_LIST,
+                                                           self.get_merge_org_change_date)
+        self.git_accumulator = ContributorAccumulator(GIT_ATTRIBUTE_FIELD_LIST, self.get_merge_org_change_date)
         self.date_field_list = []
         self.admin_date_field_list = []
         platform_index_type_dict = {
@@ -248,18 +470,40 @@ class ContributorDevOrgRepo:
             self.date_field_list.append("code_direct_commit_date_list")
             self.admin_date_field_list.append("code_direct_commit_date_list")
             self.processing_commit_data(self.git_index, repo, self.from_date, self.end_date)
-        for index_key, index_values in platform_index_type_dict.items():
+        # the items of a type are ranked by the position of the type, so that the events of all types read in
+        # a single pass give the same profiles as the events read one type after the other
+        event_type_dict = {}
+        if self.event_index and self.event_single_pass:
+            event_type_dict = {index_key: (index_values["date_field"], rank)
+                               for rank, (index_key, index_values) in enumerate(platform_index_type_dict.items())
+                               if index_values["index"] == self.event_index}
+        for rank, (index_key, index_values) in enumerate(platform_index_type_dict.items()):
             if index_values["index"]:
                 if index_values["index"] == self.event_index:
                     self.admin_date_field_list.append(index_values["date_field"])
                 self.date_field_list.append(index_values["date_field"])
-                self.processing_platform_data(index_values["index"], repo, self.from_date, self.end_date, index_values["date_field"], type=index_key)
+                if index_key not in event_type_dict:
+                    self.processing_platform_data(index_values["index"], repo, self.from_date, self.end_date, index_values["date_field"], type=index_key,
+                                                  rank=rank)
+        if event_type_dict:
+            self.processing_event_data(self.event_index, repo, self.from_date, self.end_date, event_type_dict)
         
-        if len(self.platform_item_id_dict) == 0 and len(self.git_item_id_dict) == 0:
+        if len(self.platform_accumulator) == 0 and len(self.git_accumulator) == 0:
+            self.repo_data_context = None
             logger.info(repo + " finish count:" + str(0) + " " + str(datetime.now() - start_time))
             return
 
-        all_items_dict = self.get_merge_platform_git_contributor_data(repo, self.git_item_id_dict, self.platform_item_id_dict)
+        git_item_id_dict = self.git_accumulator.get_contributor_dict(repo, "git")
+        platform_item_id_dict = self.platform_accumulator.get_contributor_dict(repo, "platform")
+        self.platform_accumulator = self.git_accumulator = None
+        all_items_dict = self.get_merge_platform_git_contributor_data(repo, git_item_id_dict, platform_item_id_dict)
+        self.repo_data_context = None
+        old_source_dict = {}
+        if self.enriched_since:
+            all_items_dict, old_source_dict = self.get_merge_existing_contributor_data(repo, all_items_dict)
+            # The merged contributors hold all the dates of the saved ones merged into them, whose weekly
+            # enrichment rows may be under a name or an uuid that no longer exists
+            self.touched_date_list = self.get_contribution_date_list(all_items_dict)
         contributor_org_dict = {}
         if self.contributors_org_index:
             contributor_org_service = ContributorOrgService(self.elastic_url, self.contributors_org_index, self.source)
@@ -268,9 +512,11 @@ class ContributorDevOrgRepo:
                 level=self.level,
                 label=self.community if self.level == 'community' else repo
             )
-        self.delete_contributor(repo, self.contributors_index)
+        if not self.enriched_since:
+            self.delete_contributor(repo, self.contributors_index)
         logger.info(repo + "  save data...")
         all_bulk_data = []
+        save_id_set = set()
         community =repo.split("/")[-2]
         platform_type = repo.split("/")[-3].split(".")[0]
         for item in all_items_dict.values():
@@ -316,7 +562,7 @@ class ContributorDevOrgRepo:
                     "id_platform_login_name_list": id_platform_login_name_list,
                     "id_platform_author_name_list": id_platform_author_name_list,
                     "id_platform_author_email_list": id_platform_author_email_list,
-                    "id_identity_list": list(item.get("id_identity_list", [])),
+                    "id_identity_list": sorted(item.get("id_identity_list", [])),
                     **contribution_date_field_dict,
                     "last_contributor_date": item["last_contributor_date"],
                     "org_change_date_list": org_change_date_list,
@@ -331,15 +577,27 @@ class ContributorDevOrgRepo:
                     "update_at_date": datetime_utcnow().isoformat()
                 }
             }
+            save_id_set.add(contributor_uuid)
+            if self.is_contributor_unchanged(contributor_data["_source"], old_source_dict.get(contributor_uuid)):
+                continue
             all_bulk_data.append(contributor_data)
             if len(all_bulk_data) > MAX_BULK_UPDATE_SIZE:
                 helpers().bulk(client=self.client, actions=all_bulk_data, request_timeout=100)
                 all_bulk_data = []
+        # Existing contributors merged into another one
+        for contributor_uuid in old_source_dict.keys() - save_id_set:
+            all_bulk_data.append({
+                "_op_type": "delete",
+                "_index": self.contributors_index,
+                "_id": contributor_uuid
+            })
         helpers().bulk(client=self.client, actions=all_bulk_data, request_timeout=100)
         logger.info(repo + " finish count:" + str(len(all_items_dict)) + " " + str(datetime.now() - start_time))
 
-    def processing_platform_data(self, index, repo, from_date, to_date, date_field, type="issue"):
-        """ Start processing data, generate gitee, github, gitcode contributor profiles """
+    def processing_platform_data(self, index, repo, from_date, to_date, date_field, type="issue", rank=0):
+        """ Start processing data, generate gitee, github, gitcode contributor profiles
+        :param rank: rank of the items in the contributor accumulator
+        """
         logger.info(f"{repo} {index}  {type} processing...")
         start_time = datetime.now()
         results = []
@@ -360,64 +618,42 @@ class ContributorDevOrgRepo:
 
         count = 0
         for result in results:
-            source = result["_source"]
-            grimoire_creation_date = datetime_to_utc(
-                str_to_datetime(source["grimoire_creation_date"]).replace(tzinfo=None) + timedelta(microseconds=int(source["uuid"], 16) % 100000)).isoformat()
-            user_login = source.get("user_login")
-            if not user_login:
-                continue
-            id_identity_list = [
-                user_login,
-                source.get("auhtor_name") or source.get("actor_name"),
-                source.get("user_email")
-            ]
-            id_identity_list = set(
-                [exclude_special_str(x.lower()) for x in id_identity_list if x and x.lower() not in exclude_field_list and exclude_special_str(x) ])
-            org_change_date_list = []
-            org_name = None
-            domain = None
-            if source.get("user_email") is not None :
-                domain = get_email_prefix_domain(source.get("user_email"))[1]
-                if domain is not None:
-                    org_name = self.get_org_name_by_email(source.get("user_email"))
-            if not org_name:      
-                org_name = source.get('user_org', source.get('user_company', None))
-                if org_name is not None:
-                    org_name = org_name.strip()
-                    org_name = self.organizations_dict[org_name.lower()] if self.organizations_dict.get(org_name.lower()) else org_name
-            if any([org_name, domain]):
-                org_date = {
-                    "domain": domain,
-                    "org_name": org_name,
-                    "first_date": grimoire_creation_date,
-                    "last_date": grimoire_creation_date
-                }
-                org_change_date_list.append(org_date)
-            item = {
-                "uuid": get_uuid(repo, "platform", user_login, source.get("user_email"), grimoire_creation_date),
-                "id_platform_login_name_list": set([user_login] if user_login else []),
-                "id_platform_author_name_list": set([source.get("author_name")] if source.get("author_name") else []),
-                "id_platform_author_email_list": set([source.get("user_email")] if source.get("user_email") else []),
-                "id_identity_list": id_identity_list,
-                date_field: {grimoire_creation_date},
-                "last_contributor_date": grimoire_creation_date,
-                "org_change_date_list": org_change_date_list
-            }
-
-            old_item_dict = {}
-            for identity in id_identity_list:
-                if identity in self.platform_item_identity_dict.keys() and self.platform_item_identity_dict[identity] in self.platform_item_id_dict.keys():
-                    old_item = self.platform_item_id_dict.pop(self.platform_item_identity_dict[identity])
-                    old_item_dict[old_item["uuid"]] = old_item
-            if len(old_item_dict) > 0:
-                item = self.get_merge_old_new_contributor_data(old_item_dict, {item["uuid"]: item})[0][item["uuid"]]
-
-            self.platform_item_id_dict[item["uuid"]] = item
-            for identity in item["id_identity_list"]:
-                self.platform_item_identity_dict[identity] = item["uuid"]
-            count += 1
+            if self.processing_platform_item(repo, result["_source"], date_field, rank):
+                count += 1
         logger.info(repo + " " + index + " finish count:" + str(count) + " " + str(datetime.now() - start_time))
 
+    def processing_platform_item(self, repo, source, date_field, rank=0):
+        """ Add a gitee, github, gitcode item to the contributor profiles, return False if it is skipped """
+        grimoire_creation_date = datetime_to_utc(
+            str_to_datetime(source["grimoire_creation_date"]).replace(tzinfo=None) + timedelta(microseconds=int(source["uuid"], 16) % 100000))
+        user_login = source.get("user_login")
+        if not user_login:
+            return False
+        id_identity_list = get_identity_set([
+            user_login,
+            source.get("auhtor_name") or source.get("actor_name"),
+            source.get("user_email")
+        ])
+        org_name = None
+        domain = None
+        if source.get("user_email") is not None :
+            domain = get_email_prefix_domain(source.get("user_email"))[1]
+            if domain is not None:
+                org_name = self.get_org_name_by_email(source.get("user_email"))
+        if not org_name:      
+            org_name = source.get('user_org', source.get('user_company', None))
+            if org_name is not None:
+                org_name = org_name.strip()
+                org_name = self.organizations_dict[org_name.lower()] if self.organizations_dict.get(org_name.lower()) else org_name
+        attribute_dict = {
+            "id_platform_login_name_list": user_login,
+            "id_platform_author_name_list": source.get("author_name"),
+            "id_platform_author_email_list": source.get("user_email")
+        }
+        self.platform_accumulator.add(id_identity_list, attribute_dict, [date_field], grimoire_creation_date,
+                                      (domain, org_name) if any([org_name, domain]) else None, rank)
+        return True
+
     def processing_commit_data(self, index, repo, from_date, to_date):
         """ Start processing data, generate commit contributor profiles """
 
@@ -485,30 +721,18 @@ class ContributorDevOrgRepo:
         logger.info(repo + " " + index + " processing...")
         created_at = self.get_repo_created(repo)
         start_time = datetime.now()
-        
-        commit_hash = self.get_commit_hash_data(index, repo, from_date, to_date, page_size)
-        pr_hits = []
-        hash_list = [result["_source"]["hash"] for result in commit_hash]
-        hash_list_group = split_list(hash_list)
-        for hash_l in hash_list_group:
-            pr_hit = self.get_pr_list_by_commit_hash(repo, hash_l)
-            pr_hits = pr_hits + pr_hit
-        pr_data_dict = {}
-        for pr_hit in pr_hits:
-            if pr_hit["_source"].get("merge_commit_sha"):
-                pr_data_dict[pr_hit["_source"]["merge_commit_sha"]] = pr_hit["_source"]
-            for pr_commit_hash in pr_hit["_source"]["commits_data"]:
-                pr_data_dict[pr_commit_hash] = pr_hit["_source"]
 
         results = self.get_commit_enrich_data(index, repo, from_date, to_date, page_size)
+        pr_data_dict = self.get_pr_data_dict(repo, [result["_source"]["hash"] for result in results])
         count = 0
         for result in results:
             source = result["_source"]
             if not source.get("author_name"):
                 continue
-            grimoire_creation_date = datetime_to_utc(
-                str_to_datetime(source["grimoire_creation_date"]).replace(tzinfo=None) + timedelta(microseconds=int(source["uuid"], 16) % 100000)).isoformat()
-            
+            creation_date = datetime_to_utc(
+                str_to_datetime(source["grimoire_creation_date"]).replace(tzinfo=None) + timedelta(microseconds=int(source["uuid"], 16) % 100000))
+            grimoire_creation_date = creation_date.isoformat()
+
             code_direct_commit_date = None
             if created_at is not None and grimoire_creation_date >= created_at and source["hash"] not in pr_data_dict \
                     and (
@@ -525,44 +749,21 @@ class ContributorDevOrgRepo:
                     continue
                 author_type = author_item["type"]
                 date_field = author_type + "_date_list"
-                id_identity_list = [author_item["author_name"], author_item["author_email"]]
-                id_identity_list = set(
-                    [exclude_special_str(x.lower()) for x in id_identity_list if x and x.lower() not in exclude_field_list and exclude_special_str(x) ])
-                org_change_date_list = []
+                id_identity_list = get_identity_set([author_item["author_name"], author_item["author_email"]])
+                org = None
                 if author_item["author_email"] is not None:
                     domain = get_email_prefix_domain(author_item["author_email"])[1]
                     if domain is not None:
-                        org_name = self.get_org_name_by_email(author_item["author_email"])
-                        org_date = {
-                            "domain": domain,
-                            "org_name": org_name,
-                            "first_date": grimoire_creation_date,
-                            "last_date": grimoire_creation_date
-                        }
-                        org_change_date_list.append(org_date)
-                item = {
-                    "uuid": get_uuid(repo, "git", author_item["author_name"], author_item["author_email"], grimoire_creation_date),
-                    "id_git_author_name_list": set([author_item.get("author_name")] if author_item.get("author_name") else []),
-                    "id_git_author_email_list": set([author_item.get("author_email")] if author_item.get("author_email") else []),
-                    "id_identity_list": id_identity_list,
-                    date_field: {grimoire_creation_date},
-                    "last_contributor_date": grimoire_creation_date,
-                    "org_change_date_list": org_change_date_list
+                        org = (domain, self.get_org_name_by_email(author_item["author_email"]))
+                date_field_list = [date_field]
+                if code_direct_commit_date and author_type == "code_author" \
+                        and author_item["author_name"] == source["author_name"]:
+                    date_field_list.append("code_direct_commit_date_list")
+                attribute_dict = {
+                    "id_git_author_name_list": author_item.get("author_name"),
+                    "id_git_author_email_list": author_item.get("author_email")
                 }
-                if author_type == "code_author" and author_item["author_name"] == source["author_name"]:
-                    item["code_direct_commit_date_list"] = {code_direct_commit_date} if code_direct_commit_date else set()
-
-                old_item_dict = {}
-                for identity in id_identity_list:
-                    if identity in self.git_item_identity_dict.keys() and self.git_item_identity_dict[identity] in self.git_item_id_dict.keys():
-                        old_item = self.git_item_id_dict.pop(self.git_item_identity_dict[identity])
-                        old_item_dict[old_item["uuid"]] = old_item
-                if len(old_item_dict) > 0:
-                    item = self.get_merge_old_new_contributor_data(old_item_dict, {item["uuid"]: item})[0][item["uuid"]]
-
-                self.git_item_id_dict[item["uuid"]] = item
-                for identity in item["id_identity_list"]:
-                    self.git_item_identity_dict[identity] = item["uuid"]
+                self.git_accumulator.add(id_identity_list, attribute_dict, date_field_list, creation_date, org)
                 count += 1
         logger.info(repo + " " + index + " finish count:" + str(count) + " " + str(datetime.now() - start_time))
 
@@ -601,7 +802,10 @@ class ContributorDevOrgRepo:
         return result_data_list
 
     def get_merge_platform_git_contributor_data(self, repo, git_data_dict, platform_data_dict):
-        """ Merging platform contributors and commit contributors """
+        """ Merging platform contributors and commit contributors. A platform contributor absorbs the commit
+        contributors of the commit authors of its pull requests, a commit contributor being absorbed by the
+        first platform contributor only, then the commit contributors left are merged by identity.
+        """
         new_git_data_dict = git_data_dict.copy()
         new_platform_data_dict = {}
         login_author_name_dict = self.get_platform_login_git_author_dict(repo)
@@ -631,24 +835,14 @@ class ContributorDevOrgRepo:
         created_at = self.get_repo_created(repo)
         if created_at is None:
             return login_author_name_dict
-        query_dsl = self.get_enrich_dsl("tag", repo + ".git", self.from_date, self.end_date, page_size)
-        query_dsl["query"]["bool"]["filter"].append({"range": {"grimoire_creation_date": {"gte": created_at}}})
-        results = get_all_index_data(self.client, index=self.git_index, body=query_dsl)
+        created_at_date = str_to_datetime(created_at)
+        results = [result for result in self.get_commit_enrich_data(self.git_index, repo, self.from_date,
+                                                                    self.end_date, page_size)
+                   if str_to_datetime(result["_source"]["grimoire_creation_date"]) >= created_at_date]
         if len(results) == 0:
             return login_author_name_dict
-        pr_hits = []
         hash_git_dict = {result["_source"]["hash"]:result for result in results}
-        hash_set = set(hash_git_dict.keys())
-        hash_list_group = split_list(list(hash_set))
-        for hash_l in hash_list_group:
-            pr_hit = self.get_pr_list_by_commit_hash(repo, hash_l)
-            pr_hits = pr_hits + pr_hit
-        pr_data_dict = {}
-        for pr_hit in pr_hits:
-            if pr_hit["_source"].get("merge_commit_sha"):
-                pr_data_dict[pr_hit["_source"]["merge_commit_sha"]] = pr_hit["_source"]
-            for pr_commit_hash in pr_hit["_source"]["commits_data"]:
-                pr_data_dict[pr_commit_hash] = pr_hit["_source"]
+        pr_data_dict = self.get_pr_data_dict(repo, list(hash_git_dict.keys()))
         for hit in results:
             data = hit["_source"]
             commit_author_name = data["author_name"]
@@ -690,40 +884,84 @@ class ContributorDevOrgRepo:
 
     def get_git_list_by_hash_list(self, repo, hash_list):
         """ Get a list of commit details based on the hash of the commit. """
-        git_query_dsl = self.get_enrich_dsl("tag", repo + ".git", "1970-01-01", "2099-01-01", page_size, [])
+        git_query_dsl = self.get_enrich_dsl("tag", repo + ".git", "1970-01-01", "2099-01-01", page_size, [], incremental=False)
         git_query_dsl["query"]["bool"]["must"].append({"terms": {"hash": hash_list}})
         git_list = self.client.search(index=self.git_index, body=git_query_dsl)["hits"]["hits"]
         return git_list
 
     def get_merge_old_new_contributor_data(self, old_data_dict, new_data_dict):
-        """ Merge old contributors into new contributors """
+        """ Merge old contributors into the new contributors sharing an identity with them, directly or
+        through other contributors of the other side. Return the merged new contributors and the uuids of the
+        old ones merged.
+        """
         result_item_dict = {}
-        identity_dict = {identity: item for item in old_data_dict.values() for identity in item["id_identity_list"]}
-        result_identity_uuid_dict = {}
         merge_id_set = set()
-        for uuid, item in new_data_dict.items():
-            old_data_list_dict = {}
-            for identity in item["id_identity_list"]:
-                if identity in identity_dict.keys():
-                    old_data_list_dict[identity_dict[identity]["uuid"]] = identity_dict[identity]
-
-            if len(old_data_list_dict) == 0:
-                result_item_dict[uuid] = item
+        for group in group_by_identity(new_data_dict, old_data_dict):
+            new_uuid, item = group[0]
+            if new_uuid not in new_data_dict:
                 continue
-            for old_data in old_data_list_dict.values():
-                if old_data["uuid"] in merge_id_set:
-                    for identity in item["id_identity_list"]:
-                        if identity in result_identity_uuid_dict.keys() and result_identity_uuid_dict[identity] in result_item_dict.keys():
-                            old_data = result_item_dict.pop(result_identity_uuid_dict[identity])
-                            break
-                else:
-                    merge_id_set.add(old_data["uuid"])
-                item = self.get_merge_contributor_data(item, old_data)
-            result_item_dict[item["uuid"]] = item
-            for identity_list in item["id_identity_list"]:
-                result_identity_uuid_dict[identity_list] = item["uuid"]
+            for uuid, data in group[1:]:
+                item = self.get_merge_contributor_data(item, data)
+                if uuid not in new_data_dict:
+                    merge_id_set.add(uuid)
+            result_item_dict[new_uuid] = item
         return result_item_dict, merge_id_set
 
+    def get_merge_existing_contributor_data(self, repo, new_data_dict):
+        """ Merge the contributors of an incremental update into the contributors already saved,
+        return the merged contributors and the saved sources of the contributors merged into them.
+        """
+        old_data_dict = {}
+        old_source_dict = {}
+        query = {
+            "size": page_size,
+            "query": {
+                "bool": {
+                    "must": [
+                        {
+                            "match_phrase": {
+                                "repo_name.keyword": repo
+                            }
+                        }
+                    ]
+                }
+            }
+        }
+        for hit in get_generator(self.client, index=self.contributors_index, body=query):
+            old_source_dict[hit["_id"]] = hit["_source"]
+            old_data_dict[hit["_id"]] = self.get_contributor_data_by_source(hit["_id"], hit["_source"])
+        result_item_dict, merge_id_set = self.get_merge_old_new_contributor_data(old_data_dict, new_data_dict)
+        logger.info(f"{repo} incremental update: {len(new_data_dict)} new, {len(merge_id_set)} merged into existing")
+        return result_item_dict, {uuid: old_source_dict[uuid] for uuid in merge_id_set}
+
+    def get_contributor_data_by_source(self, uuid, source):
+        """ Convert a saved contributor back to the structure used while processing """
+        contributor_data = {
+            "uuid": uuid,
+            "last_contributor_date": source["last_contributor_date"],
+            "org_change_date_list": list(source.get("email_org_change_date_list") or [])
+        }
+        for field in ["id_git_author_name_list", "id_git_author_email_list", "id_platform_login_author_name_list",
+                      "id_platform_login_name_list", "id_platform_author_name_list", "id_platform_author_email_list",
+                      "id_identity_list"] + self.date_field_list:
+            contributor_data[field] = set(source.get(field) or [])
+        return contributor_data
+
+    def get_contribution_date_list(self, contributor_data_dict):
+        """ Sorted days on which the given contributors have contributed """
+        date_set = set()
+        for item in contributor_data_dict.values():
+            for date_field in self.date_field_list:
+                date_set.update(date[:10] for date in item.get(date_field, []))
+        return sorted(date_set)
+
+    def is_contributor_unchanged(self, new_source, old_source):
+        """ Whether a contributor is the same as the saved one, apart from the update time """
+        if old_source is None:
+            return False
+        return {k: v for k, v in new_source.items() if k != "update_at_date"} == \
+            {k: v for k, v in old_source.items() if k != "update_at_date"}
+
     def get_merge_contributor_data(self, contributor1, contributor2):
         """ Two contributors are the same person, merge them. """
         id_platform_login_name_list = contributor1.get("id_platform_login_name_list", set())
@@ -771,8 +1009,10 @@ class ContributorDevOrgRepo:
         contributor1["org_change_date_list"] = org_change_date_list
         return contributor1
 
-    def get_enrich_dsl(self, repo_field, repo, from_date, to_date, page_size=100, source=None):
-        """ Query statement to get enrich information """
+    def get_enrich_dsl(self, repo_field, repo, from_date, to_date, page_size=100, source=None, incremental=True):
+        """ Query statement to get enrich information
+        :param incremental: only match the items enriched since the high-water mark of an incremental update
+        """
         query = {
             "size": page_size,
             "query": {
@@ -797,6 +1037,8 @@ class ContributorDevOrgRepo:
                 }
             }
         }
+        if incremental and self.enriched_since:
+            query["query"]["bool"]["filter"].append({"range": {"metadata__enriched_on": {"gte": self.enriched_since}}})
         if source is not None:
             query["_source"] = source
         return query
@@ -841,12 +1083,7 @@ class ContributorDevOrgRepo:
         query_dsl = self.get_enrich_dsl("tag", repo, from_date, to_date, page_size)
         query_dsl["query"]["bool"]["must"].append({"match_phrase": {"pull_request": "false"}})
         query_dsl["query"]["bool"]["must"].append({"match_phrase": {"event_type": type}})
-        event_creatable_by_creator = {
-            "gitee": ["RenamedTitleEvent", "ChangeDescriptionEvent", "ChangeIssueStateEvent", "ChangeIssueTypeEvent"],
-            "github": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent"],
-            "gitcode": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent", "ChangeDescriptionEvent"]
-        }
-        if self.source in event_creatable_by_creator and type in event_creatable_by_creator[self.source]:
+        if self.source in issue_event_creatable_by_creator and type in issue_event_creatable_by_creator[self.source]:
             query_dsl["query"]["bool"]["must"].append({
                 "script": {
                     "script": "doc['actor_username'].size() > 0 && doc['reporter_user_name'].size() > 0 &&  doc['actor_username'].value != doc['reporter_user_name'].value"
@@ -860,14 +1097,7 @@ class ContributorDevOrgRepo:
         query_dsl = self.get_enrich_dsl("tag", repo, from_date, to_date, page_size)
         query_dsl["query"]["bool"]["must"].append({"match_phrase": {"pull_request": "true"}})
         query_dsl["query"]["bool"]["must"].append({"match_phrase": {"event_type": type}})
-        event_creatable_by_creator = {
-            "gitee": ["LabeledEvent", "UnlabeledEvent", "ClosedEvent", "ReopenedEvent", "AssignedEvent", 
-                "MilestonedEvent", "DemilestonedEvent", "RenamedTitleEvent", "ChangeDescriptionEvent", "SettingPriorityEvent",
-                "ChangePriorityEvent", "SetTesterEvent", "LinkIssueEvent", "UnlinkIssueEvent"],
-            "github": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent"],
-            "gitcode": ["ClosedEvent", "ReopenedEvent", "RenamedTitleEvent", "ChangeDescriptionEvent"]
-        }
-        if self.source in event_creatable_by_creator and type in event_creatable_by_creator[self.source]:
+        if self.source in pr_event_creatable_by_creator and type in pr_event_creatable_by_creator[self.source]:
             query_dsl["query"]["bool"]["must"].append({
                 "script": {
                     "script": "doc['actor_username'].size() > 0 && doc['reporter_user_name'].size() > 0 &&  doc['actor_username'].value != doc['reporter_user_name'].value"
@@ -876,28 +1106,68 @@ class ContributorDevOrgRepo:
         if type in "PullRequestReview":
             query_dsl["query"]["bool"]["must"].append({
                 "terms": {
-                    "merge_state": [
-                        "APPROVED",
-                        "CHANGES_REQUESTED",
-                        "DISMISSED"
-                    ]
+                    "merge_state": pr_review_merge_state_list
                 }
             })
         results = get_generator(self.client, index=index, body=query_dsl)
         return results
 
+    def processing_event_data(self, index, repo, from_date, to_date, event_type_dict):
+        """ Read the issue and pr event index once for all event types, each event being added to the contributor
+        profiles as it is read
+        :param event_type_dict: platform_index_type_dict key of the event types to their date field and rank,
+            e.g. {"issue_LabeledEvent": ("issue_labeled_date_list", 4)}
+        """
+        logger.info(f"{repo} {index} events processing...")
+        start_time = datetime.now()
+        event_type_list = sorted({re.sub(r"^(issue|pr)_", "", type) for type in event_type_dict})
+        query_dsl = self.get_enrich_dsl("tag", repo, from_date, to_date, page_size)
+        query_dsl["query"]["bool"]["must"].append({"terms": {"event_type": event_type_list}})
+        count = 0
+        for hit in get_generator(self.client, index=index, body=query_dsl):
+            event_type = event_type_dict.get(self.get_event_type_key(hit["_source"]))
+            if event_type and self.processing_platform_item(repo, hit["_source"], *event_type):
+                count += 1
+        logger.info(repo + " " + index + " finish count:" + str(count) + " " + str(datetime.now() - start_time))
+
+    def get_event_type_key(self, source):
+        """ Get the platform_index_type_dict key of an event, None if the event is not counted """
+        pull_request = str(source.get("pull_request")).lower()
+        event_type = source.get("event_type")
+        if pull_request == "true":
+            event_creatable_by_creator = pr_event_creatable_by_creator
+            event_type_key = "pr_" + str(event_type)
+        elif pull_request == "false":
+            event_creatable_by_creator = issue_event_creatable_by_creator
+            event_type_key = "issue_" + str(event_type)
+        else:
+            return None
+        if self.source in event_creatable_by_creator and event_type in event_creatable_by_creator[self.source]:
+            actor_username = source.get("actor_username")
+            reporter_user_name = source.get("reporter_user_name")
+            if not actor_username or not reporter_user_name or actor_username == reporter_user_name:
+                return None
+        if event_type_key == "pr_PullRequestReview" and source.get("merge_state") not in pr_review_merge_state_list:
+            return None
+        return event_type_key
+
+    def get_repo_data_context(self, repo):
+        """ Data of the repository being processed, read once for all the stages """
+        if self.repo_data_context is None or self.repo_data_context.repo != repo:
+            self.repo_data_context = RepoDataContext(repo)
+        return self.repo_data_context
+
     def get_commit_enrich_data(self, index, repo, from_date, to_date, page_size=100):
-        """ Get commit data list """
-        query_dsl = self.get_enrich_dsl("tag", repo + ".git", from_date, to_date, page_size)
-        results = get_generator(self.client, index=index, body=query_dsl)
-        return results
+        """ Get commit data list, scanned once per repository """
+        def load():
+            query_dsl = self.get_enrich_dsl("tag", repo + ".git", from_date, to_date, page_size)
+            return get_sliced_index_data(self.client, index=index, body=query_dsl, slices=self.commit_scroll_slices)
+        return self.get_repo_data_context(repo).get(("commit", index, from_date, to_date), load)
 
-    def get_commit_hash_data(self, index, repo, from_date, to_date, page_size=100):
-        """ Get commit data list """
-        source = ["hash"]
-        query_dsl = self.get_enrich_dsl("tag", repo + ".git", from_date, to_date, page_size, source=source)
-        results = get_all_index_data(self.client, index=index, body=query_dsl)
-        return results
+    def get_pr_data_dict(self, repo, hash_list):
+        """ Commit hash to the merged pull request containing it, each hash is looked up once per repository """
+        return self.get_repo_data_context(repo).commit_pr_index.get_pr_data_dict(
+            hash_list, lambda hash_l: self.get_pr_list_by_commit_hash(repo, hash_l))
 
     def get_org_name_by_email(self, email):
         """ Return organization name based on email """
@@ -914,23 +1184,7 @@ class ContributorDevOrgRepo:
     def is_bot_by_author_name(self, repo, author_name):
         """ Determine if a bot is a bot by author name """
         try:
-            author_name = str(author_name)
-            common_list = self.bots_dict["common"]
-            if len(common_list) > 0:
-                for common in common_list:
-                    regex = re.compile(common)
-                    if regex.match(author_name):
-                        return True
-            community_dict = self.bots_dict["community"]
-            if len(community_dict) > 0:
-                for community, community_values in community_dict.items():
-                    if community in repo and author_name in community_values:
-                        return True
-            repo_dict = self.bots_dict["repo"]
-            if len(repo_dict) > 0:
-                if repo_dict.get(repo) and author_name in repo_dict.get(repo):
-                    return True
-            return False
+            return self.bot_matcher.is_bot(repo, author_name)
         except Exception as e:
             logger.info(f"Error: {e} repo: {repo} author_name: {author_name}")
             return False
@@ -951,6 +1205,10 @@ class ContributorDevOrgRepo:
 
     def get_repo_created(self, repo):
         """ Get repository creation time """
+        return self.get_repo_data_context(repo).get("created_at", lambda: self.search_repo_created(repo))
+
+    def search_repo_created(self, repo):
+        """ Search the repository creation time """
         repo_query = {
             "size": 1,
             "query": {
@@ -1006,8 +1264,15 @@ class ContributorDevOrgRepo:
         self.client.delete_by_query(index=contributors_index, body=query, request_timeout=100)
 
     def get_pr_list_by_commit_hash(self, repo, hash_list):
-        """ Get PR list based on commit hash value """
-        pr_query = {
+        """ Get PR list based on commit hash value, all the hashes are looked up by msearch """
+        return get_pr_hits_by_commit_hash(self.client, self.pr_index, hash_list,
+                                          lambda hash_terms: self.get_pr_query_by_commit_hash(repo, hash_terms))
+
+    def get_pr_query_by_commit_hash(self, repo, hash_terms):
+        """ Query of the merged PRs of the commit hashes
+        :param hash_terms: list of commit hashes or a terms lookup of them
+        """
+        return {
             "size": 10000,
             "query": {
                 "bool": {
@@ -1026,12 +1291,12 @@ class ContributorDevOrgRepo:
                     "should": [
                         {
                             "terms": {
-                                "merge_commit_sha": hash_list
+                                "merge_commit_sha": hash_terms
                             }
                         },
                         {
                             "terms": {
-                                "commits_data": hash_list
+                                "commits_data": hash_terms
                             }
                         }
                     ],
@@ -1039,9 +1304,6 @@ class ContributorDevOrgRepo:
                 }
             }
         }
-        pr_hits = self.client.search(index=self.pr_index, body=pr_query)[
-            "hits"]["hits"]
-        return pr_hits
         
     def contributor_enrich(self, repo):
         """ save enrichment contributor data for the past 90 days. """
@@ -1052,13 +1314,14 @@ class ContributorDevOrgRepo:
         date_list = get_date_list(self.from_date, self.end_date)
         count = 0
         item_datas = []
-        self.delete_contributor(repo, self.contributors_enriched_index, self.from_date, self.end_date)
-        for date in date_list:
-            created_since_metric = created_since(self.client, self.git_index, date, [repo])
-            if not created_since_metric:
-                continue
-            from_date = date - timedelta(days=7)
-            contributor_list = contributor_eco_type_list(self.client, self.contributors_index, from_date, date, [repo])["contributor_eco_type_list"]
+        if self.touched_date_list is None:
+            self.delete_contributor(repo, self.contributors_enriched_index, self.from_date, self.end_date)
+        else:
+            date_list = self.get_touched_week_list(date_list, self.touched_date_list)
+            logger.info(f"{repo} incremental enrich: {len(date_list)} touched weeks")
+            for date in date_list:
+                self.delete_contributor(repo, self.contributors_enriched_index, date.isoformat(), date.isoformat())
+        for date, contributor_list in zip(date_list, self.get_week_contributor_eco_type_list(repo, date_list)):
             count += len(contributor_list)
             for item in contributor_list:
                 item_uuid = get_uuid(item["contributor"], repo, str(date))
@@ -1087,38 +1350,43 @@ class ContributorDevOrgRepo:
         logger.info(repo + " contributor enrich data save finish count:" + str(count) + " " + str(datetime.now() - start_time))
 
 
-    def find_non_overlap_ranges(self, start_time1, end_time1, start_time2, end_time2):
-        non_overlap = []
-        if check_times_has_overlap(start_time1, end_time1, start_time2, end_time2):
-            if start_time2 < start_time1:
-                non_overlap.append([start_time2, start_time1])
-            if end_time2 > end_time1:
-                non_overlap.append([end_time1, end_time2])
-        else:
-            non_overlap.append([start_time2, end_time2])
-        return non_overlap
+    def get_week_contributor_eco_type_list(self, repo, date_list):
+        """ Yield the itemized list of the contributors of each 7-day window [date - 7 days, date) of the sorted
+        weekly dates. The contributors of the repository are read once, and their contributions are bucketed
+        into the weeks in a single pass.
+        """
+        if len(date_list) == 0:
+            return
+        window_list = [(date - timedelta(days=7), date) for date in date_list]
+        contributor_list = get_contributor_list(self.client, self.contributors_index, window_list[0][0],
+                                                window_list[-1][1], [repo], contributor_eco_date_field_list)
+        timeline = ContributorTimeline(contributor_list, contributor_eco_date_field_list)
+        window_count_list = timeline.get_window_count_list(
+            [(from_date.isoformat(), to_date.isoformat()) for from_date, to_date in window_list])
+        for (from_date, to_date), (contributor_index_array, count_array) in zip(window_list, window_count_list):
+            week_contributor_list = [contributor_list[i] for i in contributor_index_array.tolist()]
+            yield get_contributor_eco_type_list(week_contributor_list, count_array, from_date, to_date)
+
+    def get_touched_week_list(self, date_list, touched_date_list):
+        """ The weekly dates whose 7-day window [date - 7 days, date) contains one of the sorted touched days """
+        touched_week_list = []
+        for date in date_list:
+            i = bisect_left(touched_date_list, (date - timedelta(days=7)).strftime("%Y-%m-%d"))
+            if i < len(touched_date_list) and touched_date_list[i] < date.strftime("%Y-%m-%d"):
+                touched_week_list.append(date)
+        return touched_week_list
 
     def org_change_data_priority_processing(self, original_org_change_date_list):
+        """ Keep the parts of each organization change date not covered by the ones before it, sorted by first date """
+        affiliation_timeline = AffiliationTimeline()
         new_org_change_date_list = []
         for org_item in original_org_change_date_list:
-            first_date, last_date = org_item["first_date"], org_item["last_date"]
-            org_item_date_deque = deque()
-            org_item_date_deque.append([first_date, last_date])
-            for new_org_item in new_org_change_date_list:
-                org_item_date_deque_tmp = deque()
-                while org_item_date_deque:
-                    date_item = org_item_date_deque.popleft()
-                    non_overlap_date_list = self.find_non_overlap_ranges(
-                        new_org_item["first_date"], new_org_item["last_date"], date_item[0], date_item[1])
-                    for non_overlap_date_item in non_overlap_date_list:
-                        org_item_date_deque_tmp.append(non_overlap_date_item)
-                org_item_date_deque = org_item_date_deque_tmp
-            for org_item_date in org_item_date_deque:
+            for first_date, last_date in affiliation_timeline.add(org_item["first_date"], org_item["last_date"]):
                 new_org_change_date_list.append({
                     "domain": org_item.get("domain"),
                     "org_name": org_item.get("org_name"),
-                    "first_date": org_item_date[0],
-                    "last_date": org_item_date[1]
+                    "first_date": first_date,
+                    "last_date": last_date
                 })
         if new_org_change_date_list:
             return sorted(new_org_change_date_list, key=lambda x: x["first_date"])
@@ -0,0 +1,93 @@
+""" Disjoint sets of contributor identities
+
+The identities are the normalized logins, names and emails of the contributions. Two identities used by
+the same contribution belong to the same contributor. The sets are kept in a union-find with path compression and
+union by size, so that resolving the identities of n contributions is close to linear.
+
+The identities of a repository are resolved on their own, whatever the level of the run and the order or
+the workers its repositories are processed by, so that a repository always gets the same contributors.
+"""
+
+from itertools import chain
+
+
+class IdentityResolver:
+    def __init__(self):
+        self.identity_node_dict = {}
+        self.parent_list = []
+        self.size_list = []
+
+    def __len__(self):
+        """ Number of nodes, identities and contributions without identity """
+        return len(self.parent_list)
+
+    def get_node(self, identity=None):
+        """ Node of an identity, added as its own set if it is new. Without identity, a new node is added,
+        for a contribution that can not be joined to others.
+        """
+        if identity is not None:
+            node = self.identity_node_dict.get(identity)
+            if node is not None:
+                return node
+        node = len(self.parent_list)
+        self.parent_list.append(node)
+        self.size_list.append(1)
+        if identity is not None:
+            self.identity_node_dict[identity] = node
+        return node
+
+    def get_root(self, identity):
+        """ Root of an identity, None if it is unknown """
+        node = self.identity_node_dict.get(identity)
+        return None if node is None else self.find(node)
+
+    def find(self, node):
+        """ Root of a node, with path compression """
+        root = node
+        while self.parent_list[root] != root:
+            root = self.parent_list[root]
+        while self.parent_list[node] != root:
+            self.parent_list[node], node = root, self.parent_list[node]
+        return root
+
+    def union(self, node1, node2):
+        """ Join the sets of two nodes, by size, return the root of the joined set """
+        root1, root2 = self.find(node1), self.find(node2)
+        if root1 == root2:
+            return root1
+        if self.size_list[root1] < self.size_list[root2]:
+            root1, root2 = root2, root1
+        self.parent_list[root2] = root1
+        self.size_list[root1] += self.size_list[root2]
+        return root1
+
+
+def group_by_identity(new_data_dict, old_data_dict):
+    """ Group the new contributor dicts with the old ones sharing an identity with them, directly or through
+    other dicts. Only a new and an old dict are linked by an identity: two new dicts, or two old dicts, sharing
+    an identity are grouped only if a dict of the other side links them.
+
+    :param new_data_dict: dict of uuid to contributor dict with an id_identity_list
+    :param old_data_dict: dict of uuid to contributor dict with an id_identity_list
+    :return: lists of (uuid, contributor dict) per group, the new dicts then the old ones. The groups and their
+        members keep the order of the given dicts.
+    """
+    resolver = IdentityResolver()
+    identity_old_node_list_dict = {}
+    old_item_node_list = []
+    for uuid, item in old_data_dict.items():
+        node = resolver.get_node()
+        for identity in item.get("id_identity_list") or []:
+            identity_old_node_list_dict.setdefault(identity, []).append(node)
+        old_item_node_list.append((uuid, item, node))
+    new_item_node_list = []
+    for uuid, item in new_data_dict.items():
+        node = resolver.get_node()
+        for identity in item.get("id_identity_list") or []:
+            for old_node in identity_old_node_list_dict.get(identity, []):
+                resolver.union(node, old_node)
+        new_item_node_list.append((uuid, item, node))
+    group_dict = {}
+    for uuid, item, node in chain(new_item_node_list, old_item_node_list):
+        group_dict.setdefault(resolver.find(node), []).append((uuid, item))
+    return list(group_dict.values())
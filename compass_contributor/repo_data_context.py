@@ -0,0 +1,21 @@
+""" Data of a repository shared by the stages of its processing """
+
+from compass_common.commit_pr_index import CommitPrIndex
+
+
+class RepoDataContext:
+    """ Data of a repository read once while it is processed: the creation date of the repository, the
+    commits of the period and the pull requests linked to them. The commit contributors and the mapping
+    of the platform logins to the commit authors used to read them each.
+    """
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.data_dict = {}
+        self.commit_pr_index = CommitPrIndex()
+
+    def get(self, key, load):
+        """ Value of the key, loaded by calling load() the first time """
+        if key not in self.data_dict:
+            self.data_dict[key] = load()
+        return self.data_dict[key]
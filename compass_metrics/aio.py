@@ -0,0 +1,72 @@
+""" Asyncio API of the metric functions
+
+Every metric function of git_metrics, pr_metrics, issue_metrics, contributor_metrics and repo_metrics
+has an awaitable counterpart of the same name and arguments:
+
+    client = get_client(url)
+    result = await git_metrics.created_since(client, git_index, date, repo_list)
+    result_list = await gather_metrics([
+        pr_metrics.pr_count(client, pr_index, date, repo_list) for repo_list in repo_group_list
+    ], max_concurrency=50)
+
+The sync function runs once, in a thread of the default executor of the loop, with the client of
+opensearch_utils.get_client, which is thread safe and pools its connections. A running metric holds a thread,
+the default executor bounding how many run at once; set a larger one with loop.set_default_executor for more.
+"""
+
+import asyncio
+import functools
+import inspect
+
+from compass_metrics import git_metrics as sync_git_metrics
+from compass_metrics import pr_metrics as sync_pr_metrics
+from compass_metrics import issue_metrics as sync_issue_metrics
+from compass_metrics import contributor_metrics as sync_contributor_metrics
+from compass_metrics import repo_metrics as sync_repo_metrics
+
+
+async def run_metric(function, client, *args, **kwargs):
+    """ Run a sync metric function taking the client as first argument in a thread of the default executor """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(function, client, *args, **kwargs))
+
+
+async def gather_metrics(coroutine_list, max_concurrency=None):
+    """ Await the metric coroutines concurrently, at most max_concurrency at a time if given """
+    if not max_concurrency:
+        return await asyncio.gather(*coroutine_list)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+    return await asyncio.gather(*[run(coroutine) for coroutine in coroutine_list])
+
+
+def get_async_metric(function):
+    """ Awaitable counterpart of a sync metric function """
+    @functools.wraps(function)
+    async def async_metric(client, *args, **kwargs):
+        return await run_metric(function, client, *args, **kwargs)
+    return async_metric
+
+
+class AsyncMetricModule:
+    """ Awaitable counterparts of the metric functions of a module, the functions defined in the
+    module whose first argument is the client
+    """
+
+    def __init__(self, module):
+        self.module = module
+        self.__doc__ = module.__doc__
+        for name, function in inspect.getmembers(module, inspect.isfunction):
+            parameter_list = list(inspect.signature(function).parameters)
+            if function.__module__ == module.__name__ and parameter_list and parameter_list[0] == "client":
+                setattr(self, name, get_async_metric(function))
+
+
+git_metrics = AsyncMetricModule(sync_git_metrics)
+pr_metrics = AsyncMetricModule(sync_pr_metrics)
+issue_metrics = AsyncMetricModule(sync_issue_metrics)
+contributor_metrics = AsyncMetricModule(sync_contributor_metrics)
+repo_metrics = AsyncMetricModule(sync_repo_metrics)
@@ -1,24 +1,108 @@
 from compass_metrics.db_dsl import get_contributor_query, get_uuid_count_query
+from compass_metrics.contributor_timeline import ContributorTimeline
 from compass_common.datetime import check_times_has_overlap
-from compass_common.opensearch_utils import get_all_index_data
+from compass_common.opensearch_utils import get_generator
 from datetime import timedelta
 from itertools import groupby
+from collections import OrderedDict
+import threading
 import pandas as pd
 import datetime
 from dateutil.relativedelta import relativedelta
 
 
-def contributor_count(client, contributors_index, date, repo_list, from_date=None):
+class ContributorSnapshotCache:
+    """ LRU cache of contributor snapshots, keyed by (index, repo_list, window, filters).
+    The first metric that needs a window fills the cache, the following metrics of the
+    same window read it from memory instead of scrolling the index again.
+    """
+
+    def __init__(self, max_size=64):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_key(index, repo_list, from_date, to_date, **filters):
+        """ Build a hashable cache key, the order of repo_list does not matter """
+        return (
+            index,
+            tuple(sorted(repo_list)),
+            from_date.isoformat(),
+            to_date.isoformat(),
+            tuple(sorted(filters.items()))
+        )
+
+    def get(self, key):
+        """ Return the cached snapshot or None, counting hits and misses """
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """ Store a snapshot, evicting the least recently used one when full """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        """ Drop all snapshots and reset the counters """
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """ Hit/miss counters of the cache """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "hit_ratio": round(self.hits / total, 4) if total > 0 else 0
+            }
+
+
+# Timelines of the code authors of a window by (index, repo_list, window), read by all the commit and
+# organization metrics of a date point, see get_commit_contributor_timeline
+commit_contributor_cache = ContributorSnapshotCache(max_size=32)
+commit_contributor_lock = threading.Lock()
+commit_contributor_key_lock_dict = {}
+# Fields of the contributor documents used by the commit and organization metrics
+commit_contributor_source = ["repo_name", "is_bot", "id_git_author_name_list", "code_author_date_list",
+                             "org_change_date_list"]
+
+# Date fields of the 90-day contributor count metrics, they can be fetched together with one msearch
+contributor_count_date_field_dict = {
+    "contributor_count": ["code_author_date_list", "issue_creation_date_list", "issue_comments_date_list",
+                          "pr_creation_date_list", "pr_comments_date_list"],
+    "code_contributor_count": ["code_author_date_list", "pr_creation_date_list", "pr_comments_date_list"],
+    "commit_contributor_count": ["code_author_date_list"],
+    "pr_authors_contributor_count": ["pr_creation_date_list"],
+    "pr_review_contributor_count": ["pr_comments_date_list"],
+    "issue_authors_contributor_count": ["issue_creation_date_list"],
+    "issue_comments_contributor_count": ["issue_comments_date_list"],
+}
+
+
+def contributor_count(client, contributors_index, date, repo_list, from_date=None, count_cache=None):
     """ Determine how many active code commit authors, pr authors, review participants, issue authors,
     and issue comments participants there are in the past 90 days """
     if from_date is None:
         from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["code_author_date_list", "issue_creation_date_list", "issue_comments_date_list", 
-                        "pr_creation_date_list", "pr_comments_date_list"]
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)                    
+    date_field_list = contributor_count_date_field_dict["contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "contributor_count": contributor_count,
         "contributor_count_bot": contributor_count_bot,
@@ -44,14 +128,13 @@ def contributor_count_all(client, contributors_index, date, repo_list):
     return result
 
 
-def code_contributor_count(client, contributors_index, date, repo_list):
+def code_contributor_count(client, contributors_index, date, repo_list, count_cache=None):
     """  Determine how many active pr creators, code reviewers, commit authors there are in the past 90 days. """
     from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["code_author_date_list", "pr_creation_date_list", "pr_comments_date_list"]
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False) 
+    date_field_list = contributor_count_date_field_dict["code_contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "code_contributor_count": contributor_count,
         "code_contributor_count_bot": contributor_count_bot,
@@ -60,14 +143,13 @@ def code_contributor_count(client, contributors_index, date, repo_list):
     return result
 
 
-def commit_contributor_count(client, contributors_index, date, repo_list):
+def commit_contributor_count(client, contributors_index, date, repo_list, count_cache=None):
     """ Determine how many active code commit authors participants there are in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["code_author_date_list"]                                                   
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)                                                 
+    date_field_list = contributor_count_date_field_dict["commit_contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "commit_contributor_count": contributor_count,
         "commit_contributor_count_bot": contributor_count_bot,
@@ -76,14 +158,13 @@ def commit_contributor_count(client, contributors_index, date, repo_list):
     return result
 
 
-def pr_authors_contributor_count(client, contributors_index, date, repo_list):
+def pr_authors_contributor_count(client, contributors_index, date, repo_list, count_cache=None):
     """ Determine how many active pr authors participants there are in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["pr_creation_date_list"]                                                   
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)                                               
+    date_field_list = contributor_count_date_field_dict["pr_authors_contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "pr_authors_contributor_count": contributor_count,
         "pr_authors_contributor_count_bot": contributor_count_bot,
@@ -92,14 +173,13 @@ def pr_authors_contributor_count(client, contributors_index, date, repo_list):
     return result
 
 
-def pr_review_contributor_count(client, contributors_index, date, repo_list):
+def pr_review_contributor_count(client, contributors_index, date, repo_list, count_cache=None):
     """ Determine how many active pr review participants there are in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["pr_comments_date_list"]                                                   
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)                                                        
+    date_field_list = contributor_count_date_field_dict["pr_review_contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "pr_review_contributor_count": contributor_count,
         "pr_review_contributor_count_bot": contributor_count_bot,
@@ -108,14 +188,13 @@ def pr_review_contributor_count(client, contributors_index, date, repo_list):
     return result
 
 
-def issue_authors_contributor_count(client, contributors_index, date, repo_list):
+def issue_authors_contributor_count(client, contributors_index, date, repo_list, count_cache=None):
     """ Determine how many active issue authors participants there are in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["issue_creation_date_list"]                                                   
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)                                                   
+    date_field_list = contributor_count_date_field_dict["issue_authors_contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "issue_authors_contributor_count": contributor_count,
         "issue_authors_contributor_count_bot": contributor_count_bot,
@@ -124,14 +203,13 @@ def issue_authors_contributor_count(client, contributors_index, date, repo_list)
     return result
 
 
-def issue_comments_contributor_count(client, contributors_index, date, repo_list):
+def issue_comments_contributor_count(client, contributors_index, date, repo_list, count_cache=None):
     """ Determine how many active issue comments participants there are in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    date_field_list = ["issue_comments_date_list"]                                                   
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)                                                           
+    date_field_list = contributor_count_date_field_dict["issue_comments_contributor_count"]
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list, count_cache)
     result = {
         "issue_comments_contributor_count": contributor_count,
         "issue_comments_contributor_count_bot": contributor_count_bot,
@@ -144,8 +222,8 @@ def org_contributor_count(client, contributors_index, date, repo_list):
     """ Number of active code contributors with organization affiliation in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     from_date_str = from_date.strftime("%Y-%m-%d")
     to_date_str = to_date.strftime("%Y-%m-%d")
     org_contributor_set = set()
@@ -243,18 +321,17 @@ def bus_factor(client, contributors_index, date, repo_list):
     """Determine the smallest number of people that make 50% of contributions in the past 90 days."""
     from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    timeline = get_commit_contributor_timeline(client, contributors_index, from_date, to_date, repo_list)
     bus_factor_count = 0
     author_name_dict = {}  # {"author_name:" commit_count}
     from_date_str = from_date.strftime("%Y-%m-%d")
     to_date_str = to_date.strftime("%Y-%m-%d")
-    for item in commit_contributor_list:
+    commit_count_array = timeline.get_count_array(from_date_str, to_date_str)[:, 0]
+    for item, commit_count in zip(timeline.contributor_list, commit_count_array.tolist()):
         if item["is_bot"]:
             continue
         name = item["id_git_author_name_list"][0]
-        commit_date_list = [x for x in sorted(item["code_author_date_list"]) if from_date_str <= x < to_date_str]
-        author_name_dict[name] = author_name_dict.get(name, 0) + len(commit_date_list)
+        author_name_dict[name] = author_name_dict.get(name, 0) + commit_count
     commit_count_list = [commit_count for commit_count in author_name_dict.values()]
     commit_count_list.sort(reverse=True)
     commit_count_threshold = sum(commit_count_list) * 0.5
@@ -270,18 +347,55 @@ def bus_factor(client, contributors_index, date, repo_list):
     return result
 
 
-def get_contributor_list(client, contributors_index, from_date, to_date, repo_list, date_field, page_size=500):
-    """ Get the contributors who have contributed in the from_date,to_date time period. """
-    result_list = []
+def get_contributor_generator(client, contributors_index, from_date, to_date, repo_list, date_field, page_size=500,
+                              source=None):
+    """ Lazily yield the contributors who have contributed in the from_date,to_date time period. """
     if isinstance(date_field, str):
         date_field_list = [date_field]
     elif isinstance(date_field, list):
         date_field_list = date_field
     query = get_contributor_query(repo_list, date_field_list, from_date, to_date, page_size)
-    contributor_list = get_all_index_data(client, index=contributors_index, body=query)
-    if len(contributor_list) > 0:
-        result_list = result_list + [contributor["_source"] for contributor in contributor_list]
-    return result_list
+    for contributor in get_generator(client, index=contributors_index, body=query, source=source):
+        yield contributor["_source"]
+
+
+def get_contributor_list(client, contributors_index, from_date, to_date, repo_list, date_field, page_size=500,
+                         source=None):
+    """ Get the contributors who have contributed in the from_date,to_date time period. """
+    return list(get_contributor_generator(client, contributors_index, from_date, to_date, repo_list, date_field,
+                                          page_size, source))
+
+
+def get_commit_contributor_timeline(client, contributors_index, from_date, to_date, repo_list):
+    """ Get the code authors who have contributed in the from_date,to_date time period, with the fields of
+    commit_contributor_source only, and the timeline of their code_author_date_list. They are fetched once per
+    (index, repo_list, window) and shared by the commit and organization metrics of the window, which must not
+    modify them.
+    """
+    cache_key = commit_contributor_cache.get_key(contributors_index, repo_list, from_date, to_date)
+    timeline = commit_contributor_cache.get(cache_key)
+    if timeline is not None:
+        return timeline
+    with commit_contributor_lock:
+        key_lock = commit_contributor_key_lock_dict.setdefault(cache_key, threading.Lock())
+    with key_lock:
+        # another metric of the window may have fetched them while this one waited
+        timeline = commit_contributor_cache.get(cache_key)
+        if timeline is None:
+            commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
+                                                           "code_author_date_list", source=commit_contributor_source)
+            timeline = ContributorTimeline(commit_contributor_list, ["code_author_date_list"])
+            commit_contributor_cache.put(cache_key, timeline)
+    with commit_contributor_lock:
+        commit_contributor_key_lock_dict.pop(cache_key, None)
+    return timeline
+
+
+def get_commit_contributor_list(client, contributors_index, from_date, to_date, repo_list):
+    """ Get the code authors who have contributed in the from_date,to_date time period, see
+    get_commit_contributor_timeline
+    """
+    return get_commit_contributor_timeline(client, contributors_index, from_date, to_date, repo_list).contributor_list
 
 
 def get_contributor_count(client, contributors_index, from_date, to_date, repos_list, date_field, is_bot=None):
@@ -291,14 +405,7 @@ def get_contributor_count(client, contributors_index, from_date, to_date, repos_
         date_field_list = date_field
     query = get_contributor_query(repos_list, date_field_list, from_date, to_date, 0)
     query["aggs"] = {
-        "contributor_count": {
-            "cardinality": {
-                "script": {
-                    "source": "if(doc['id_platform_login_name_list.keyword'].size() > 0) {doc['id_platform_login_name_list.keyword'][0]} else {doc['id_git_author_name_list.keyword'][0]}"
-                },
-                "precision_threshold": 100000
-            }
-        }
+        "contributor_count": get_contributor_cardinality_agg()
     }
     if is_bot is not None:
         query["query"]["bool"]["must"].append(
@@ -312,8 +419,150 @@ def get_contributor_count(client, contributors_index, from_date, to_date, repos_
     return contributor_count
 
 
+def get_contributor_cardinality_agg():
+    """ Cardinality aggregation counting contributors by platform login name, falling back to git author name """
+    return {
+        "cardinality": {
+            "script": {
+                "source": "if(doc['id_platform_login_name_list.keyword'].size() > 0) {doc['id_platform_login_name_list.keyword'][0]} else {doc['id_git_author_name_list.keyword'][0]}"
+            },
+            "precision_threshold": 100000
+        }
+    }
+
+
+def get_contributor_count_by_bot_query(from_date, to_date, repos_list, date_field):
+    """ Query statement to count all, bot and non-bot contributors with filters sub-aggregations. """
+    if isinstance(date_field, str):
+        date_field_list = [date_field]
+    elif isinstance(date_field, list):
+        date_field_list = date_field
+    query = get_contributor_query(repos_list, date_field_list, from_date, to_date, 0)
+    query["aggs"] = {
+        "contributor_count": get_contributor_cardinality_agg(),
+        "bot_filters": {
+            "filters": {
+                "filters": {
+                    "bot": {"match_phrase": {"is_bot": "true"}},
+                    "without_bot": {"match_phrase": {"is_bot": "false"}}
+                }
+            },
+            "aggs": {
+                "contributor_count": get_contributor_cardinality_agg()
+            }
+        }
+    }
+    return query
+
+
+def get_contributor_count_by_bot_result(aggregations):
+    """ Parse the aggregations of get_contributor_count_by_bot_query into (all, bot, without_bot) counts """
+    buckets = aggregations["bot_filters"]["buckets"]
+    return (
+        aggregations["contributor_count"]["value"],
+        buckets["bot"]["contributor_count"]["value"],
+        buckets["without_bot"]["contributor_count"]["value"]
+    )
+
+
+def get_contributor_count_by_bot_cache_key(contributors_index, from_date, to_date, repos_list, date_field):
+    date_field_list = [date_field] if isinstance(date_field, str) else date_field
+    return ContributorSnapshotCache.get_key(contributors_index, repos_list, from_date, to_date,
+                                            date_field=tuple(date_field_list))
+
+
+def get_contributor_count_by_bot(client, contributors_index, from_date, to_date, repos_list, date_field,
+                                 count_cache=None):
+    """ Count all, bot and non-bot contributors in a single request.
+    :param count_cache: ContributorSnapshotCache of the counts already fetched by the caller, see
+        prefetch_contributor_count_by_bot, None to always fetch them
+    :return: tuple of (contributor_count, contributor_count_bot, contributor_count_without_bot)
+    """
+    cache_key = get_contributor_count_by_bot_cache_key(contributors_index, from_date, to_date, repos_list, date_field)
+    result = count_cache.get(cache_key) if count_cache is not None else None
+    if result is None:
+        query = get_contributor_count_by_bot_query(from_date, to_date, repos_list, date_field)
+        aggregations = client.search(index=contributors_index, body=query)["aggregations"]
+        result = get_contributor_count_by_bot_result(aggregations)
+        if count_cache is not None:
+            count_cache.put(cache_key, result)
+    return result
+
+
+def prefetch_contributor_count_by_bot(client, contributors_index, date, repo_list, metric_list, count_cache):
+    """ Fetch the 90-day contributor counts of the metrics in metric_list with one msearch request
+    and keep them in count_cache, to be passed to the metric functions.
+    """
+    from_date = date - timedelta(days=90)
+    date_field_group_list = [contributor_count_date_field_dict[metric] for metric in metric_list
+                             if metric in contributor_count_date_field_dict]
+    result_list = get_contributor_count_by_bot_batch(client, contributors_index, from_date, date, repo_list,
+                                                     date_field_group_list)
+    for date_field_list, result in zip(date_field_group_list, result_list):
+        cache_key = get_contributor_count_by_bot_cache_key(contributors_index, from_date, date, repo_list,
+                                                           date_field_list)
+        count_cache.put(cache_key, result)
+
+
+def get_contributor_count_by_bot_batch(client, contributors_index, from_date, to_date, repos_list, date_field_group_list):
+    """ Count all, bot and non-bot contributors for several date_field_list combinations with one msearch request.
+    :param date_field_group_list: list of date_field or date_field_list
+    :return: list of (contributor_count, contributor_count_bot, contributor_count_without_bot),
+        in the same order as date_field_group_list
+    """
+    if len(date_field_group_list) == 0:
+        return []
+    body = []
+    for date_field in date_field_group_list:
+        body.append({"index": contributors_index})
+        body.append(get_contributor_count_by_bot_query(from_date, to_date, repos_list, date_field))
+    responses = client.msearch(body=body)["responses"]
+    result_list = []
+    for date_field, response in zip(date_field_group_list, responses):
+        if "error" in response:
+            raise Exception(f"Contributor count of {date_field} failed: {response['error']}")
+        result_list.append(get_contributor_count_by_bot_result(response["aggregations"]))
+    return result_list
+
+
+# Date fields of the contributions of contributor_eco_type_list
+eco_observe_date_field = ["fork_date_list", "star_date_list"]
+eco_issue_date_field = ["issue_creation_date_list", "issue_comments_date_list"]
+eco_code_date_field = ["pr_creation_date_list", "pr_comments_date_list", "code_author_date_list", "code_committer_date_list"]
+eco_issue_admin_date_field = ["issue_labeled_date_list", "issue_unlabeled_date_list", "issue_closed_date_list", "issue_reopened_date_list",
+    "issue_assigned_date_list", "issue_unassigned_date_list", "issue_milestoned_date_list", "issue_demilestoned_date_list",
+    "issue_marked_as_duplicate_date_list", "issue_transferred_date_list", 
+    "issue_renamed_title_date_list", "issue_change_description_date_list", "issue_setting_priority_date_list", "issue_change_priority_date_list",
+    "issue_link_pull_request_date_list", "issue_unlink_pull_request_date_list", "issue_assign_collaborator_date_list", "issue_unassign_collaborator_date_list",
+    "issue_change_issue_state_date_list", "issue_change_issue_type_date_list", "issue_setting_branch_date_list", "issue_change_branch_date_list",]
+eco_code_admin_date_field = ["pr_labeled_date_list", "pr_unlabeled_date_list", "pr_closed_date_list", "pr_assigned_date_list",
+    "pr_unassigned_date_list", "pr_reopened_date_list", "pr_milestoned_date_list", "pr_demilestoned_date_list", 
+    "pr_marked_as_duplicate_date_list", "pr_transferred_date_list", 
+    "pr_renamed_title_date_list", "pr_change_description_date_list", "pr_setting_priority_date_list", "pr_change_priority_date_list", 
+    "pr_merged_date_list", "pr_review_date_list", "pr_set_tester_date_list", "pr_unset_tester_date_list", "pr_check_pass_date_list", 
+    "pr_test_pass_date_list", "pr_reset_assign_result_date_list", "pr_reset_test_result_date_list", "pr_link_issue_date_list", 
+    "pr_unlink_issue_date_list"]
+contributor_eco_date_field_list = eco_observe_date_field + eco_issue_date_field + eco_code_date_field + \
+    eco_issue_admin_date_field + eco_code_admin_date_field
+
+
 def contributor_eco_type_list(client, contributors_index, from_date, to_date, repo_list):
     """ Get an itemized list of contributors in the from_date, to_date time period. """
+    contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
+                                            contributor_eco_date_field_list)
+    count_array = ContributorTimeline(contributor_list, contributor_eco_date_field_list).get_count_array(
+        from_date.isoformat(), to_date.isoformat())
+    return {"contributor_eco_type_list": get_contributor_eco_type_list(contributor_list, count_array, from_date,
+                                                                       to_date)}
+
+
+def get_contributor_eco_type_list(contributor_list, count_array, from_date, to_date):
+    """ Itemized list of contributors in the from_date, to_date time period, from their contributions counted
+    per date field.
+    :param contributor_list: contributors who have contributed in the time period, in the order they are fetched
+    :param count_array: number of contributions of each contributor in the time period, per date field of
+        contributor_eco_date_field_list
+    """
 
     def get_eco_contributor_dict(from_date, to_date, contributor_list):
         from_date_str = from_date.isoformat()
@@ -362,11 +611,9 @@ def contributor_eco_type_list(client, contributors_index, from_date, to_date, re
             eco_contributor_dict[contributor_name]["is_bot"] = contributor["is_bot"]
         return eco_contributor_dict
 
-    def get_type_contributor_dict(from_date, to_date, contributor_list):
-        from_date_str = from_date.isoformat()
-        to_date_str = to_date.isoformat()
-        type_contributor_dict = {} 
-        for contributor in contributor_list:
+    def get_type_contributor_dict(contributor_list, count_array):
+        type_contributor_dict = {}
+        for contributor, count_list in zip(contributor_list, count_array.tolist()):
             contributor_name = None
             type_list = []
             if contributor.get("id_platform_login_name_list") and len(
@@ -374,9 +621,8 @@ def contributor_eco_type_list(client, contributors_index, from_date, to_date, re
                 contributor_name = contributor["id_platform_login_name_list"][0]
             elif contributor.get("id_git_author_name_list") and len(contributor.get("id_git_author_name_list")) > 0:
                 contributor_name = contributor["id_git_author_name_list"][0]
-            
-            for date_field in date_field_list:
-                contribution_count = len(list(filter(lambda x: from_date_str <= x < to_date_str, contributor.get(date_field, []))))
+
+            for date_field, contribution_count in zip(contributor_eco_date_field_list, count_list):
                 if contribution_count > 0:
                     type_list.append({
                         "contribution_type": date_field.replace("_date_list", ""),
@@ -386,29 +632,8 @@ def contributor_eco_type_list(client, contributors_index, from_date, to_date, re
             type_contributor_dict[contributor_name] = type_list
         return type_contributor_dict
 
-
-    observe_date_field = ["fork_date_list", "star_date_list"]
-    issue_date_field = ["issue_creation_date_list", "issue_comments_date_list"]
-    code_date_field = ["pr_creation_date_list", "pr_comments_date_list", "code_author_date_list", "code_committer_date_list"]
-    issue_admin_date_field = ["issue_labeled_date_list", "issue_unlabeled_date_list", "issue_closed_date_list", "issue_reopened_date_list",
-        "issue_assigned_date_list", "issue_unassigned_date_list", "issue_milestoned_date_list", "issue_demilestoned_date_list",
-        "issue_marked_as_duplicate_date_list", "issue_transferred_date_list", 
-        "issue_renamed_title_date_list", "issue_change_description_date_list", "issue_setting_priority_date_list", "issue_change_priority_date_list",
-        "issue_link_pull_request_date_list", "issue_unlink_pull_request_date_list", "issue_assign_collaborator_date_list", "issue_unassign_collaborator_date_list",
-        "issue_change_issue_state_date_list", "issue_change_issue_type_date_list", "issue_setting_branch_date_list", "issue_change_branch_date_list",]
-    code_admin_date_field = ["pr_labeled_date_list", "pr_unlabeled_date_list", "pr_closed_date_list", "pr_assigned_date_list",
-        "pr_unassigned_date_list", "pr_reopened_date_list", "pr_milestoned_date_list", "pr_demilestoned_date_list", 
-        "pr_marked_as_duplicate_date_list", "pr_transferred_date_list", 
-        "pr_renamed_title_date_list", "pr_change_description_date_list", "pr_setting_priority_date_list", "pr_change_priority_date_list", 
-        "pr_merged_date_list", "pr_review_date_list", "pr_set_tester_date_list", "pr_unset_tester_date_list", "pr_check_pass_date_list", 
-        "pr_test_pass_date_list", "pr_reset_assign_result_date_list", "pr_reset_test_result_date_list", "pr_link_issue_date_list", 
-        "pr_unlink_issue_date_list"]
-    date_field_list = observe_date_field + issue_date_field + code_date_field + issue_admin_date_field + code_admin_date_field
-
-    contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-
     eco_contributor_dict = get_eco_contributor_dict(from_date, to_date, contributor_list)
-    type_contributor_dict = get_type_contributor_dict(from_date, to_date, contributor_list)
+    type_contributor_dict = get_type_contributor_dict(contributor_list, count_array)
     result_list = []
     for contributor_name in eco_contributor_dict:
         contribution_type_list = type_contributor_dict.get(contributor_name, [])
@@ -431,12 +656,15 @@ def contributor_eco_type_list(client, contributors_index, from_date, to_date, re
             "contribution_type_list": contribution_type_list
         }
         result_list.append(result)
-    return {"contributor_eco_type_list": result_list}
+    return result_list
 
 
-def contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date=None, is_bot=False, filter_mileage=None):
+def contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date=None, is_bot=False, filter_mileage=None,
+                            snapshot_cache=None):
     """ Get detailed list of contributors in from_date, to_date time range. 
     :param filter_mileage: Filter by mileage role, choose from core, regular, casual
+    :param snapshot_cache: ContributorSnapshotCache of the snapshots shared by the metrics of a model run,
+        None to always read the index
     """
     if from_date is None:
         from_date = (date - timedelta(days=90))
@@ -496,62 +724,76 @@ def contributor_detail_list(client, contributors_enriched_index, date, repo_list
                 casual_contributor[k] = {**contributor_dict[k], "mileage_type": "casual"}
         return casual_contributor
 
-    contributor_list = get_contributor_list(client, contributors_enriched_index, from_date, date, \
-            repo_list, ["grimoire_creation_date"], 1000)
-    sorted_contributor_list = sorted(contributor_list, key=lambda x: x["contributor"])
-    contributor_groups = groupby(sorted_contributor_list, key=lambda x: x["contributor"])
-    contributor_dict = {}
-    ecological_type_order = [
-        "organization manager",
-        "organization participant",
-        "individual manager",
-        "individual participant"
-    ]
-    for key, group in contributor_groups:
-        contribution = 0
-        contribution_without_observe = 0
-        ecological_type_set = set()
-        organization_set = set()
-        contribution_type_dict = {}
-        is_bot_set = set()
-        repo_name_set = set()
-        for item in list(group):
-            contribution += item["contribution"]
-            contribution_without_observe += item["contribution_without_observe"]
-            ecological_type_set.add(item["ecological_type"])
-            organization_set.add(item["organization"])
-            is_bot_set.add(item["is_bot"])
-            repo_name_set.add(item["repo_name"])
-            for contribution_type in item["contribution_type_list"]:
-                contribution_type_item = contribution_type_dict.get(contribution_type["contribution_type"], {})
-                contribution_type_contribution = contribution_type_item.get("contribution", 0)
-                contribution_type_item = {
-                    "contribution_type": contribution_type["contribution_type"],
-                    "contribution": contribution_type_contribution + contribution_type["contribution"]
-                }
-                contribution_type_dict[contribution_type["contribution_type"]] = contribution_type_item
-        for type in ecological_type_order:
-            if type in ecological_type_set:
-                ecological_type = type
-                break
-        contributor_item = {
-            "contributor": key,
-            "contribution": contribution,
-            "contribution_without_observe": contribution_without_observe,
-            "ecological_type": ecological_type,
-            "organization": list(organization_set)[0] if len(organization_set) > 0 else None,
-            "contribution_type_list": list(contribution_type_dict.values()),
-            "is_bot": True if True in is_bot_set else False,
-            "repo_name": list(repo_name_set),
-            "contribution_weeks": len(list(group))
+    cache_key = ContributorSnapshotCache.get_key(contributors_enriched_index, repo_list, from_date, date,
+                                                 is_bot=is_bot)
+    snapshot = snapshot_cache.get(cache_key) if snapshot_cache is not None else None
+    if snapshot is None:
+        contributor_list = get_contributor_generator(client, contributors_enriched_index, from_date, date, \
+                repo_list, ["grimoire_creation_date"], 1000)
+        sorted_contributor_list = sorted(contributor_list, key=lambda x: x["contributor"])
+        contributor_groups = groupby(sorted_contributor_list, key=lambda x: x["contributor"])
+        contributor_dict = {}
+        ecological_type_order = [
+            "organization manager",
+            "organization participant",
+            "individual manager",
+            "individual participant"
+        ]
+        for key, group in contributor_groups:
+            contribution = 0
+            contribution_without_observe = 0
+            ecological_type_set = set()
+            organization_set = set()
+            contribution_type_dict = {}
+            is_bot_set = set()
+            repo_name_set = set()
+            for item in list(group):
+                contribution += item["contribution"]
+                contribution_without_observe += item["contribution_without_observe"]
+                ecological_type_set.add(item["ecological_type"])
+                organization_set.add(item["organization"])
+                is_bot_set.add(item["is_bot"])
+                repo_name_set.add(item["repo_name"])
+                for contribution_type in item["contribution_type_list"]:
+                    contribution_type_item = contribution_type_dict.get(contribution_type["contribution_type"], {})
+                    contribution_type_contribution = contribution_type_item.get("contribution", 0)
+                    contribution_type_item = {
+                        "contribution_type": contribution_type["contribution_type"],
+                        "contribution": contribution_type_contribution + contribution_type["contribution"]
+                    }
+                    contribution_type_dict[contribution_type["contribution_type"]] = contribution_type_item
+            for type in ecological_type_order:
+                if type in ecological_type_set:
+                    ecological_type = type
+                    break
+            contributor_item = {
+                "contributor": key,
+                "contribution": contribution,
+                "contribution_without_observe": contribution_without_observe,
+                "ecological_type": ecological_type,
+                "organization": list(organization_set)[0] if len(organization_set) > 0 else None,
+                "contribution_type_list": list(contribution_type_dict.values()),
+                "is_bot": True if True in is_bot_set else False,
+                "repo_name": list(repo_name_set),
+                "contribution_weeks": len(list(group))
+            }
+            if is_bot is contributor_item["is_bot"]:
+                if key not in "openharmony_ci":
+                    contributor_dict[key] = contributor_item
+
+        core_contributor = get_core_contributor(contributor_dict)
+        regular_contributor = get_regular_contributor(contributor_dict, core_contributor)
+        casual_contributor = get_casual_contributor(contributor_dict, core_contributor, regular_contributor)
+        snapshot = {
+            "core": core_contributor,
+            "regular": regular_contributor,
+            "casual": casual_contributor
         }
-        if is_bot is contributor_item["is_bot"]:
-            if key not in "openharmony_ci":
-                contributor_dict[key] = contributor_item
-
-    core_contributor = get_core_contributor(contributor_dict)
-    regular_contributor = get_regular_contributor(contributor_dict, core_contributor)
-    casual_contributor = get_casual_contributor(contributor_dict, core_contributor, regular_contributor)
+        if snapshot_cache is not None:
+            snapshot_cache.put(cache_key, snapshot)
+    core_contributor = snapshot["core"]
+    regular_contributor = snapshot["regular"]
+    casual_contributor = snapshot["casual"]
     if filter_mileage is None:
         contributor_detail_list = list(core_contributor.values()) + list(regular_contributor.values()) + list(casual_contributor.values())
     elif filter_mileage is "core":
@@ -817,20 +1059,22 @@ def contributor_distribution(client, contributors_enriched_index, date, repo_lis
     return { "contributor_distribution": contributor_distribution_data}
 
 
-def activity_casual_contributor_count(client, contributors_enriched_index, date, repo_list):
+def activity_casual_contributor_count(client, contributors_enriched_index, date, repo_list, snapshot_cache=None):
     """ Defining the last 90 days Individuals who contribute to the remaining contributions in the community after excluding core 
     and regular contributions (including observation contributions).
     """
     from_date = (date - timedelta(days=90))
-    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date)
+    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date,
+                                               snapshot_cache=snapshot_cache)
     return {"activity_casual_contributor_count": contributor_data["casual_count"]}
 
-def activity_casual_contribution_per_person(client, contributors_enriched_index, date, repo_list):
+def activity_casual_contribution_per_person(client, contributors_enriched_index, date, repo_list, snapshot_cache=None):
     """ Defines the number of contributions per active casual contributor in the last 90 days.
     """
     contribution_per_person = 0
     from_date = (date - timedelta(days=90))
-    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date, filter_mileage="casual")
+    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date, filter_mileage="casual",
+                                               snapshot_cache=snapshot_cache)
     contributor_count = contributor_data["casual_count"]
     if contributor_count > 0:
         contribution_count_list = [contributor_item["contribution"] for contributor_item in contributor_data["contributor_detail_list"]]
@@ -838,22 +1082,24 @@ def activity_casual_contribution_per_person(client, contributors_enriched_index,
         contribution_per_person = contribution_count / contributor_count
     return {"activity_casual_contribution_per_person": contribution_per_person}
 
-def activity_regular_contributor_count(client, contributors_enriched_index, date, repo_list):
+def activity_regular_contributor_count(client, contributors_enriched_index, date, repo_list, snapshot_cache=None):
     """ Defining the last 90 days After excluding the contributions of core contributors, 
     the next 30% (excluding observation contributions) of contributions made by at least one group of people, 
     including those who have been involved in contributing at least 3/4 of the time in the last 90 days, 
     These individuals are referred to as regular contributors.
     """
     from_date = (date - timedelta(days=90))
-    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date)
+    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date,
+                                               snapshot_cache=snapshot_cache)
     return {"activity_regular_contributor_count": contributor_data["regular_count"]}
 
-def activity_regular_contribution_per_person(client, contributors_enriched_index, date, repo_list):
+def activity_regular_contribution_per_person(client, contributors_enriched_index, date, repo_list, snapshot_cache=None):
     """ Defines the number of contributions per active regular contributor in the last 90 days.
     """
     contribution_per_person = 0
     from_date = (date - timedelta(days=90))
-    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date, filter_mileage="regular")
+    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date, filter_mileage="regular",
+                                               snapshot_cache=snapshot_cache)
     contributor_count = contributor_data["regular_count"]
     if contributor_count > 0:
         contribution_count_list = [contributor_item["contribution_without_observe"] for contributor_item in contributor_data["contributor_detail_list"]]
@@ -861,23 +1107,25 @@ def activity_regular_contribution_per_person(client, contributors_enriched_index
         contribution_per_person = contribution_count / contributor_count
     return {"activity_regular_contribution_per_person": contribution_per_person}
 
-def activity_core_contributor_count(client, contributors_enriched_index, date, repo_list):
+def activity_core_contributor_count(client, contributors_enriched_index, date, repo_list, snapshot_cache=None):
     """ Defining the last 90 days contributors who contribute 50% (excluding observation contributions like star, fork, watch) of 
     all domain-specific contributions in the current year, achieved by at least one group of people. 
     This group is referred to as core contributors. Contributions across domains are not weighted, 
     only counted by frequency.
     """
     from_date = (date - timedelta(days=90))
-    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date)
+    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date,
+                                               snapshot_cache=snapshot_cache)
     return {"activity_core_contributor_count": contributor_data["core_count"]}
 
 
-def activity_core_contribution_per_person(client, contributors_enriched_index, date, repo_list):
+def activity_core_contribution_per_person(client, contributors_enriched_index, date, repo_list, snapshot_cache=None):
     """ Defines the number of contributions per active core contributor in the last 90 days.
     """
     contribution_per_person = 0
     from_date = (date - timedelta(days=90))
-    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date, filter_mileage="core")
+    contributor_data = contributor_detail_list(client, contributors_enriched_index, date, repo_list, from_date, filter_mileage="core",
+                                               snapshot_cache=snapshot_cache)
     contributor_count = contributor_data["core_count"]
     if contributor_count > 0:
         contribution_count_list = [contributor_item["contribution_without_observe"] for contributor_item in contributor_data["contributor_detail_list"]]
@@ -1179,8 +1427,8 @@ def org_contributor_count_year(client, contributors_index, date, repo_list):
 
     from_date = (date - relativedelta(years=3)).replace(month=1, day=1)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     from_date_str = from_date.strftime("%Y-%m-%d")
     to_date_str = to_date.strftime("%Y-%m-%d")
     org_contributor_set = set()
@@ -1232,9 +1480,8 @@ def contributor_count_year(client, contributors_index, date, repo_list, from_dat
     to_date = date
     date_field_list = ["code_author_date_list", "issue_creation_date_list", "issue_comments_date_list",
                         "pr_creation_date_list", "pr_comments_date_list"]
-    contributor_count = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list)
-    contributor_count_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=True)
-    contributor_count_without_bot = get_contributor_count(client, contributors_index, from_date, to_date, repo_list, date_field_list, is_bot=False)
+    contributor_count, contributor_count_bot, contributor_count_without_bot = get_contributor_count_by_bot(
+        client, contributors_index, from_date, to_date, repo_list, date_field_list)
     result = {
         "contributor_count_year": contributor_count,
         "contributor_count_bot_year": contributor_count_bot,
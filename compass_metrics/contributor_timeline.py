@@ -0,0 +1,171 @@
+""" Contributor timelines
+
+The date fields of the contributor documents, e.g. code_author_date_list, are lists of ISO date strings that
+the metrics used to sort and filter again for every contributor and window. A timeline converts them once,
+when the contributors are loaded, to epoch microseconds, and keeps the dates of all the contributors and date
+fields in a single sorted array. The number of dates of every contributor and date field in a window is then
+read with two searchsorted calls, whatever the number of contributors and date fields.
+
+Dates are compared as instants, naive ones being UTC. For the UTC ISO dates written by the contributor stage,
+this is the same as comparing the strings.
+"""
+
+from compass_common.datetime import str_to_datetime
+import datetime
+import numpy as np
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_time(date):
+    """ Epoch microseconds of a date string, date or datetime, naive ones being UTC """
+    if isinstance(date, str):
+        try:
+            date = datetime.datetime.fromisoformat(date)
+        except ValueError:
+            date = str_to_datetime(date)
+    elif not isinstance(date, datetime.datetime):
+        date = datetime.datetime(date.year, date.month, date.day)
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return (date - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def get_time_array(date_list):
+    """ Epoch microseconds of date strings, the UTC ISO ones are parsed by numpy at once """
+    utc_date_list = [date[:-6] for date in date_list if date.endswith("+00:00")]
+    if len(utc_date_list) == len(date_list):
+        return np.array(utc_date_list, dtype="datetime64[us]").astype(np.int64)
+    time_array = np.empty(len(date_list), dtype=np.int64)
+    utc_index_list = []
+    for i, date in enumerate(date_list):
+        if date.endswith("+00:00"):
+            utc_index_list.append(i)
+        else:
+            time_array[i] = get_time(date)
+    time_array[utc_index_list] = np.array(utc_date_list, dtype="datetime64[us]").astype(np.int64)
+    return time_array
+
+
+class ContributorTimeline:
+    def __init__(self, contributor_list, date_field_list):
+        """ Dates of the contributors, sorted per contributor and date field
+
+        :param contributor_list: contributor dicts, a contributor is referred to by its index in the list
+        :param date_field_list: date fields of the timeline, e.g. code_author_date_list
+        """
+        self.contributor_list = contributor_list
+        self.date_field_list = list(date_field_list)
+        self.field_index_dict = {date_field: i for i, date_field in enumerate(self.date_field_list)}
+        length_list = []
+        date_list = []
+        for contributor in contributor_list:
+            for date_field in self.date_field_list:
+                field_date_list = contributor.get(date_field) or []
+                length_list.append(len(field_date_list))
+                date_list.extend(field_date_list)
+        contributor_field_array = np.arange(len(length_list), dtype=np.int64)
+        row_array = np.repeat(self.get_row(contributor_field_array // len(self.date_field_list),
+                                           contributor_field_array % len(self.date_field_list)), length_list)
+        time_array = get_time_array(date_list)
+        # a date is keyed by its (contributor, date field) row and the rank of its time among the distinct times,
+        # so that the keys of a row are contiguous and sorted by time
+        order = np.argsort(time_array, kind="stable")
+        sorted_time_array = time_array[order]
+        is_new_time = np.empty(len(sorted_time_array), dtype=bool)
+        is_new_time[:1] = True
+        np.not_equal(sorted_time_array[1:], sorted_time_array[:-1], out=is_new_time[1:])
+        self.time_array = sorted_time_array[is_new_time]
+        self.key_step = len(self.time_array) + 1
+        rank_array = np.empty(len(time_array), dtype=np.int64)
+        rank_array[order] = np.cumsum(is_new_time) - 1
+        key_array = row_array * self.key_step + rank_array
+        order = np.argsort(key_array, kind="stable")
+        self.key_array = key_array[order]
+        self.key_order = order
+        self.source_date_list = date_list
+        # dates in the order of the keys, built by the first get_date_list
+        self.date_list = None
+
+    def __len__(self):
+        """ Number of contributors """
+        return len(self.contributor_list)
+
+    def get_row(self, contributor_index, field_index):
+        return field_index * len(self.contributor_list) + contributor_index
+
+    def get_rank_range(self, from_date, to_date):
+        """ Ranks of the distinct times bounding [from_date, to_date) """
+        return (int(np.searchsorted(self.time_array, get_time(from_date))),
+                int(np.searchsorted(self.time_array, get_time(to_date))))
+
+    def get_count_array(self, from_date, to_date, date_field_list=None):
+        """ Number of dates of every contributor in [from_date, to_date)
+
+        :param from_date: date string, date or datetime
+        :param to_date: date string, date or datetime, excluded
+        :param date_field_list: date fields counted, all the date fields of the timeline if None
+        :return: int64 array of shape (contributors, date fields)
+        """
+        if date_field_list is None:
+            date_field_list = self.date_field_list
+        from_rank, to_rank = self.get_rank_range(from_date, to_date)
+        field_index_array = np.array([self.field_index_dict[date_field] for date_field in date_field_list],
+                                     dtype=np.int64)
+        row_array = self.get_row(np.arange(len(self.contributor_list), dtype=np.int64)[:, np.newaxis],
+                                 field_index_array[np.newaxis, :])
+        row_key_array = row_array * self.key_step
+        return (np.searchsorted(self.key_array, row_key_array + to_rank) -
+                np.searchsorted(self.key_array, row_key_array + from_rank))
+
+    def get_date_list(self, contributor_index, date_field, from_date, to_date):
+        """ Dates of a contributor in [from_date, to_date), sorted, as they are in its date field """
+        from_rank, to_rank = self.get_rank_range(from_date, to_date)
+        row_key = self.get_row(contributor_index, self.field_index_dict[date_field]) * self.key_step
+        start, end = np.searchsorted(self.key_array, [row_key + from_rank, row_key + to_rank]).tolist()
+        if self.date_list is None:
+            self.date_list = np.array(self.source_date_list, dtype=object)[self.key_order].tolist()
+        return self.date_list[start:end]
+
+    def get_window_count_list(self, window_list):
+        """ Number of dates of the contributors in each window, every date being bucketed into its window in a
+        single pass
+
+        :param window_list: (from_date, to_date) windows, sorted and not overlapping, to_date excluded
+        :return: (contributor index array, count array of shape (contributors, date fields)) per window, with the
+            contributors having a date in the window only, in the order of the contributor list
+        """
+        window_count = len(window_list)
+        contributor_count = len(self.contributor_list)
+        field_count = len(self.date_field_list)
+        from_time_array = np.array([get_time(from_date) for from_date, _ in window_list], dtype=np.int64)
+        to_time_array = np.array([get_time(to_date) for _, to_date in window_list], dtype=np.int64)
+        # window of each distinct time, window_count for the times in none of them
+        time_window_array = np.searchsorted(to_time_array, self.time_array, side="right")
+        in_window_array = time_window_array < window_count
+        in_window_array[in_window_array] = (self.time_array[in_window_array] >=
+                                            from_time_array[time_window_array[in_window_array]])
+        time_window_array[~in_window_array] = window_count
+
+        date_window_array = time_window_array[self.key_array % self.key_step]
+        date_row_array = self.key_array // self.key_step
+        is_selected = date_window_array < window_count
+        date_window_array = date_window_array[is_selected]
+        date_row_array = date_row_array[is_selected]
+        # (window, contributor, date field) of every date, sorted
+        key_array, count_array = np.unique(
+            (date_window_array * contributor_count + date_row_array % contributor_count) * field_count +
+            date_row_array // contributor_count, return_counts=True)
+        field_array = key_array % field_count
+        window_contributor_array = key_array // field_count
+        window_array = window_contributor_array // contributor_count
+        contributor_array = window_contributor_array % contributor_count
+
+        window_count_list = []
+        bound_list = np.searchsorted(window_array, np.arange(window_count + 1)).tolist()
+        for start, end in zip(bound_list[:-1], bound_list[1:]):
+            contributor_index_array, index_array = np.unique(contributor_array[start:end], return_inverse=True)
+            window_count_array = np.zeros((len(contributor_index_array), field_count), dtype=np.int64)
+            window_count_array[index_array.reshape(-1), field_array[start:end]] = count_array[start:end]
+            window_count_list.append((contributor_index_array, window_count_array))
+        return window_count_list
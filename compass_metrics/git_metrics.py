@@ -4,16 +4,19 @@ from compass_metrics.db_dsl import (get_updated_since_query,
                                     get_uuid_count_query,
                                     get_message_list_query,
                                     get_pr_query_by_commit_hash)
-from compass_metrics.contributor_metrics import get_contributor_list
+from compass_metrics.contributor_metrics import (get_commit_contributor_list,
+                                                 get_commit_contributor_timeline)
 from compass_metrics.repo_metrics import get_activity_repo_list
 from compass_common.datetime import (get_time_diff_months,
                                      check_times_has_overlap,
                                      get_oldest_date,
                                      get_latest_date,
                                      get_date_list)
-from compass_common.list_utils import split_list                                     
+from compass_common.commit_pr_index import CommitPrIndex, get_pr_hits_by_commit_hash
+from compass_common.affiliation_timeline import AffiliationTimeline
 from datetime import timedelta
 from compass_common.opensearch_utils import get_all_index_data
+from bisect import bisect_left, bisect_right
 import numpy as np
 import math
 import datetime
@@ -64,8 +67,8 @@ def commit_frequency(client, contributors_index, date, repo_list):
     """ Determine the average number of commits per week in the past 90 days. """
     from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     result = {
         'commit_frequency': get_commit_count(from_date, to_date, commit_contributor_list)/12.85,
         'commit_frequency_bot': get_commit_count(from_date, to_date, commit_contributor_list, is_bot=True)/12.85,
@@ -77,8 +80,8 @@ def commit_frequency_last_year(client, contributors_index, date, repo_list):
     """ Determine the average number of commits per week in the past 365 days. """
     from_date = date - timedelta(days=365)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     result = {
         'commit_frequency_last_year': get_commit_count(from_date, to_date, commit_contributor_list)/52.14,
         # 'commit_frequency_last_year_bot': get_commit_count(from_date, to_date, commit_contributor_list, is_bot=True)/52.14,
@@ -91,8 +94,8 @@ def org_count(client, contributors_index, date, repo_list):
     """ Number of organizations to which active code contributors belong in the past 90 days """
     from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     org_name_set = set()
     for contributor in commit_contributor_list:
         for org in contributor["org_change_date_list"]:
@@ -108,8 +111,8 @@ def org_count_all(client, contributors_index, date, repo_list):
     """ Number of organizations to which active code contributors belong """
     from_date = datetime.date(2000, 1, 1)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     org_name_set = set()
     for contributor in commit_contributor_list:
         for org in contributor["org_change_date_list"]:
@@ -126,8 +129,7 @@ def org_commit_frequency(client, contributors_index, date, repo_list):
     """ Determine the average number of commits with organization affiliation per week in the past 90 days. """
     from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    timeline = get_commit_contributor_timeline(client, contributors_index, from_date, to_date, repo_list)
     from_date_str = from_date.strftime("%Y-%m-%d")
     to_date_str = to_date.strftime("%Y-%m-%d")
     total_commit_count = 0
@@ -136,34 +138,40 @@ def org_commit_frequency(client, contributors_index, date, repo_list):
     org_commit_without_bot_count = 0
     org_commit_detail_dict = {}
 
-    for contributor in commit_contributor_list:
-        commit_date_list = [x for x in sorted(contributor["code_author_date_list"]) if from_date_str <= x < to_date_str]
+    for i, contributor in enumerate(timeline.contributor_list):
+        commit_date_list = timeline.get_date_list(i, "code_author_date_list", from_date_str, to_date_str)
         total_commit_count += len(commit_date_list)
-        for commit_date in commit_date_list:
-            for org in contributor["org_change_date_list"]:
-                if org["org_name"] is not None and org["first_date"] <= commit_date < org["last_date"]:
-                    org_commit_count += 1
-                    if contributor["is_bot"]:
-                        org_commit_bot_count += 1
-                    else:
-                        org_commit_without_bot_count += 1
-                    break
-
-            org_name_set = set()
-            for org in contributor["org_change_date_list"]:
-                org_name = org.get("org_name") if org.get("org_name") else org.get("domain")
-                if org_name in org_name_set:
-                    continue
-                org_name_set.add(org_name)
-                is_org = True if org.get("org_name") else False
-                count = org_commit_detail_dict.get(org_name, {}).get("org_commit", 0)
-                if org["first_date"] <= commit_date < org["last_date"]:
-                    count += 1
-                org_commit_detail_dict[org_name] = {
-                    "org_name": org_name,
-                    "is_org": is_org,
-                    "org_commit": count
-                }
+        if len(commit_date_list) == 0:
+            continue
+        # commits in one of the organizations of the contributor
+        affiliation_timeline = AffiliationTimeline()
+        for org in contributor["org_change_date_list"]:
+            if org["org_name"] is not None:
+                affiliation_timeline.add(org["first_date"], org["last_date"], org)
+        contributor_org_commit_count = int(np.count_nonzero(
+            affiliation_timeline.get_index_array(commit_date_list) >= 0))
+        org_commit_count += contributor_org_commit_count
+        if contributor["is_bot"]:
+            org_commit_bot_count += contributor_org_commit_count
+        else:
+            org_commit_without_bot_count += contributor_org_commit_count
+
+        # commits per organization, in the first date range of each organization of the contributor
+        org_name_set = set()
+        for org in contributor["org_change_date_list"]:
+            org_name = org.get("org_name") if org.get("org_name") else org.get("domain")
+            if org_name in org_name_set:
+                continue
+            org_name_set.add(org_name)
+            is_org = True if org.get("org_name") else False
+            count = org_commit_detail_dict.get(org_name, {}).get("org_commit", 0)
+            count += max(0, bisect_left(commit_date_list, org["last_date"]) -
+                         bisect_left(commit_date_list, org["first_date"]))
+            org_commit_detail_dict[org_name] = {
+                "org_name": org_name,
+                "is_org": is_org,
+                "org_commit": count
+            }
 
     org_commit_frequency_list = []
     for x in org_commit_detail_dict.values():
@@ -191,30 +199,26 @@ def org_contribution_last(client, contributors_index, date, repo_list):
     """ Total contribution time of all organizations to the community in the past 90 days (weeks). """
     from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
-    contribution_last = 0
-    repo_contributor_group_dict = {}
-    for contributor in commit_contributor_list:
-        repo_contributor_list = repo_contributor_group_dict.get(contributor["repo_name"], [])
-        repo_contributor_list.append(contributor)
-        repo_contributor_group_dict[contributor["repo_name"]] = repo_contributor_list
-
+    timeline = get_commit_contributor_timeline(client, contributors_index, from_date, to_date, repo_list)
     date_list = get_date_list(begin_date=str(from_date), end_date=str(to_date), freq='7D')
-    for repo, repo_contributor_list in repo_contributor_group_dict.items():
-        for day in date_list:
-            org_name_set = set()
-            from_day = (day - timedelta(days=7)).strftime("%Y-%m-%d")
-            to_day = day.strftime("%Y-%m-%d")
-            for contributor in repo_contributor_list:
-                for org in contributor["org_change_date_list"]:
-                    if org.get("org_name") is not None and check_times_has_overlap(org["first_date"], org["last_date"],
-                                                                                   from_day, to_day):
-                        for commit_date in contributor["code_author_date_list"]:
-                            if from_day <= commit_date <= to_day:
-                                org_name_set.add(org.get("org_name"))
-                                break
-            contribution_last += len(org_name_set)
+    from_day_list = [(day - timedelta(days=7)).strftime("%Y-%m-%d") for day in date_list]
+    to_day_list = [day.strftime("%Y-%m-%d") for day in date_list]
+    # whether each contributor has a commit in each week
+    has_commit_array = np.stack([timeline.get_count_array(from_day, to_day)[:, 0] > 0
+                                 for from_day, to_day in zip(from_day_list, to_day_list)], axis=1) \
+        if len(date_list) > 0 else np.zeros((len(timeline), 0), dtype=bool)
+    # organizations of the weeks of each repository
+    repo_week_org_name_set_dict = {}
+    for i, contributor in enumerate(timeline.contributor_list):
+        for org in contributor["org_change_date_list"]:
+            if org.get("org_name") is None:
+                continue
+            # the weeks overlapping the organization date range
+            from_week = bisect_left(to_day_list, org["first_date"])
+            to_week = bisect_right(from_day_list, org["last_date"])
+            for week in (np.flatnonzero(has_commit_array[i, from_week:to_week]) + from_week).tolist():
+                repo_week_org_name_set_dict.setdefault((contributor["repo_name"], week), set()).add(org["org_name"])
+    contribution_last = sum(len(org_name_set) for org_name_set in repo_week_org_name_set_dict.values())
     result = {
         "org_contribution_last": contribution_last
     }
@@ -278,10 +282,11 @@ def maintained(client, git_index, issue_index, date, repos_list):
 
 
 
-def commit_pr_linked_ratio(client, contributors_index, git_index, pr_index, date, repos_list):
+def commit_pr_linked_ratio(client, contributors_index, git_index, pr_index, date, repos_list, commit_pr_index=None):
     """ Determine the percentage of new code commit link pull request in the last 90 days """
     code_commit_count = commit_count(client, contributors_index, date, repos_list)["commit_count"]
-    code_commit_pr_linked_count = commit_pr_linked_count(client, git_index, pr_index, date, repos_list)["commit_pr_linked_count"]
+    code_commit_pr_linked_count = commit_pr_linked_count(client, git_index, pr_index, date, repos_list,
+                                                         commit_pr_index)["commit_pr_linked_count"]
 
     result = {
         'commit_pr_linked_ratio': code_commit_pr_linked_count/code_commit_count if code_commit_count > 0 else None
@@ -294,8 +299,8 @@ def commit_count(client, contributors_index, date, repo_list, from_date=None):
     if from_date is None:
         from_date = date - timedelta(days=90)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     result = {
         'commit_count': get_commit_count(from_date, to_date, commit_contributor_list),
         'commit_count_bot': get_commit_count(from_date, to_date, commit_contributor_list, is_bot=True),
@@ -304,8 +309,8 @@ def commit_count(client, contributors_index, date, repo_list, from_date=None):
     return result
 
 def commit_count_quarterly(client, contributors_index, to_date, repo_list, from_date):
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     result = {
         'commit_count_quarterly': get_commit_count(from_date, to_date, commit_contributor_list),
         'commit_count_quarterly_bot': get_commit_count(from_date, to_date, commit_contributor_list, is_bot=True),
@@ -313,32 +318,30 @@ def commit_count_quarterly(client, contributors_index, to_date, repo_list, from_
     }
     return result
 
-def commit_pr_linked_count(client, git_index, pr_index, date, repos_list):
-    """ Determine the numbers of new code commit link pull request in the last 90 days. """
+def commit_pr_linked_count(client, git_index, pr_index, date, repos_list, commit_pr_index=None):
+    """ Determine the numbers of new code commit link pull request in the last 90 days.
+    :param commit_pr_index: CommitPrIndex of pr_index and repos_list shared by the dates of a model run, whose
+        90 days windows have most of their commits in common, None to look the commits up for this date only
+    """
+    def get_pr_query(hash_terms):
+        pr_query = get_pr_query_by_commit_hash(repos_list, hash_terms)
+        pr_query["_source"] = ["commits_data", "merge_commit_sha"]
+        return pr_query
+
     def get_pr_list_by_commit_hash(hash_list):
-        pr_hits = []
-        hash_list_group = split_list(hash_list)
-        for hash_l in hash_list_group:
-            pr_hit = client.search(index=pr_index, body=get_pr_query_by_commit_hash(repos_list, hash_l))["hits"]["hits"]
-            pr_hits = pr_hits + pr_hit
-        return pr_hits
-    
+        return get_pr_hits_by_commit_hash(client, pr_index, hash_list, get_pr_query)
+
     repo_git_list = [repo+".git" for repo in repos_list]
     commit_message_list = get_message_list(client, git_index, date - timedelta(days=90), date, repo_git_list)
     commit_hash_set = {message["hash"] for message in commit_message_list}
     commit_hash_list = list(commit_hash_set)
     if len(commit_hash_list) == 0:
         return {'commit_pr_linked_count': 0}
-    
-    pr_all_message = get_pr_list_by_commit_hash(commit_hash_list)
-    pr_commit_hash = set()
-    for pr_item in pr_all_message:
-        for commit_data in pr_item["_source"].get("commits_data", []):
-            pr_commit_hash.add(commit_data)
-        merge_commit_sha = pr_item["_source"].get("merge_commit_sha", None)
-        if merge_commit_sha:
-            pr_commit_hash.add(merge_commit_sha)
-    linked_count = commit_hash_set & pr_commit_hash
+
+    if commit_pr_index is None:
+        commit_pr_index = CommitPrIndex()
+    pr_data_dict = commit_pr_index.get_pr_data_dict(commit_hash_list, get_pr_list_by_commit_hash)
+    linked_count = {commit_hash for commit_hash in commit_hash_set if commit_hash in pr_data_dict}
 
     result = {
         'commit_pr_linked_count': len(linked_count)
@@ -416,8 +419,8 @@ def commit_count_year(client, contributors_index, date, repo_list, from_date=Non
     if from_date is None:
         from_date = (date - relativedelta(years=3)).replace(month=1, day=1)
     to_date = date
-    commit_contributor_list = get_contributor_list(client, contributors_index, from_date, to_date, repo_list,
-                                                   "code_author_date_list")
+    commit_contributor_list = get_commit_contributor_list(client, contributors_index, from_date, to_date,
+                                                          repo_list)
     result = {
         'commit_count_year': get_commit_count(from_date, to_date, commit_contributor_list),
         'commit_count_bot_year': get_commit_count(from_date, to_date, commit_contributor_list, is_bot=True),
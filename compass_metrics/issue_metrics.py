@@ -4,7 +4,7 @@ from compass_metrics.db_dsl import get_uuid_count_query, get_updated_issues_coun
 from datetime import timedelta
 from compass_common.datetime import get_time_diff_days
 from compass_common.algorithm_utils import get_medium
-from compass_common.opensearch_utils import get_all_index_data
+from compass_common.opensearch_utils import get_all_index_data, get_generator
 from dateutil.relativedelta import relativedelta
 
 
@@ -53,9 +53,8 @@ def bug_issue_open_time(client, issue_index, date, repos_list):
         }
     }
     query_issue_opens["query"]["bool"]["must"].append(bug_query)
-    issue_opens_items = get_all_index_data(client, issue_index, query_issue_opens)
-    if len(issue_opens_items) == 0:
-        return { "bug_issue_open_time_avg": None, "bug_issue_open_time_mid": None }
+    issue_opens_items = get_generator(client, issue_index, query_issue_opens,
+                                      source=["state", "closed_at", "created_at"])
     issue_open_time_repo = []
     date_str = date.isoformat()
     for item in issue_opens_items:
@@ -66,6 +65,8 @@ def bug_issue_open_time(client, issue_index, date, repos_list):
             else:
                 issue_open_time_repo.append(get_time_diff_days(
                     item['_source']['created_at'],date_str))
+    if len(issue_open_time_repo) == 0:
+        return { "bug_issue_open_time_avg": None, "bug_issue_open_time_mid": None }
     issue_open_time_repo_avg = sum(issue_open_time_repo)/len(issue_open_time_repo)
     issue_open_time_repo_mid = get_medium(issue_open_time_repo)
     result = {
@@ -1,5 +1,5 @@
 from compass_metrics.db_dsl import get_license_query
-from compass_common.opensearch_utils import get_all_index_data
+from compass_common.opensearch_utils import get_generator
 from compass_metrics.constants.license_constants import (
     LICENSE_COMPATIBILITY, COMMERCIAL_ALLOWED_LICENSES, WEAK_LICENSES, CLAIM_REQUIRED_LICENSES)
 
@@ -8,7 +8,7 @@ def get_license_msg(client, contributors_index, version, repo_list, page_size=1)
         只取一条，如果有多条则取grimoire_creation_date最新的
         """
     query = get_license_query(repo_list, page_size, version)
-    license_msg = get_all_index_data(client, index=contributors_index, body=query)
+    license_msg = get_generator(client, index=contributors_index, body=query, source=["license"])
 
     # 初始化存储所有许可证的集合
     all_licenses = set()
@@ -0,0 +1,207 @@
+""" Window metrics of a whole date list at once
+
+Each function fetches a single daily date_histogram (or a single contributor scan) covering
+every window of the date list, and derives the rolling 90-day windows with cumulative sums.
+The results are the same as the per-date functions of the same name, one dict per date.
+"""
+
+from compass_metrics.db_dsl import (get_uuid_count_query,
+                                    get_pr_closed_uuid_count,
+                                    get_updated_since_query)
+from compass_metrics.contributor_metrics import get_contributor_generator
+from compass_common.datetime import get_time_diff_months
+import numpy as np
+
+WINDOW_DAYS = 90
+
+
+def get_day_array(date_list):
+    """ Days of the dates as datetime64[D] """
+    return np.array([date.strftime("%Y-%m-%d") for date in date_list], dtype="datetime64[D]")
+
+
+def get_day_offset(day, start_day):
+    """ Number of days from start_day to day """
+    return int((day - start_day) // np.timedelta64(1, "D"))
+
+
+def get_window_range(date_list, window_days=WINDOW_DAYS):
+    """ First and last(exclusive) day covered by the windows [date - window_days, date) of the dates """
+    day_array = get_day_array(date_list)
+    return day_array.min() - window_days, day_array.max()
+
+
+def get_window_sum(daily_value, start_day, date_list, window_days=WINDOW_DAYS):
+    """ Sum of the daily values over [date - window_days, date) of every date.
+    :param daily_value: values indexed by the number of days since start_day
+    """
+    cumsum = np.concatenate(([0], np.cumsum(daily_value)))
+    end_index = np.clip((get_day_array(date_list) - start_day).astype(np.int64), 0, len(daily_value))
+    start_index = np.clip(end_index - window_days, 0, None)
+    return cumsum[end_index] - cumsum[start_index]
+
+
+def get_daily_histogram(client, index, query, date_field, start_day, end_day, value_field=None):
+    """ Daily number of documents of the query between start_day and end_day(exclusive),
+    with the daily sum and count of value_field if given.
+    """
+    days = get_day_offset(end_day, start_day)
+    query["size"] = 0
+    query["aggs"] = {
+        "daily": {
+            "date_histogram": {
+                "field": date_field,
+                "interval": "1d",
+                "format": "yyyy-MM-dd",
+                "min_doc_count": 1
+            }
+        }
+    }
+    if value_field:
+        query["aggs"]["daily"]["aggs"] = {
+            "sum_of_value": {"sum": {"field": value_field}},
+            "count_of_value": {"value_count": {"field": value_field}}
+        }
+    daily = {
+        "doc_count": np.zeros(days, dtype=np.int64),
+        "sum": np.zeros(days, dtype=np.float64),
+        "value_count": np.zeros(days, dtype=np.int64)
+    }
+    buckets = client.search(index=index, body=query)["aggregations"]["daily"]["buckets"]
+    for bucket in buckets:
+        i = get_day_offset(np.datetime64(bucket["key_as_string"], "D"), start_day)
+        if i < 0 or i >= days:
+            continue
+        daily["doc_count"][i] = bucket["doc_count"]
+        if value_field:
+            daily["sum"][i] = bucket["sum_of_value"]["value"] or 0
+            daily["value_count"][i] = bucket["count_of_value"]["value"]
+    return daily
+
+
+def get_daily_commit_count(client, contributors_index, start_day, end_day, repo_list):
+    """ Daily number of commits from the code_author_date_list of the contributors, all, bot and without bot """
+    days = get_day_offset(end_day, start_day)
+    start_str, end_str = str(start_day), str(end_day)
+    commit_day_dict = {None: [], True: [], False: []}
+    contributor_list = get_contributor_generator(client, contributors_index, start_day.item(), end_day.item(),
+                                                 repo_list, "code_author_date_list",
+                                                 source=["code_author_date_list", "is_bot"])
+    for contributor in contributor_list:
+        commit_day_list = [commit_date[:10] for commit_date in contributor["code_author_date_list"]
+                           if start_str <= commit_date[:10] < end_str]
+        commit_day_dict[None].extend(commit_day_list)
+        if contributor["is_bot"] in (True, False):
+            commit_day_dict[contributor["is_bot"]].extend(commit_day_list)
+    return {
+        is_bot: np.bincount((np.array(day_list, dtype="datetime64[D]") - start_day).astype(np.int64),
+                            minlength=days)
+        for is_bot, day_list in commit_day_dict.items()
+    }
+
+
+def created_since(client, git_index, date_list, repo_list):
+    """ Determine how long a repository has existed since it was created (in months). """
+    repos_git_list = [repo + ".git" for repo in repo_list]
+    query_first_commit_since = get_updated_since_query(
+        repos_git_list, date_field='grimoire_creation_date', to_date=max(date_list), operation="min")
+    buckets = client.search(
+        index=git_index, body=query_first_commit_since)['aggregations']['group_by_origin']['buckets']
+    first_commit_list = [bucket['grimoire_creation_date']['value_as_string'] for bucket in buckets]
+    result_list = []
+    for date in date_list:
+        date_str = date.strftime("%Y-%m-%d")
+        created_since_list = [get_time_diff_months(first_commit, str(date)) for first_commit in first_commit_list
+                              if first_commit[:10] < date_str]
+        result_list.append({
+            "created_since": round(sum(created_since_list), 4) if created_since_list else None
+        })
+    return result_list
+
+
+def commit_frequency(client, contributors_index, date_list, repo_list):
+    """ Determine the average number of commits per week in the past 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    daily = get_daily_commit_count(client, contributors_index, start_day, end_day, repo_list)
+    window = {is_bot: get_window_sum(daily_count, start_day, date_list) for is_bot, daily_count in daily.items()}
+    return [{
+        'commit_frequency': int(window[None][i])/12.85,
+        'commit_frequency_bot': int(window[True][i])/12.85,
+        'commit_frequency_without_bot': int(window[False][i])/12.85
+    } for i in range(len(date_list))]
+
+
+def commit_count(client, contributors_index, date_list, repo_list):
+    """ Determine the number of commits in the past 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    daily = get_daily_commit_count(client, contributors_index, start_day, end_day, repo_list)
+    window = {is_bot: get_window_sum(daily_count, start_day, date_list) for is_bot, daily_count in daily.items()}
+    return [{
+        'commit_count': int(window[None][i]),
+        'commit_count_bot': int(window[True][i]),
+        'commit_count_without_bot': int(window[False][i])
+    } for i in range(len(date_list))]
+
+
+def comment_frequency(client, issue_index, date_list, repo_list):
+    """ Determine the average number of comments per issue created in the last 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    query = get_uuid_count_query("sum", repo_list, "num_of_comments_without_bot", date_field='grimoire_creation_date',
+                                 size=0, from_date=start_day.item(), to_date=end_day.item())
+    query["query"]["bool"]["must"].append({"match_phrase": {"pull_request": "false"}})
+    daily = get_daily_histogram(client, issue_index, query, "grimoire_creation_date", start_day, end_day,
+                                "num_of_comments_without_bot")
+    comment_sum = get_window_sum(daily["sum"], start_day, date_list)
+    issue_count = get_window_sum(daily["doc_count"], start_day, date_list)
+    return [{
+        'comment_frequency': float(round(float(comment_sum[i] / issue_count[i]), 4)) if issue_count[i] else None
+    } for i in range(len(date_list))]
+
+
+def closed_issues_count(client, issue_index, date_list, repo_list):
+    """ Determine the number of issues closed in the last 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    query = get_uuid_count_query("cardinality", repo_list, "uuid", from_date=start_day.item(), to_date=end_day.item())
+    query["query"]["bool"]["must"].append({"match_phrase": {"pull_request": "false" }})
+    query["query"]["bool"]["must_not"] = [
+                        {"term": {"state": "open"}},
+                        {"term": {"state": "progressing"}}
+                    ]
+    daily = get_daily_histogram(client, issue_index, query, "grimoire_creation_date", start_day, end_day)
+    return [{'closed_issues_count': int(count)} for count in get_window_sum(daily["doc_count"], start_day, date_list)]
+
+
+def code_review_count(client, pr_index, date_list, repo_list):
+    """ Determine the average number of review comments per pr created in the last 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    query = get_uuid_count_query("avg", repo_list, "num_review_comments_without_bot", size=0,
+                                 from_date=start_day.item(), to_date=end_day.item())
+    query["query"]["bool"]["must"].append({"match_phrase": {"pull_request": "true" }})
+    daily = get_daily_histogram(client, pr_index, query, "grimoire_creation_date", start_day, end_day,
+                                "num_review_comments_without_bot")
+    pr_count = get_window_sum(daily["doc_count"], start_day, date_list)
+    comment_sum = get_window_sum(daily["sum"], start_day, date_list)
+    comment_value_count = get_window_sum(daily["value_count"], start_day, date_list)
+    return [{
+        'code_review_count': round(float(comment_sum[i] / comment_value_count[i]), 4)
+        if pr_count[i] and comment_value_count[i] else None
+    } for i in range(len(date_list))]
+
+
+def close_pr_count(client, pr_index, date_list, repos_list):
+    """ The number of PR accepted and declined in the last 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    query = get_pr_closed_uuid_count("cardinality", repos_list, "uuid", from_date=start_day.item(),
+                                     to_date=end_day.item())
+    daily = get_daily_histogram(client, pr_index, query, "closed_at", start_day, end_day)
+    return [{"close_pr_count": int(count)} for count in get_window_sum(daily["doc_count"], start_day, date_list)]
+
+
+def pr_count(client, pr_index, date_list, repos_list):
+    """ The number of PR created in the last 90 days. """
+    start_day, end_day = get_window_range(date_list)
+    query = get_uuid_count_query("cardinality", repos_list, "uuid", size=0, from_date=start_day.item(),
+                                 to_date=end_day.item())
+    query["query"]["bool"]["must"].append({"match_phrase": {"pull_request": "true"}})
+    daily = get_daily_histogram(client, pr_index, query, "grimoire_creation_date", start_day, end_day)
+    return [{"pr_count": int(count)} for count in get_window_sum(daily["doc_count"], start_day, date_list)]
@@ -4,9 +4,6 @@ import logging
 from functools import reduce
 from urllib.parse import urlparse
 
-from perceval.backend import uuid
-
-from grimoire_elk.elastic import ElasticSearch
 from grimoirelab_toolkit.datetime import datetime_utcnow
 
 from elasticsearch import Elasticsearch, RequestsHttpConnection
@@ -94,11 +91,23 @@ class MetricsSummary:
         aggregations = response.get('aggregations')
         return reduce(self.metrics_model_enrich, self.summary_fields(), {'aggs': aggregations, 'res': {}})
 
-    def metrics_model_summary(self, elastic_url):
-        is_https = urlparse(elastic_url).scheme == 'https'
-        self.es_in = Elasticsearch(
-            elastic_url, use_ssl=is_https, verify_certs=False, connection_class=RequestsHttpConnection)
-        self.es_out = ElasticSearch(elastic_url, self.out_index)
+    def metrics_model_summary(self, elastic_url, es_in=None, es_out=None):
+        """ Summarize the metric index into the out index
+        :param elastic_url: the url of the opensearch database
+        :param es_in: client of the metric index used instead of one of elastic_url, e.g. an offline client
+        :param es_out: writer of the out index with a grimoire_elk ElasticSearch bulk_upload, used instead of
+            one of elastic_url
+        """
+        if es_in is None:
+            is_https = urlparse(elastic_url).scheme == 'https'
+            es_in = Elasticsearch(
+                elastic_url, use_ssl=is_https, verify_certs=False, connection_class=RequestsHttpConnection)
+        if es_out is None:
+            # imported here, the injected writers do not need grimoire_elk
+            from grimoire_elk.elastic import ElasticSearch
+            es_out = ElasticSearch(elastic_url, self.out_index)
+        self.es_in = es_in
+        self.es_out = es_out
         date_list = get_date_list(self.from_date, self.end_date)
 
         item_datas = []
@@ -1,18 +1,25 @@
 import json
 import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import hashlib
 import pendulum
 import urllib3
 import pkg_resources
 import yaml
 
-from compass_common.opensearch_utils import get_client, get_helpers as helpers
+from compass_common.opensearch_utils import (get_client, get_request_budget, RequestBudgetClient,
+                                             CallStatsClient, track_call_stats, query_trace_config, get_query_stats,
+                                             get_helpers as helpers)
 from compass_common.datetime import (get_date_list,                                    
                                      datetime_utcnow,
                                      get_last_three_years_dates,
                                      get_last_four_quarters_dates)
 from compass_common.uuid_utils import get_uuid
 from compass_common.algorithm_utils import get_score_by_criticality_score, normalize, get_score_by_aggregate_score
+from compass_common.commit_pr_index import CommitPrIndex
 from compass_metrics.db_dsl import get_release_index_mapping, get_repo_message_query
 from compass_metrics.git_metrics import (created_since,
                                          updated_since,
@@ -82,7 +89,11 @@ from compass_metrics.contributor_metrics import (contributor_count,
                                                  activity_issue_contribution_per_person,
                                                  types_of_contributions,
                                                  contributor_count_year,
-                                                 org_contributor_count_year
+                                                 org_contributor_count_year,
+                                                 commit_contributor_cache,
+                                                 contributor_count_date_field_dict,
+                                                 prefetch_contributor_count_by_bot,
+                                                 ContributorSnapshotCache
                                                  )
 from compass_metrics.issue_metrics import (comment_frequency,
                                            closed_issues_count,
@@ -125,9 +136,12 @@ from compass_metrics.code_readability import evaluate_code_readability
 from compass_metrics.document_metric import Industry_Support
 from compass_metrics.security_metric import VulnerabilityMetrics
 from compass_metrics_model.metric_constants import COMMUNITY_PORTRAIT_METRICS, SOFTWARE_ARTIFACT_PROTRAIT_METRICS
+from compass_metrics import window_metrics
 
 
 logger = logging.getLogger(__name__)
+# One json line per metric and date, route or silence it separately from the run log
+metric_stats_logger = logging.getLogger(__name__ + ".metric_stats")
 urllib3.disable_warnings()
 
 MAX_BULK_UPDATE_SIZE = 500
@@ -135,6 +149,20 @@ MAX_BULK_UPDATE_SIZE = 500
 SOFTWARE_ARTIFACT = "software-artifact"
 GOVERNANCE = "governance"
 
+# Metrics of a group read the same data, they run one after another so that the first one fills the cache
+METRICS_FETCH_GROUP = {
+    **{metric_field: "contributor_count" for metric_field in contributor_count_date_field_dict.keys()},
+    **{metric_field: "contributor_detail" for metric_field in ["activity_casual_contributor_count",
+                                                               "activity_regular_contributor_count",
+                                                               "activity_core_contributor_count",
+                                                               "activity_casual_contribution_per_person",
+                                                               "activity_regular_contribution_per_person",
+                                                               "activity_core_contribution_per_person"]}
+}
+
+# Upper bounds in seconds of the metric latency histogram buckets
+METRIC_SECONDS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
 DECAY_COEFFICIENT = 0.0027
 INCREMENT_DECAY_METRICS = ["issue_first_reponse_avg",
                            "issue_first_reponse_mid",
@@ -307,6 +335,14 @@ class BaseMetricsModel:
         self.client = None
         self.compass_metric_model_opencheck = "compass_metric_model_opencheck"
         self.openchecker_index = openchecker_index
+        self.date_workers = 1
+        self.metric_workers = 1
+        self.metric_stats_dict = {}
+        self.metric_stats_lock = threading.Lock()
+        # Contributor snapshots of the windows of a run, shared by the activity metrics, see set_client
+        self.contributor_snapshot_cache = None
+        # Commit to pull request indexes of the repositories of a run, see get_commit_pr_index
+        self.commit_pr_index_cache = None
 
         if type(metrics_weights_thresholds) == dict:
             default_metrics_thresholds = self.get_default_metrics_thresholds()
@@ -343,9 +379,17 @@ class BaseMetricsModel:
         return metrics_thresholds_data
 
 
-    def metrics_model_metrics(self, elastic_url):
-        """ Execute model calculation tasks """
-        self.client = get_client(elastic_url)
+    def metrics_model_metrics(self, elastic_url, date_workers=1, max_concurrent_requests=None, metric_workers=1,
+                              metric_stats_file=None, slow_metric_top_n=10):
+        """ Execute model calculation tasks
+        :param elastic_url: the url of the opensearch database
+        :param date_workers: number of date points whose metrics are fetched concurrently
+        :param max_concurrent_requests: upper bound of the concurrent requests to the cluster, None for no limit
+        :param metric_workers: number of metric fetch groups of a date point run concurrently
+        :param metric_stats_file: path of a Prometheus text file written with the metric stats at the end of the run
+        :param slow_metric_top_n: number of the slowest metrics logged at the end of the run
+        """
+        self.set_client(elastic_url, date_workers, max_concurrent_requests, metric_workers)
         if self.level == "repo":
             repo_list = get_repo_list(self.json_file, self.source)
             if len(repo_list) > 0:
@@ -380,9 +424,12 @@ class BaseMetricsModel:
                                                   SOFTWARE_ARTIFACT)
                     if len(governance_repo_list) > 0:
                         self.metrics_model_enrich(governance_repo_list, self.community, self.level, GOVERNANCE)
+        logger.info(f"{self.model_name} contributor snapshot cache: {self.contributor_snapshot_cache.stats()}")
+        self.report_metric_stats(metric_stats_file, slow_metric_top_n)
 
-    def metrics_model_custom(self, elastic_url):
-        self.client = get_client(elastic_url)
+    def metrics_model_custom(self, elastic_url, date_workers=1, max_concurrent_requests=None, metric_workers=1,
+                             metric_stats_file=None, slow_metric_top_n=10):
+        self.set_client(elastic_url, date_workers, max_concurrent_requests, metric_workers)
         if self.level == "repo":
             repo_list = get_repo_list(self.json_file, self.source)
             if len(repo_list) > 0:
@@ -393,19 +440,72 @@ class BaseMetricsModel:
             combined_repo_list = software_artifact_repo_list + governance_repo_list
             if len(combined_repo_list) > 0:
                 self.metrics_model_enrich_custom(combined_repo_list, self.community, self.level)
+        logger.info(f"{self.model_name} contributor snapshot cache: {self.contributor_snapshot_cache.stats()}")
+        self.report_metric_stats(metric_stats_file, slow_metric_top_n)
+
+    def set_client(self, elastic_url, date_workers=1, max_concurrent_requests=None, metric_workers=1):
+        """ Set the client and the concurrency of the date points and metrics """
+        self.client = get_client(elastic_url)
+        if max_concurrent_requests:
+            self.client = RequestBudgetClient(self.client, get_request_budget(elastic_url, max_concurrent_requests))
+        self.client = CallStatsClient(self.client)
+        self.date_workers = date_workers
+        self.metric_workers = metric_workers
+        self.contributor_snapshot_cache = ContributorSnapshotCache()
+        commit_contributor_cache.clear()
+        self.commit_pr_index_cache = ContributorSnapshotCache(max_size=16)
+        with self.metric_stats_lock:
+            self.metric_stats_dict = {}
+
+    def get_commit_pr_index(self, repo_list):
+        """ Commit to pull request index of the repositories, shared by the dates of the run, None outside
+        of a run
+        """
+        if self.commit_pr_index_cache is None:
+            return None
+        cache_key = tuple(sorted(repo_list))
+        commit_pr_index = self.commit_pr_index_cache.get(cache_key)
+        if commit_pr_index is None:
+            commit_pr_index = CommitPrIndex()
+            self.commit_pr_index_cache.put(cache_key, commit_pr_index)
+        return commit_pr_index
+
+    def get_date_metrics_list(self, date_list, repo_list, label, window_metrics_list=None):
+        """ Yield (date, (metrics, metric_list)) in date order, None instead of the metrics if the repositories
+        were not created yet. The metrics of date_workers date points are fetched concurrently, the caller keeps
+        the decay and score calculation sequential.
+        """
+        if window_metrics_list is None:
+            window_metrics_list = [None] * len(date_list)
+
+        def get_date_metrics(date, window_metrics):
+            logger.info(f"{str(date)}--{self.model_name}--{label}")
+            if window_metrics and "created_since" in window_metrics:
+                created_since_metric = window_metrics["created_since"]["created_since"]
+            else:
+                created_since_metric = created_since(self.client, self.git_index, date, repo_list)["created_since"]
+            if created_since_metric is None:
+                return None
+            return self.get_metrics(date, repo_list, window_metrics)
+
+        if self.date_workers <= 1:
+            for date, window_metrics in zip(date_list, window_metrics_list):
+                yield date, get_date_metrics(date, window_metrics)
+            return
+        with ThreadPoolExecutor(max_workers=self.date_workers) as pool:
+            yield from zip(date_list, pool.map(get_date_metrics, date_list, window_metrics_list))
 
     def metrics_model_enrich(self, repo_list, label, level, type=None):
         """Calculate the metrics model data of the repo list, and output the metrics model data once a week on Monday"""
         last_metrics_data = {}
         add_release_message(self.client, repo_list, self.repo_index, self.release_index)
         date_list = get_date_list(self.from_date, self.end_date)
+        window_metrics_list = self.get_window_metrics(date_list, repo_list)
         item_datas = []
-        for date in date_list:
-            logger.info(f"{str(date)}--{self.model_name}--{label}")
-            created_since_metric = created_since(self.client, self.git_index, date, repo_list)["created_since"]
-            if created_since_metric is None:
+        for date, date_metrics in self.get_date_metrics_list(date_list, repo_list, label, window_metrics_list):
+            if date_metrics is None:
                 continue
-            metrics, _ = self.get_metrics(date, repo_list)
+            metrics, _ = date_metrics
 
             metrics_uuid = get_uuid(str(date), self.community, level, label, self.model_name, type,
                                     self.custom_fields_hash)
@@ -490,12 +590,10 @@ class BaseMetricsModel:
         add_release_message(self.client, repo_list, self.repo_index, self.release_index)
         date_list = get_last_three_years_dates()
         item_datas = []
-        for date in date_list:
-            logger.info(f"{str(date)}--{self.model_name}--{label}")
-            created_since_metric = created_since(self.client, self.git_index, date, repo_list)["created_since"]
-            if created_since_metric is None:
+        for date, date_metrics in self.get_date_metrics_list(date_list, repo_list, label):
+            if date_metrics is None:
                 continue
-            metrics, _ = self.get_metrics(date, repo_list)
+            metrics, _ = date_metrics
             metrics_uuid = get_uuid(str(date), self.community, level, label, self.model_name, type,
                                     self.custom_fields_hash,"year")
             metrics_data = {
@@ -528,12 +626,10 @@ class BaseMetricsModel:
         add_release_message(self.client, repo_list, self.repo_index, self.release_index)
         date_list = get_last_four_quarters_dates()
         item_datas = []
-        for date in date_list:
-            logger.info(f"{str(date)}--{self.model_name}--{label}")
-            created_since_metric = created_since(self.client, self.git_index, date, repo_list)["created_since"]
-            if created_since_metric is None:
+        for date, date_metrics in self.get_date_metrics_list(date_list, repo_list, label):
+            if date_metrics is None:
                 continue
-            metrics, _ = self.get_metrics(date, repo_list)
+            metrics, _ = date_metrics
             metrics_uuid = get_uuid(str(date), self.community, level, label, self.model_name, type,
                                     self.custom_fields_hash,"year")
             metrics_data = {
@@ -568,13 +664,12 @@ class BaseMetricsModel:
         date_list = get_date_list(self.from_date, self.end_date)
         item_datas = []
         version_number = self.custom_fields.get("version_number")
+        window_metrics_list = self.get_window_metrics(date_list, repo_list)
 
-        for date in date_list:
-            logger.info(f"{str(date)}--{self.model_name}--{label}")
-            created_since_metric = created_since(self.client, self.git_index, date, repo_list)["created_since"]
-            if created_since_metric is None:
+        for date, date_metrics in self.get_date_metrics_list(date_list, repo_list, label, window_metrics_list):
+            if date_metrics is None:
                 continue
-            _, metrics_list = self.get_metrics(date, repo_list)
+            _, metrics_list = date_metrics
 
             for metric_name, metric_detail in metrics_list.items():
                 uuid = get_uuid(str(date), level, label, self.model_name, metric_name)
@@ -608,8 +703,37 @@ class BaseMetricsModel:
                     item_datas = []
             helpers().bulk(client=self.client, actions=item_datas)
 
-    def get_metrics(self, date, repo_list):
-        """ Get the corresponding metrics data according to the metrics field """
+    def get_window_metrics(self, date_list, repo_list):
+        """ Compute the 90-day window metrics of every date at once, a list of {metric_field: result} per date.
+        created_since is always included, it decides which dates are calculated.
+        """
+        window_metrics_switch = {
+            "created_since": lambda: window_metrics.created_since(self.client, self.git_index, date_list, repo_list),
+            "commit_frequency": lambda: window_metrics.commit_frequency(self.client, self.contributors_index, date_list, repo_list),
+            "commit_count": lambda: window_metrics.commit_count(self.client, self.contributors_index, date_list, repo_list),
+            "comment_frequency": lambda: window_metrics.comment_frequency(self.client, self.issue_index, date_list, repo_list),
+            "closed_issues_count": lambda: window_metrics.closed_issues_count(self.client, self.issue_index, date_list, repo_list),
+            "code_review_count": lambda: window_metrics.code_review_count(self.client, self.pr_index, date_list, repo_list),
+            "close_pr_count": lambda: window_metrics.close_pr_count(self.client, self.pr_index, date_list, repo_list),
+            "pr_count": lambda: window_metrics.pr_count(self.client, self.pr_index, date_list, repo_list),
+        }
+        window_metrics_list = [{} for _ in date_list]
+        if len(date_list) == 0:
+            return window_metrics_list
+        metric_field_list = ["created_since"] + [metric_field for metric_field in self.metrics_weights_thresholds.keys()
+                                                 if metric_field in window_metrics_switch and metric_field != "created_since"]
+        for metric_field in metric_field_list:
+            result_list = self.run_metric(metric_field + ":window", None, window_metrics_switch[metric_field])
+            for date_window_metrics, result in zip(window_metrics_list, result_list):
+                date_window_metrics[metric_field] = result
+        return window_metrics_list
+
+    def get_metrics(self, date, repo_list, window_metrics=None):
+        """ Get the corresponding metrics data according to the metrics field
+        :param window_metrics: results of this date already computed by get_window_metrics
+        """
+        # Contributor counts of this date point fetched together by the contributor_count fetch group
+        count_cache = ContributorSnapshotCache()
         metrics_switch = {
             # git metadata
             "commit_frequency": lambda: commit_frequency(self.client, self.contributors_index, date, repo_list),
@@ -623,9 +747,9 @@ class BaseMetricsModel:
             "lines_remove_of_code_frequency": lambda: lines_remove_of_code_frequency(self.client, self.git_index, date, repo_list),
             "is_maintained": lambda: is_maintained(self.client, self.git_index, self.contributors_index, date, repo_list, self.level),
             "maintained": lambda: maintained(self.client, self.git_index, self.issue_index, date, repo_list),
-            "commit_pr_linked_ratio": lambda: commit_pr_linked_ratio(self.client, self.contributors_index, self.git_index, self.pr_index, date, repo_list),
+            "commit_pr_linked_ratio": lambda: commit_pr_linked_ratio(self.client, self.contributors_index, self.git_index, self.pr_index, date, repo_list, self.get_commit_pr_index(repo_list)),
             "commit_count": lambda: commit_count(self.client, self.contributors_index, date, repo_list),
-            "commit_pr_linked_count": lambda: commit_pr_linked_count(self.client, self.git_index, self.pr_index, date, repo_list),
+            "commit_pr_linked_count": lambda: commit_pr_linked_count(self.client, self.git_index, self.pr_index, date, repo_list, self.get_commit_pr_index(repo_list)),
             "org_commit_frequency": lambda: org_commit_frequency(self.client, self.contributors_index, date, repo_list),
             "org_contribution_last": lambda: org_contribution_last(self.client, self.contributors_index, date, repo_list),
             "commit_count_year": lambda: commit_count_year(self.client, self.contributors_index, date, repo_list),
@@ -667,28 +791,28 @@ class BaseMetricsModel:
             "recent_releases_count": lambda: recent_releases_count(self.client, self.release_index, date, repo_list),
             "branch_protection": lambda: branch_protection(self.client, self.repo_index, repo_list),
             # contributor
-            "contributor_count": lambda: contributor_count(self.client, self.contributors_index, date, repo_list),
+            "contributor_count": lambda: contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
             "contributor_count_all": lambda: contributor_count_all(self.client, self.contributors_index, date, repo_list),
-            "code_contributor_count": lambda: code_contributor_count(self.client, self.contributors_index, date, repo_list),
-            "commit_contributor_count": lambda: commit_contributor_count(self.client, self.contributors_index, date, repo_list),
-            "pr_authors_contributor_count": lambda: pr_authors_contributor_count(self.client, self.contributors_index, date, repo_list),
-            "pr_review_contributor_count": lambda: pr_review_contributor_count(self.client, self.contributors_index, date, repo_list),
-            "issue_authors_contributor_count": lambda: issue_authors_contributor_count(self.client, self.contributors_index, date, repo_list),
-            "issue_comments_contributor_count": lambda: issue_comments_contributor_count(self.client, self.contributors_index, date, repo_list),
+            "code_contributor_count": lambda: code_contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
+            "commit_contributor_count": lambda: commit_contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
+            "pr_authors_contributor_count": lambda: pr_authors_contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
+            "pr_review_contributor_count": lambda: pr_review_contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
+            "issue_authors_contributor_count": lambda: issue_authors_contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
+            "issue_comments_contributor_count": lambda: issue_comments_contributor_count(self.client, self.contributors_index, date, repo_list, count_cache=count_cache),
             "org_contributor_count": lambda: org_contributor_count(self.client, self.contributors_index, date, repo_list),
             "contributors": lambda: contributors(self.client, self.contributors_enriched_index, repo_list),
             "bus_factor": lambda: bus_factor(self.client, self.contributors_index, date, repo_list),
-            "activity_casual_contributor_count": lambda: activity_casual_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
-            "activity_regular_contributor_count": lambda: activity_regular_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
-            "activity_core_contributor_count": lambda: activity_core_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
+            "activity_casual_contributor_count": lambda: activity_casual_contributor_count(self.client, self.contributors_enriched_index, date, repo_list, snapshot_cache=self.contributor_snapshot_cache),
+            "activity_regular_contributor_count": lambda: activity_regular_contributor_count(self.client, self.contributors_enriched_index, date, repo_list, snapshot_cache=self.contributor_snapshot_cache),
+            "activity_core_contributor_count": lambda: activity_core_contributor_count(self.client, self.contributors_enriched_index, date, repo_list, snapshot_cache=self.contributor_snapshot_cache),
             "activity_organization_contributor_count": lambda: activity_organization_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
             "activity_individual_contributor_count": lambda: activity_individual_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
             "activity_observation_contributor_count": lambda: activity_observation_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
             "activity_code_contributor_count": lambda: activity_code_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
             "activity_issue_contributor_count": lambda: activity_issue_contributor_count(self.client, self.contributors_enriched_index, date, repo_list),
-            "activity_casual_contribution_per_person": lambda: activity_casual_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list),
-            "activity_regular_contribution_per_person": lambda: activity_regular_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list),
-            "activity_core_contribution_per_person": lambda: activity_core_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list),
+            "activity_casual_contribution_per_person": lambda: activity_casual_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list, snapshot_cache=self.contributor_snapshot_cache),
+            "activity_regular_contribution_per_person": lambda: activity_regular_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list, snapshot_cache=self.contributor_snapshot_cache),
+            "activity_core_contribution_per_person": lambda: activity_core_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list, snapshot_cache=self.contributor_snapshot_cache),
             "activity_organization_contribution_per_person": lambda: activity_organization_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list),
             "activity_individual_contribution_per_person": lambda: activity_individual_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list),
             "activity_observation_contribution_per_person": lambda: activity_observation_contribution_per_person(self.client, self.contributors_enriched_index, date, repo_list),
@@ -749,17 +873,149 @@ class BaseMetricsModel:
 
         
         
+        metric_field_list = list(self.metrics_weights_thresholds.keys())
+        result_dict = {}
+        for metric_field in metric_field_list:
+            if window_metrics and metric_field in window_metrics:
+                result_dict[metric_field] = window_metrics[metric_field]
+            elif metric_field not in metrics_switch:
+                raise Exception("Invalid metric")
+
+        def run_metric_group(task):
+            """ Run the metrics of a fetch group one after another, so that they share the fetched data """
+            group, group_metric_field_list = task
+            if group == "contributor_count" and len(group_metric_field_list) > 1:
+                self.run_metric(group + ":prefetch", date, lambda: prefetch_contributor_count_by_bot(
+                    self.client, self.contributors_index, date, repo_list, group_metric_field_list, count_cache))
+            group_result_dict = {}
+            for metric_field in group_metric_field_list:
+                group_result_dict[metric_field] = self.run_metric(metric_field, date, metrics_switch[metric_field])
+            return group_result_dict
+
+        task_list = self.get_metric_task_list([metric_field for metric_field in metric_field_list
+                                               if metric_field not in result_dict])
+        if self.metric_workers <= 1 or len(task_list) <= 1:
+            for task in task_list:
+                result_dict.update(run_metric_group(task))
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.metric_workers, len(task_list))) as pool:
+                for group_result_dict in pool.map(run_metric_group, task_list):
+                    result_dict.update(group_result_dict)
+
         metrics = {}
         metric_list = {}
-        for metric_field in self.metrics_weights_thresholds.keys():
-            if metric_field in metrics_switch:
-                result = metrics_switch[metric_field]()
-                metrics.update(result)
-                metric_list[metric_field] = result
-            else:
-                raise Exception("Invalid metric")
+        for metric_field in metric_field_list:
+            metrics.update(result_dict[metric_field])
+            metric_list[metric_field] = result_dict[metric_field]
         return metrics, metric_list
 
+    def get_metric_task_list(self, metric_field_list):
+        """ Group the metrics by the data they fetch, [(group, [metric_field, ...]), ...] """
+        task_dict = {}
+        for metric_field in metric_field_list:
+            group = METRICS_FETCH_GROUP.get(metric_field, metric_field)
+            task_dict.setdefault(group, []).append(metric_field)
+        return list(task_dict.items())
+
+    def run_metric(self, metric_field, date, function):
+        """ Run a metric fetch and record its wall time, api calls, returned hits and response bytes
+        :param date: the date point of the metric, None for a metric of the whole date list
+        """
+        with track_call_stats() as stats:
+            start_time = time.perf_counter()
+            result = function()
+            stats["seconds"] = time.perf_counter() - start_time
+        self.record_metric_stats(metric_field, date, stats)
+        return result
+
+    def record_metric_stats(self, metric_field, date, stats):
+        """ Accumulate the stats of a metric fetch and log them as a json line """
+        metric_stats_logger.info(json.dumps({
+            "model_name": self.model_name,
+            "metric": metric_field,
+            "date": date.isoformat() if date is not None else None,
+            "seconds": round(stats["seconds"], 4),
+            "calls": stats["calls"],
+            "hits": stats["hits"],
+            "response_bytes": stats["response_bytes"]
+        }))
+        with self.metric_stats_lock:
+            metric_stats = self.metric_stats_dict.setdefault(metric_field, {
+                "count": 0, "seconds": 0.0, "max_seconds": 0.0, "calls": 0, "hits": 0, "response_bytes": 0,
+                "buckets": [0] * len(METRIC_SECONDS_BUCKETS)
+            })
+            metric_stats["count"] += 1
+            metric_stats["seconds"] += stats["seconds"]
+            metric_stats["max_seconds"] = max(metric_stats["max_seconds"], stats["seconds"])
+            for key in ["calls", "hits", "response_bytes"]:
+                metric_stats[key] += stats[key]
+            for i, upper_bound in enumerate(METRIC_SECONDS_BUCKETS):
+                if stats["seconds"] <= upper_bound:
+                    metric_stats["buckets"][i] += 1
+
+    def get_metric_stats(self):
+        """ Stats of every metric since the client was set, the slowest first """
+        with self.metric_stats_lock:
+            stats_list = [{
+                "metric": metric_field,
+                "count": metric_stats["count"],
+                "seconds": round(metric_stats["seconds"], 4),
+                "avg_seconds": round(metric_stats["seconds"] / metric_stats["count"], 4),
+                "max_seconds": round(metric_stats["max_seconds"], 4),
+                "calls": metric_stats["calls"],
+                "hits": metric_stats["hits"],
+                "response_bytes": metric_stats["response_bytes"]
+            } for metric_field, metric_stats in self.metric_stats_dict.items()]
+        return sorted(stats_list, key=lambda x: x["seconds"], reverse=True)
+
+    def get_metric_stats_prometheus(self):
+        """ Metric stats in the Prometheus text exposition format """
+        model_name = self.model_name.replace("\\", "\\\\").replace('"', '\\"')
+        lines = [
+            "# HELP compass_metric_seconds Wall time of a metric fetch.",
+            "# TYPE compass_metric_seconds histogram"
+        ]
+        with self.metric_stats_lock:
+            metric_stats_list = [(metric_field, dict(metric_stats, buckets=list(metric_stats["buckets"])))
+                                 for metric_field, metric_stats in sorted(self.metric_stats_dict.items())]
+        for metric_field, metric_stats in metric_stats_list:
+            labels = f'model="{model_name}",metric="{metric_field}"'
+            for upper_bound, bucket_count in zip(METRIC_SECONDS_BUCKETS, metric_stats["buckets"]):
+                lines.append(f'compass_metric_seconds_bucket{{{labels},le="{upper_bound}"}} {bucket_count}')
+            lines.append(f'compass_metric_seconds_bucket{{{labels},le="+Inf"}} {metric_stats["count"]}')
+            lines.append(f'compass_metric_seconds_sum{{{labels}}} {metric_stats["seconds"]}')
+            lines.append(f'compass_metric_seconds_count{{{labels}}} {metric_stats["count"]}')
+        for key, help_text in [("calls", "Api calls made by metric fetches."),
+                               ("hits", "Hits returned to metric fetches."),
+                               ("response_bytes", "Response bytes received by metric fetches.")]:
+            lines.append(f"# HELP compass_metric_{key}_total {help_text}")
+            lines.append(f"# TYPE compass_metric_{key}_total counter")
+            for metric_field, metric_stats in metric_stats_list:
+                lines.append(f'compass_metric_{key}_total{{model="{model_name}",metric="{metric_field}"}} '
+                             f'{metric_stats[key]}')
+        return "\n".join(lines) + "\n"
+
+    def report_metric_stats(self, metric_stats_file=None, slow_metric_top_n=10):
+        """ Log the slowest metrics of the run and write the Prometheus text file if given """
+        stats_list = self.get_metric_stats()
+        if slow_metric_top_n and stats_list:
+            logger.info(f"{self.model_name} top {slow_metric_top_n} slow metrics:")
+            for stats in stats_list[:slow_metric_top_n]:
+                logger.info(f"{stats['metric']}: {stats['seconds']}s in {stats['count']} fetches, "
+                            f"avg {stats['avg_seconds']}s, max {stats['max_seconds']}s, {stats['calls']} calls, "
+                            f"{stats['hits']} hits, {stats['response_bytes']} bytes")
+        if slow_metric_top_n and query_trace_config["enabled"]:
+            logger.info(f"top {slow_metric_top_n} query fingerprints:")
+            for stats in get_query_stats(slow_metric_top_n):
+                logger.info(f"{stats['fingerprint']} {stats['api']} {stats['index']}: {stats['seconds']}s in "
+                            f"{stats['calls']} calls, max {stats['max_seconds']}s, {stats['hits']} hits, "
+                            f"{stats['response_bytes']} bytes, query {json.dumps(stats['query'])}")
+        if metric_stats_file:
+            tmp_file = metric_stats_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                f.write(self.get_metric_stats_prometheus())
+            os.replace(tmp_file, metric_stats_file)
+
     def get_metrics_score(self, metrics_data):
         """ get model scores based on metric values """
         new_metrics_weights_thresholds = {}
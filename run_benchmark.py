@@ -0,0 +1,411 @@
+""" End-to-end benchmark of contributor profiling, metric models and metric summaries
+
+A synthetic dataset of configurable size (repos x contributors x weeks x events per repo and week)
+is loaded into the offline backend, then each stage runs on it and records its wall time, number
+of requests, request and response bytes and the peak RSS of the process. The JSON report can be
+compared with the report of another commit to catch regressions:
+
+    python run_benchmark.py --repos 2 --contributors 20 --weeks 26 --events 40 --output new.json
+    python run_benchmark.py --baseline old.json --tolerance 0.2
+
+Bytes are the size of the serialized request bodies and responses, as a remote cluster would transfer them.
+The peak RSS is the high-water mark of the process when the stage ends, stages run in the order of the report.
+With --trace-queries N the report also lists the N most time consuming query fingerprints of the whole run.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from compass_common.offline_client import OfflineClient, offline_client_dict
+from compass_common.opensearch_utils import (set_query_tracing, get_query_stats, clear_query_stats, get_client,
+                                             get_helpers as helpers)
+from compass_contributor.contributor_dev_org_repo import ContributorDevOrgRepo
+from compass_model.collaboration.robustness.activity_metrics_model import ActivityMetricsModel
+from compass_metrics_model.metrics_model_summary import ActivityMetricsSummary
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "github"
+END_DATE = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+BENCHMARK_INDEX = {
+    "repo_index": "github-repo_enriched",
+    "git_index": "github-git_enriched",
+    "issue_index": "github-issues_enriched",
+    "pr_index": "github-pulls_enriched",
+    "issue_comments_index": "github-issues-comments_enriched",
+    "pr_comments_index": "github-pulls-comments_enriched",
+    "event_index": "github-event_enriched",
+    "stargazer_index": "github-stargazer_enriched",
+    "fork_index": "github-fork_enriched",
+    "release_index": "github-release_enriched",
+    "contributors_index": "github-contributors_org_repo",
+    "contributors_enriched_index": "github-contributors_org_repo_enriched",
+    "out_index": "compass_metric_model_activity",
+    "summary_index": "compass_metric_model_activity_summary"
+}
+# Share of the events of a week by item type
+EVENT_TYPE_WEIGHT = {
+    "commit": 30,
+    "issue": 10,
+    "pr": 10,
+    "issue_comment": 15,
+    "pr_comment": 15,
+    "event": 15,
+    "star": 3,
+    "fork": 2
+}
+EVENT_TYPE_LIST = ["LabeledEvent", "ClosedEvent", "AssignedEvent", "MergedEvent", "PullRequestReview"]
+ORG_DOMAIN_LIST = ["huawei.com", "microsoft.com", "google.com", "gmail.com", "users.noreply.github.com"]
+STAGE_METRIC_LIST = ["wall_time", "requests", "request_bytes", "response_bytes", "peak_rss_mb"]
+
+
+def get_uuid(*args):
+    """ Deterministic sha1 uuid of the args """
+    return hashlib.sha1(":".join(str(arg) for arg in args).encode("utf-8")).hexdigest()
+
+
+def generate_dataset(repos, contributors, weeks, events, seed=0):
+    """ Generate the enriched indexes of a synthetic dataset
+    :param repos: number of repositories
+    :param contributors: number of contributors of each repository
+    :param weeks: number of weeks of activity before END_DATE
+    :param events: number of items of each repository in each week
+    :return: repo list, from date and list of (index, id, source)
+    """
+    rand = random.Random(seed)
+    from_date = END_DATE - datetime.timedelta(weeks=weeks)
+    repo_list = ["https://github.com/benchmark/repo{}".format(i) for i in range(repos)]
+    type_list = list(EVENT_TYPE_WEIGHT.keys())
+    weight_list = list(EVENT_TYPE_WEIGHT.values())
+    item_list = []
+
+    def add(index_key, source):
+        item_list.append((BENCHMARK_INDEX[index_key], source["uuid"], source))
+
+    for repo in repo_list:
+        user_list = [{
+            "login": "user{}".format(i),
+            "name": "User {}".format(i),
+            "email": "user{}@{}".format(i, ORG_DOMAIN_LIST[i % len(ORG_DOMAIN_LIST)])
+        } for i in range(contributors)]
+        add("repo_index", {"uuid": get_uuid(repo), "origin": repo, "tag": repo,
+                           "created_at": (from_date - datetime.timedelta(days=365)).isoformat(),
+                           "metadata__enriched_on": END_DATE.isoformat(), "releases": []})
+        hash_list = []
+        for week in range(weeks):
+            week_start = from_date + datetime.timedelta(weeks=week)
+            for i, item_type in enumerate(rand.choices(type_list, weight_list, k=events)):
+                user = rand.choice(user_list)
+                date = week_start + datetime.timedelta(seconds=rand.randint(0, 7 * 86400 - 1))
+                uuid = get_uuid(repo, week, i)
+                base = {
+                    "uuid": uuid,
+                    "origin": repo,
+                    "tag": repo,
+                    "grimoire_creation_date": date.isoformat(),
+                    "metadata__updated_on": date.isoformat(),
+                    "metadata__enriched_on": date.isoformat(),
+                    "user_login": user["login"],
+                    "author_name": user["name"],
+                    "user_email": user["email"],
+                    "is_bot": False
+                }
+                if item_type == "commit":
+                    hash_list.append(uuid)
+                    add("git_index", {
+                        **base,
+                        "origin": repo + ".git",
+                        "tag": repo + ".git",
+                        "hash": uuid,
+                        "author_email": user["email"],
+                        "committer_name": user["name"],
+                        "committer_email": user["email"],
+                        "parents": [hash_list[-2]] if len(hash_list) > 1 else [],
+                        "message_analyzed": "change {}\n\nSigned-off-by: {} <{}>".format(i, user["name"], user["email"]),
+                        "lines_added": rand.randint(1, 200),
+                        "lines_removed": rand.randint(0, 100),
+                        "lines_changed": rand.randint(1, 300),
+                        "files": rand.randint(1, 10),
+                        "commit_date": date.isoformat(),
+                        "author_date": date.isoformat(),
+                        "utc_commit": date.isoformat(),
+                        "utc_author": date.isoformat()
+                    })
+                elif item_type in ("issue", "pr"):
+                    is_pr = item_type == "pr"
+                    closed = rand.random() < 0.6
+                    closed_at = (date + datetime.timedelta(days=rand.randint(0, 30))).isoformat() if closed else None
+                    source = {
+                        **base,
+                        "id": uuid,
+                        "item_type": "pull request" if is_pr else "issue",
+                        "pull_request": is_pr,
+                        "state": "closed" if closed else "open",
+                        "created_at": date.isoformat(),
+                        "updated_at": closed_at or date.isoformat(),
+                        "closed_at": closed_at,
+                        "labels": ["bug"] if rand.random() < 0.2 else ["enhancement"],
+                        "num_of_comments_without_bot": rand.randint(0, 10),
+                        "time_to_first_attention_without_bot": rand.random() * 10,
+                        "time_to_close_days": rand.random() * 30 if closed else None,
+                        "time_open_days": rand.random() * 30
+                    }
+                    if is_pr:
+                        merged = closed and rand.random() < 0.8
+                        source.update({
+                            "merged": merged,
+                            "merged_at": closed_at if merged else None,
+                            "merge_commit_sha": hash_list[-1] if merged and hash_list else None,
+                            "commits_data": hash_list[-2:] if merged else [],
+                            "merged_by_data_name": rand.choice(user_list)["name"] if merged else None,
+                            "merge_author_login": rand.choice(user_list)["login"] if merged else None,
+                            "num_review_comments_without_bot": rand.randint(0, 10),
+                            "linked_issues_count": rand.randint(0, 2)
+                        })
+                    add("pr_index" if is_pr else "issue_index", source)
+                elif item_type in ("issue_comment", "pr_comment"):
+                    is_pr = item_type == "pr_comment"
+                    add("pr_comments_index" if is_pr else "issue_comments_index", {
+                        **base,
+                        "item_type": "comment",
+                        "issue_pull_request": is_pr,
+                        "pull_request": is_pr
+                    })
+                elif item_type == "event":
+                    event_type = rand.choice(EVENT_TYPE_LIST)
+                    add("event_index", {
+                        **base,
+                        "event_type": event_type,
+                        "pull_request": event_type in ("MergedEvent", "PullRequestReview") or rand.random() < 0.5,
+                        "actor_username": user["login"],
+                        "reporter_user_name": rand.choice(user_list)["login"],
+                        "merge_state": "merged"
+                    })
+                else:
+                    add("stargazer_index" if item_type == "star" else "fork_index", base)
+    return repo_list, from_date, item_list
+
+
+class RequestCounter:
+    """ Client proxy counting the api calls and their serialized request and response bytes """
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.request_bytes = 0
+            self.response_bytes = 0
+
+    def get_stats(self):
+        with self.lock:
+            return {"requests": self.requests, "request_bytes": self.request_bytes,
+                    "response_bytes": self.response_bytes}
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+        serializer = self.client.transport.serializer
+
+        def call(*args, **kwargs):
+            body = kwargs.get("body", args[0] if args else None)
+            request_bytes = len(serializer.dumps(body)) if body is not None else 0
+            result = attr(*args, **kwargs)
+            response_bytes = len(json.dumps(result, default=str)) if isinstance(result, dict) else 0
+            with self.lock:
+                self.requests += 1
+                self.request_bytes += request_bytes
+                self.response_bytes += response_bytes
+            return result
+        return call
+
+
+class BulkUploader:
+    """ Writer of an index with the bulk_upload of grimoire_elk ElasticSearch, for the offline backend """
+
+    def __init__(self, client, index):
+        self.client = client
+        self.index = index
+
+    def bulk_upload(self, items, field_id):
+        actions = [{"_index": self.index, "_id": item[field_id], "_source": item} for item in items]
+        helpers().bulk(client=self.client, actions=actions)
+        return len(actions)
+
+
+def get_peak_rss_mb():
+    """ High-water mark of the resident set size of the process in MB """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+def run_stage(name, function, counter):
+    """ Run a stage and return its measurements """
+    logger.info("benchmark stage {} start".format(name))
+    counter.reset()
+    start_time = time.perf_counter()
+    function()
+    stage = {"wall_time": round(time.perf_counter() - start_time, 4)}
+    stage.update(counter.get_stats())
+    stage["peak_rss_mb"] = get_peak_rss_mb()
+    logger.info("benchmark stage {}: {}".format(name, stage))
+    return stage
+
+
+def get_git_commit():
+    """ Commit of the working tree, None outside a git repository """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.realpath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(repos, contributors, weeks, events, seed=0, work_dir=None, trace_queries=0,
+                  slow_query_seconds=None):
+    """ Run every stage on a synthetic dataset and return the report
+    :param trace_queries: number of the most time consuming query fingerprints added to the report
+    :param slow_query_seconds: queries taking at least this long are logged with their DSL
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="compass_benchmark_")
+    os.makedirs(work_dir, exist_ok=True)
+    url = "offline://" + os.path.join(os.path.abspath(work_dir), "benchmark.sqlite")
+    if os.path.exists(url[len("offline://"):]):
+        os.remove(url[len("offline://"):])
+    counter = RequestCounter(OfflineClient(url[len("offline://"):]))
+    offline_client_dict[url] = counter
+    json_file = os.path.join(work_dir, "benchmark_repos.json")
+
+    repo_list, from_date, item_list = generate_dataset(repos, contributors, weeks, events, seed)
+    with open(json_file, "w") as f:
+        json.dump({"benchmark": {SOURCE: repo_list}}, f)
+    from_date_str, end_date_str = from_date.strftime("%Y-%m-%d"), END_DATE.strftime("%Y-%m-%d")
+
+    contributor = ContributorDevOrgRepo(
+        json_file, BENCHMARK_INDEX["issue_index"], BENCHMARK_INDEX["pr_index"],
+        BENCHMARK_INDEX["issue_comments_index"], BENCHMARK_INDEX["pr_comments_index"], BENCHMARK_INDEX["git_index"],
+        BENCHMARK_INDEX["contributors_index"], BENCHMARK_INDEX["contributors_enriched_index"], from_date_str,
+        end_date_str, BENCHMARK_INDEX["repo_index"], event_index=BENCHMARK_INDEX["event_index"],
+        stargazer_index=BENCHMARK_INDEX["stargazer_index"], fork_index=BENCHMARK_INDEX["fork_index"], level="repo")
+    model = ActivityMetricsModel(
+        BENCHMARK_INDEX["repo_index"], BENCHMARK_INDEX["git_index"], BENCHMARK_INDEX["issue_index"],
+        BENCHMARK_INDEX["pr_index"], BENCHMARK_INDEX["issue_comments_index"], BENCHMARK_INDEX["pr_comments_index"],
+        BENCHMARK_INDEX["contributors_index"], BENCHMARK_INDEX["release_index"], BENCHMARK_INDEX["out_index"],
+        from_date_str, end_date_str, "repo", None, SOURCE, json_file)
+    summary = ActivityMetricsSummary(BENCHMARK_INDEX["out_index"], model.model_name, from_date_str, end_date_str,
+                                     BENCHMARK_INDEX["summary_index"])
+
+    def processing_data():
+        contributor.prepare(url)
+        for repo in repo_list:
+            contributor.processing_data(repo)
+            contributor.client.indices.flush(index=contributor.contributors_index)
+
+    def contributor_enrich():
+        for repo in repo_list:
+            contributor.contributor_enrich(repo)
+
+    def metrics_model_enrich():
+        model.set_client(url)
+        for repo in repo_list:
+            model.metrics_model_enrich([repo], repo, "repo")
+
+    if trace_queries or slow_query_seconds is not None:
+        set_query_tracing(True, slow_query_seconds)
+        clear_query_stats()
+    stage_dict = {}
+    stage_dict["load"] = run_stage("load", lambda: counter.client.save_items(item_list), counter)
+    stage_dict["contributor_processing_data"] = run_stage("contributor_processing_data", processing_data, counter)
+    stage_dict["contributor_enrich"] = run_stage("contributor_enrich", contributor_enrich, counter)
+    stage_dict["metrics_model_enrich"] = run_stage("metrics_model_enrich", metrics_model_enrich, counter)
+    stage_dict["metrics_model_summary"] = run_stage(
+        "metrics_model_summary",
+        lambda: summary.metrics_model_summary(url, es_in=get_client(url),
+                                              es_out=BulkUploader(get_client(url), summary.out_index)),
+        counter)
+    offline_client_dict.pop(url, None)
+    report = {
+        "commit": get_git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "dataset": {"repos": repos, "contributors": contributors, "weeks": weeks, "events": events, "seed": seed,
+                    "documents": len(item_list)},
+        "stages": stage_dict
+    }
+    if trace_queries:
+        report["query_stats"] = get_query_stats(trace_queries)
+    return report
+
+
+def compare_report(report, baseline, tolerance=0.2):
+    """ Regressions of the report against a baseline report: stage measurements growing more than tolerance
+    :return: list of regression messages, empty if there is none
+    """
+    regression_list = []
+    if report["dataset"] != baseline["dataset"]:
+        regression_list.append("dataset differs from the baseline: {} != {}".format(
+            report["dataset"], baseline["dataset"]))
+        return regression_list
+    for stage_name, stage in report["stages"].items():
+        baseline_stage = baseline["stages"].get(stage_name)
+        if baseline_stage is None:
+            continue
+        for metric in STAGE_METRIC_LIST:
+            value, baseline_value = stage.get(metric), baseline_stage.get(metric)
+            if not baseline_value or value is None:
+                continue
+            if value > baseline_value * (1 + tolerance):
+                regression_list.append("{} {}: {} -> {} (+{:.0%})".format(
+                    stage_name, metric, baseline_value, value, value / baseline_value - 1))
+    return regression_list
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on a synthetic dataset")
+    parser.add_argument("--repos", type=int, default=2)
+    parser.add_argument("--contributors", type=int, default=20, help="contributors of each repository")
+    parser.add_argument("--weeks", type=int, default=26)
+    parser.add_argument("--events", type=int, default=40, help="items of each repository in each week")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", default=None, help="directory of the store, a temporary one by default")
+    parser.add_argument("--output", default=None, help="path of the JSON report, stdout by default")
+    parser.add_argument("--baseline", default=None, help="JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed growth over the baseline")
+    parser.add_argument("--trace-queries", type=int, default=0, help="query fingerprints to add to the report")
+    parser.add_argument("--slow-query-seconds", type=float, default=None, help="log the DSL of slower queries")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    report = run_benchmark(args.repos, args.contributors, args.weeks, args.events, args.seed, args.work_dir,
+                           args.trace_queries, args.slow_query_seconds)
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report_json)
+    else:
+        print(report_json)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regression_list = compare_report(report, json.load(f), args.tolerance)
+        for regression in regression_list:
+            logger.warning("regression " + regression)
+        sys.exit(1 if regression_list else 0)
@@ -0,0 +1,121 @@
+""" The affiliation timeline against splitting each affiliation by all the ones accepted before it """
+
+from collections import deque
+import datetime
+import random
+import unittest
+
+from compass_common.affiliation_timeline import AffiliationTimeline
+from compass_common.datetime import check_times_has_overlap
+
+BASE_DATE = datetime.date(2023, 1, 1)
+
+
+def get_date(day):
+    return (BASE_DATE + datetime.timedelta(days=day)).isoformat()
+
+
+def find_non_overlap_ranges(start_time1, end_time1, start_time2, end_time2):
+    """ Parts of the range 2 not covered by the range 1 """
+    non_overlap = []
+    if check_times_has_overlap(start_time1, end_time1, start_time2, end_time2):
+        if start_time2 < start_time1:
+            non_overlap.append([start_time2, start_time1])
+        if end_time2 > end_time1:
+            non_overlap.append([end_time1, end_time2])
+    else:
+        non_overlap.append([start_time2, end_time2])
+    return non_overlap
+
+
+def get_priority_part_list(affiliation_list):
+    """ Parts of each affiliation not covered by the ones before it, split against every accepted part """
+    accepted_list = []
+    result_list = []
+    for first_date, last_date in affiliation_list:
+        date_deque = deque([[first_date, last_date]])
+        for accepted_first_date, accepted_last_date in accepted_list:
+            next_date_deque = deque()
+            while date_deque:
+                date_item = date_deque.popleft()
+                next_date_deque.extend(find_non_overlap_ranges(accepted_first_date, accepted_last_date,
+                                                               date_item[0], date_item[1]))
+            date_deque = next_date_deque
+        part_list = [tuple(date_item) for date_item in date_deque]
+        accepted_list.extend(part_list)
+        result_list.append(part_list)
+    return result_list
+
+
+def get_affiliation_list(seed, count, days):
+    """ Affiliations of a few days, touching or of a single date """
+    rand = random.Random(seed)
+    affiliation_list = []
+    for _ in range(count):
+        first_day = rand.randint(0, days)
+        last_day = first_day + rand.choice([0, 0, 1, 2, 5, rand.randint(0, days)])
+        affiliation_list.append((get_date(first_day), get_date(last_day)))
+    return affiliation_list
+
+
+class AffiliationTimelineTest(unittest.TestCase):
+    def assert_same(self, affiliation_list):
+        affiliation_timeline = AffiliationTimeline()
+        part_list = [affiliation_timeline.add(first_date, last_date, i)
+                     for i, (first_date, last_date) in enumerate(affiliation_list)]
+        expected_part_list = get_priority_part_list(affiliation_list)
+        self.assertEqual([sorted(parts) for parts in part_list], [sorted(parts) for parts in expected_part_list])
+        return affiliation_timeline, part_list
+
+    def test_touching(self):
+        _, part_list = self.assert_same([(get_date(0), get_date(5)), (get_date(5), get_date(9)),
+                                         (get_date(-3), get_date(0)), (get_date(0), get_date(9))])
+        self.assertEqual(part_list[1], [(get_date(5), get_date(9))])
+        self.assertEqual(part_list[3], [])
+
+    def test_single_date(self):
+        _, part_list = self.assert_same([(get_date(3), get_date(3)), (get_date(3), get_date(3)),
+                                         (get_date(0), get_date(6)), (get_date(3), get_date(4)),
+                                         (get_date(6), get_date(6))])
+        self.assertEqual(part_list[1], [])
+        self.assertEqual(part_list[2], [(get_date(0), get_date(3)), (get_date(3), get_date(6))])
+        self.assertEqual(part_list[4], [])
+
+    def test_first_date_after_last_date(self):
+        """ Kept as it is without covering the later affiliations, which the splitting turned into overlapping
+        parts
+        """
+        affiliation_timeline = AffiliationTimeline()
+        self.assertEqual(affiliation_timeline.add(get_date(5), get_date(2)), [(get_date(5), get_date(2))])
+        self.assertEqual(affiliation_timeline.add(get_date(0), get_date(9)), [(get_date(0), get_date(9))])
+        self.assertEqual(affiliation_timeline.add(get_date(4), get_date(1)), [(get_date(4), get_date(1))])
+        self.assertEqual(affiliation_timeline.add(get_date(3), get_date(12)), [(get_date(9), get_date(12))])
+
+    def test_random(self):
+        for seed in range(200):
+            self.assert_same(get_affiliation_list(seed, 12, 20))
+        for seed in range(20):
+            self.assert_same(get_affiliation_list(seed, 60, 120))
+
+    def test_get_org(self):
+        for seed in range(20):
+            affiliation_timeline, part_list = self.assert_same(get_affiliation_list(seed, 20, 30))
+            date_list = [get_date(day) for day in range(-2, 60)]
+            org_list = []
+            for date in date_list:
+                org_list.append(next((i for i, parts in enumerate(part_list) for first_date, last_date in parts
+                                      if first_date <= date < last_date), None))
+            self.assertEqual([affiliation_timeline.get_org(date) for date in date_list], org_list)
+            org_array = affiliation_timeline.org_list
+            self.assertEqual([org_array[i] if i >= 0 else None
+                              for i in affiliation_timeline.get_index_array(date_list).tolist()], org_list)
+
+    def test_empty(self):
+        affiliation_timeline = AffiliationTimeline()
+        self.assertIsNone(affiliation_timeline.get_org(get_date(0)))
+        self.assertEqual(affiliation_timeline.get_index_array([get_date(0)]).tolist(), [-1])
+        self.assertEqual(affiliation_timeline.get_index_array([]).tolist(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
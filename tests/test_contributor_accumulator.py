@@ -0,0 +1,146 @@
+""" The contributor accumulator against the merging of per-contribution dicts it replaces """
+
+import datetime
+import json
+import os
+import random
+import tempfile
+import unittest
+
+from compass_contributor.contributor_accumulator import ContributorAccumulator
+from compass_contributor.contributor_dev_org_repo import ContributorDevOrgRepo, GIT_ATTRIBUTE_FIELD_LIST
+
+REPO = "https://github.com/accumulator/test"
+DATE_FIELD_LIST = ["code_author_date_list", "code_committer_date_list", "code_direct_commit_date_list"]
+ORG_LIST = [None, ("a.com", "A"), ("b.com", "B"), ("b.com", None), (None, "C")]
+
+
+def get_contributor_repo():
+    with tempfile.TemporaryDirectory() as path:
+        json_file = os.path.join(path, "repo.json")
+        with open(json_file, "w") as f:
+            json.dump({"test": {"github": [REPO]}}, f)
+        contributor_repo = ContributorDevOrgRepo(
+            json_file, "github-issues_enriched", "github-pulls_enriched", "github-issues-comments_enriched",
+            "github-pulls-comments_enriched", "github-git_enriched", "github-contributors_repo",
+            "github-contributors_repo_enriched", "2023-01-01", "2024-01-01", "github-repo_enriched")
+    contributor_repo.date_field_list = DATE_FIELD_LIST
+    return contributor_repo
+
+
+def get_contribution_list(seed, count, identity_count):
+    """ Contributions as (identity list, attribute dict, date field list, date, org), the identities being
+    drawn from a small set so that contributions join several contributors
+    """
+    rand = random.Random(seed)
+    date = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+    contribution_list = []
+    for _ in range(count):
+        date += datetime.timedelta(hours=rand.randint(0, 30), microseconds=rand.choice([0, rand.randint(1, 99999)]))
+        identity_list = rand.sample(["id{}".format(i) for i in range(identity_count)], rand.choice([0, 1, 1, 1, 2]))
+        attribute_dict = {
+            "id_git_author_name_list": identity_list[0] if identity_list else None,
+            "id_git_author_email_list": identity_list[-1] + "@mail.com" if len(identity_list) > 1 else None
+        }
+        date_field_list = rand.sample(DATE_FIELD_LIST, rand.randint(1, 2))
+        contribution_list.append((identity_list, attribute_dict, date_field_list, date, rand.choice(ORG_LIST)))
+    return contribution_list
+
+
+def get_dict_contributor_list(contributor_repo, contribution_list):
+    """ Contributors built by merging a dict per contribution into the contributors sharing an identity """
+    item_id_dict = {}
+    item_identity_dict = {}
+    for i, (identity_list, attribute_dict, date_field_list, date, org) in enumerate(contribution_list):
+        iso_date = date.isoformat()
+        item = {
+            "uuid": str(i),
+            "id_identity_list": set(identity_list),
+            "last_contributor_date": iso_date,
+            "org_change_date_list": [{
+                "domain": org[0],
+                "org_name": org[1],
+                "first_date": iso_date,
+                "last_date": iso_date
+            }] if org is not None else []
+        }
+        for field, value in attribute_dict.items():
+            item[field] = {value} if value else set()
+        for date_field in date_field_list:
+            item[date_field] = {iso_date}
+        old_item_dict = {}
+        for identity in identity_list:
+            if identity in item_identity_dict and item_identity_dict[identity] in item_id_dict:
+                old_item = item_id_dict.pop(item_identity_dict[identity])
+                old_item_dict[old_item["uuid"]] = old_item
+        if len(old_item_dict) > 0:
+            item = contributor_repo.get_merge_old_new_contributor_data(old_item_dict, {item["uuid"]: item})[0][
+                item["uuid"]]
+        item_id_dict[item["uuid"]] = item
+        for identity in item["id_identity_list"]:
+            item_identity_dict[identity] = item["uuid"]
+    return list(item_id_dict.values())
+
+
+def get_accumulator_contributor_list(contributor_repo, contribution_list):
+    accumulator = ContributorAccumulator(GIT_ATTRIBUTE_FIELD_LIST, contributor_repo.get_merge_org_change_date)
+    for contribution in contribution_list:
+        accumulator.add(*contribution)
+    return list(accumulator.get_contributor_dict(REPO, "git").values())
+
+
+def get_profile(item):
+    """ Fields of a contributor compared, without its uuid """
+    profile = {field: set(item.get(field) or ()) for field in GIT_ATTRIBUTE_FIELD_LIST + DATE_FIELD_LIST}
+    profile["last_contributor_date"] = item["last_contributor_date"]
+    profile["org_change_date_list"] = item["org_change_date_list"]
+    return profile
+
+
+class ContributorAccumulatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.contributor_repo = get_contributor_repo()
+
+    def assert_same(self, contribution_list):
+        dict_contributor_list = get_dict_contributor_list(self.contributor_repo, contribution_list)
+        accumulator_contributor_list = get_accumulator_contributor_list(self.contributor_repo, contribution_list)
+        self.assertEqual([get_profile(item) for item in accumulator_contributor_list],
+                         [get_profile(item) for item in dict_contributor_list])
+        return accumulator_contributor_list
+
+    def test_empty(self):
+        self.assertEqual(self.assert_same([]), [])
+
+    def test_single_contribution(self):
+        contribution_list = get_contribution_list(0, 1, 3)
+        self.assertEqual(len(self.assert_same(contribution_list)), 1)
+
+    def test_contributions_joining_contributors(self):
+        for seed in range(20):
+            self.assert_same(get_contribution_list(seed, 60, 12))
+
+    def test_contributions_of_few_contributors(self):
+        for seed in range(20):
+            self.assert_same(get_contribution_list(seed, 80, 3))
+
+    def test_rank(self):
+        """ Contributions of several ranks added interleaved give the profiles of the ranks added one by one """
+        for seed in range(10):
+            contribution_list = get_contribution_list(seed, 60, 8)
+            rank_list = [i * 4 // len(contribution_list) for i in range(len(contribution_list))]
+            accumulator = ContributorAccumulator(GIT_ATTRIBUTE_FIELD_LIST,
+                                                 self.contributor_repo.get_merge_org_change_date)
+            # the ranks interleaved, each in its own order as the hits of a type streamed in a single pass
+            for i in sorted(range(len(contribution_list)), key=lambda i: (i - rank_list.index(rank_list[i]), i)):
+                accumulator.add(*contribution_list[i], rank=rank_list[i])
+            self.assertEqual(list(accumulator.get_contributor_dict(REPO, "git").values()),
+                             get_accumulator_contributor_list(self.contributor_repo, contribution_list))
+
+    def test_unique_uuid(self):
+        contributor_list = self.assert_same(get_contribution_list(1, 100, 20))
+        self.assertEqual(len({item["uuid"] for item in contributor_list}), len(contributor_list))
+
+
+if __name__ == "__main__":
+    unittest.main()
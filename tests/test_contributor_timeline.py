@@ -0,0 +1,129 @@
+""" The contributor timeline against filtering the dates of every contributor and window """
+
+import datetime
+import random
+import unittest
+
+import numpy as np
+
+from compass_common.datetime import str_to_datetime
+from compass_metrics.contributor_timeline import ContributorTimeline, get_time_array
+
+DATE_FIELD_LIST = ["code_author_date_list", "issue_creation_date_list"]
+OFFSET_LIST = ["+00:00", "+00:00", "+08:00", "-05:30", ""]
+BASE_DATE = datetime.datetime(2023, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def get_date_string(date, offset):
+    """ ISO string of an aware date in an offset, naive for an empty offset """
+    if offset == "":
+        return date.replace(tzinfo=None).isoformat()
+    hours, minutes = int(offset[1:3]), int(offset[4:6])
+    delta = datetime.timedelta(hours=hours, minutes=minutes) * (1 if offset[0] == "+" else -1)
+    return date.astimezone(datetime.timezone(delta)).isoformat()
+
+
+def get_datetime(date):
+    """ Aware datetime of a date string, naive ones being UTC """
+    date = str_to_datetime(date)
+    return date if date.tzinfo is not None else date.replace(tzinfo=datetime.timezone.utc)
+
+
+def get_contributor_list(seed, count, utc_only=False):
+    """ Contributors whose dates fall on midnight, the bounds of the windows, as well as within days """
+    rand = random.Random(seed)
+    contributor_list = []
+    for _ in range(count):
+        contributor = {}
+        for date_field in DATE_FIELD_LIST:
+            date_list = []
+            for _ in range(rand.randint(0, 6)):
+                date = BASE_DATE + datetime.timedelta(days=rand.randint(0, 60))
+                if rand.random() < 0.7:
+                    date += datetime.timedelta(seconds=rand.randint(0, 86399), microseconds=rand.choice([0, 1, 500]))
+                date_list.append(get_date_string(date, "+00:00" if utc_only else rand.choice(OFFSET_LIST)))
+            if date_list or rand.random() < 0.5:
+                contributor[date_field] = date_list
+        contributor_list.append(contributor)
+    return contributor_list
+
+
+def get_window_date_list(contributor, date_field, from_date, to_date):
+    """ Dates of a contributor in [from_date, to_date), sorted by time """
+    return sorted([date for date in contributor.get(date_field) or []
+                   if get_datetime(from_date) <= get_datetime(date) < get_datetime(to_date)], key=get_datetime)
+
+
+def get_window_list(day_list):
+    """ Windows between consecutive days, as the weekly windows of the metrics """
+    return [(BASE_DATE + datetime.timedelta(days=from_day), BASE_DATE + datetime.timedelta(days=to_day))
+            for from_day, to_day in zip(day_list[:-1], day_list[1:])]
+
+
+class ContributorTimelineTest(unittest.TestCase):
+    def test_get_time_array(self):
+        date_list = [date for contributor in get_contributor_list(0, 50)
+                     for date_field in DATE_FIELD_LIST for date in contributor.get(date_field) or []]
+        expected_list = [(get_datetime(date) - BASE_DATE) // datetime.timedelta(microseconds=1) for date in date_list]
+        base_time = (BASE_DATE - datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)) // \
+            datetime.timedelta(microseconds=1)
+        self.assertEqual((get_time_array(date_list) - base_time).tolist(), expected_list)
+        utc_date_list = [date for date in date_list if date.endswith("+00:00")]
+        self.assertEqual(get_time_array(utc_date_list).tolist(),
+                         [date for date, full_date in zip(get_time_array(date_list).tolist(), date_list)
+                          if full_date.endswith("+00:00")])
+        self.assertEqual(get_time_array([]).tolist(), [])
+
+    def test_get_count_array(self):
+        contributor_list = get_contributor_list(1, 40)
+        timeline = ContributorTimeline(contributor_list, DATE_FIELD_LIST)
+        window_list = get_window_list([0, 7, 7, 30, 61, 90]) + [("2023-01-10", "2023-02-10T12:00:00+08:00")]
+        for from_date, to_date in window_list:
+            count_array = timeline.get_count_array(from_date, to_date)
+            self.assertEqual(count_array.shape, (len(contributor_list), len(DATE_FIELD_LIST)))
+            for i, contributor in enumerate(contributor_list):
+                for j, date_field in enumerate(DATE_FIELD_LIST):
+                    date_list = get_window_date_list(contributor, date_field, str(from_date), str(to_date))
+                    self.assertEqual(count_array[i][j], len(date_list))
+                    timeline_date_list = timeline.get_date_list(i, date_field, from_date, to_date)
+                    self.assertEqual(sorted(timeline_date_list, key=get_datetime), date_list)
+            field_count_array = timeline.get_count_array(from_date, to_date, DATE_FIELD_LIST[1:])
+            self.assertTrue(np.array_equal(field_count_array, count_array[:, 1:]))
+
+    def test_utc_dates_as_strings(self):
+        """ Counting UTC dates as instants is the same as comparing the strings with the window days """
+        contributor_list = get_contributor_list(2, 30, utc_only=True)
+        timeline = ContributorTimeline(contributor_list, DATE_FIELD_LIST)
+        for from_date, to_date in get_window_list([0, 1, 14, 45, 60, 61]):
+            from_str, to_str = from_date.strftime("%Y-%m-%d"), to_date.strftime("%Y-%m-%d")
+            count_array = timeline.get_count_array(from_date, to_date, DATE_FIELD_LIST[:1])
+            self.assertEqual(count_array[:, 0].tolist(), [
+                len([date for date in contributor.get(DATE_FIELD_LIST[0]) or [] if from_str <= date < to_str])
+                for contributor in contributor_list])
+
+    def test_get_window_count_list(self):
+        contributor_list = get_contributor_list(3, 40)
+        timeline = ContributorTimeline(contributor_list, DATE_FIELD_LIST)
+        # touching windows, an empty one before the dates and one after them
+        window_list = get_window_list([-14, -7, 0, 1, 7, 14, 21, 35, 61, 70])
+        window_count_list = timeline.get_window_count_list(window_list)
+        self.assertEqual(len(window_count_list), len(window_list))
+        for (from_date, to_date), (contributor_index_array, count_array) in zip(window_list, window_count_list):
+            full_count_array = timeline.get_count_array(from_date, to_date)
+            expected_index_list = [i for i in range(len(contributor_list)) if full_count_array[i].sum() > 0]
+            self.assertEqual(contributor_index_array.tolist(), expected_index_list)
+            self.assertTrue(np.array_equal(count_array, full_count_array[expected_index_list]))
+        self.assertEqual(len(window_count_list[0][0]), 0)
+        self.assertEqual(len(window_count_list[-1][0]), 0)
+
+    def test_empty(self):
+        timeline = ContributorTimeline([{}, {DATE_FIELD_LIST[0]: []}], DATE_FIELD_LIST)
+        self.assertEqual(timeline.get_count_array(BASE_DATE, BASE_DATE + datetime.timedelta(days=7)).tolist(),
+                         [[0, 0], [0, 0]])
+        window_count_list = timeline.get_window_count_list(get_window_list([0, 7]))
+        self.assertEqual(len(window_count_list[0][0]), 0)
+        self.assertEqual(len(ContributorTimeline([], DATE_FIELD_LIST).get_count_array(BASE_DATE, BASE_DATE)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
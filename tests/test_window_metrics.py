@@ -0,0 +1,97 @@
+""" The window metrics of a date list against the per-date metrics they replace """
+
+import datetime
+import unittest
+
+from compass_common.datetime import get_date_list
+from compass_common.offline_client import OfflineClient
+from compass_metrics import git_metrics, issue_metrics, pr_metrics, window_metrics
+from compass_metrics.contributor_metrics import commit_contributor_cache
+
+REPO = "https://github.com/window/test"
+ISSUE_INDEX = "window-test-issues"
+PR_INDEX = "window-test-pulls"
+CONTRIBUTORS_INDEX = "window-test-contributors"
+# the first dates have every boundary day of their window, the last ones an empty window
+DATE_LIST = get_date_list("2023-04-03", "2023-06-26") + get_date_list("2024-03-04", "2024-03-18")
+# days around the bounds of the window [date - 90 days, date)
+BOUNDARY_DAY_LIST = [-91, -90, -89, -1, 0, 1]
+
+
+def get_iso_date(date, days, hours=12):
+    return (date + datetime.timedelta(days=days, hours=hours)).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+
+def get_item_list():
+    item_list = []
+    for i, date in enumerate(DATE_LIST[:len(DATE_LIST) - 3]):
+        for j, days in enumerate(BOUNDARY_DAY_LIST):
+            number = i * len(BOUNDARY_DAY_LIST) + j
+            for pull_request in ("true", "false"):
+                uuid = "{}-{}".format(pull_request, number)
+                item_list.append((PR_INDEX if pull_request == "true" else ISSUE_INDEX, uuid, {
+                    "uuid": uuid,
+                    "tag": REPO,
+                    "pull_request": pull_request,
+                    "state": ["open", "closed", "merged", "progressing"][number % 4],
+                    "grimoire_creation_date": get_iso_date(date, days),
+                    "closed_at": get_iso_date(date, days + number % 3),
+                    "num_of_comments_without_bot": number % 5,
+                    "num_review_comments_without_bot": None if number % 3 == 0 else number % 4
+                }))
+            item_list.append((CONTRIBUTORS_INDEX, "contributor-{}".format(number), {
+                "uuid": "contributor-{}".format(number),
+                "repo_name": REPO,
+                "is_bot": [True, False, None][number % 3],
+                "code_author_date_list": sorted(get_iso_date(date, days + k, hours=k) for k in range(number % 4 + 1))
+            }))
+    return item_list
+
+
+class WindowMetricsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.client = OfflineClient()
+        cls.client.save_items(get_item_list())
+
+    def setUp(self):
+        commit_contributor_cache.clear()
+
+    def assert_same(self, window_function, date_function, index):
+        window_result_list = window_function(self.client, index, DATE_LIST, [REPO])
+        date_result_list = [date_function(self.client, index, date, [REPO]) for date in DATE_LIST]
+        self.assertEqual(len(window_result_list), len(DATE_LIST))
+        for date, window_result, date_result in zip(DATE_LIST, window_result_list, date_result_list):
+            self.assertEqual(window_result, date_result, str(date))
+        return window_result_list
+
+    def test_pr_count(self):
+        result_list = self.assert_same(window_metrics.pr_count, pr_metrics.pr_count, PR_INDEX)
+        self.assertEqual(result_list[-1], {"pr_count": 0})
+
+    def test_close_pr_count(self):
+        self.assert_same(window_metrics.close_pr_count, pr_metrics.close_pr_count, PR_INDEX)
+
+    def test_code_review_count(self):
+        result_list = self.assert_same(window_metrics.code_review_count, pr_metrics.code_review_count, PR_INDEX)
+        self.assertEqual(result_list[-1], {"code_review_count": None})
+
+    def test_comment_frequency(self):
+        result_list = self.assert_same(window_metrics.comment_frequency, issue_metrics.comment_frequency,
+                                       ISSUE_INDEX)
+        self.assertEqual(result_list[-1], {"comment_frequency": None})
+
+    def test_closed_issues_count(self):
+        self.assert_same(window_metrics.closed_issues_count, issue_metrics.closed_issues_count, ISSUE_INDEX)
+
+    def test_commit_frequency(self):
+        self.assert_same(window_metrics.commit_frequency, git_metrics.commit_frequency, CONTRIBUTORS_INDEX)
+
+    def test_commit_count(self):
+        result_list = self.assert_same(window_metrics.commit_count, git_metrics.commit_count, CONTRIBUTORS_INDEX)
+        self.assertEqual(result_list[-1]["commit_count"], 0)
+        self.assertGreater(result_list[0]["commit_count"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()